@@ -0,0 +1,132 @@
+from django.db.models import (
+    Case, Count, F, FloatField, IntegerField, OuterRef, Subquery, Sum, Value, When,
+)
+from django.db.models.functions import Coalesce
+
+from .models import (
+    Checkin, DailyActivitySummary, DailyMacroTarget, FoodDiaryEntry, MacroPlan,
+    UserProfile, UserWorkoutLog, WaterLog, Workout,
+)
+
+
+# ---------------------------
+# Diary nutrition expressions
+# ---------------------------
+
+# nutrient -> (Food field, Meal field); Food values are per 100 g, Meal values per serving
+NUTRIENT_FIELDS = {
+    'calories': ('calories', 'calories'),
+    'protein': ('protein', 'protein'),
+    'carbs': ('carbs', 'carbs'),
+    'fats': ('fat', 'fats'),
+    'fiber': ('fiber', 'fiber'),
+}
+
+
+def entry_nutrient_expression(nutrient, prefix=''):
+    """
+    Per-entry nutrient value for a FoodDiaryEntry queryset, already multiplied by servings,
+    recomputed from the linked rows. Foods are scaled by the chosen portion (100 g when
+    none), meals use their per-serving values and recipes one serving of their stored totals.
+
+    Reads should use the entry's snapshot columns instead; this is for backfilling them.
+    """
+    food_field, meal_field = NUTRIENT_FIELDS[nutrient]
+    per_serving = Case(
+        When(**{f'{prefix}food__isnull': False}, then=(
+            F(f'{prefix}food__{food_field}')
+            * Coalesce(F(f'{prefix}portion__grams'), Value(100.0)) / 100.0
+        )),
+        When(**{f'{prefix}meal__isnull': False}, then=F(f'{prefix}meal__{meal_field}')),
+        When(**{f'{prefix}recipe__isnull': False}, then=(
+            F(f'{prefix}recipe__{nutrient}') * 1.0 / F(f'{prefix}recipe__servings')
+        )),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return per_serving * F(f'{prefix}servings')
+
+
+def diary_totals(queryset, nutrients=('calories', 'protein', 'carbs', 'fats')):
+    """Sum the snapshot nutrition columns of a FoodDiaryEntry queryset in a single query"""
+    totals = queryset.aggregate(**{f'total_{nutrient}': Sum(nutrient) for nutrient in nutrients})
+    return {nutrient: totals[f'total_{nutrient}'] or 0 for nutrient in nutrients}
+
+
+# ---------------------------
+# Daily summary
+# ---------------------------
+
+def _scalar(queryset, expression, output_field):
+    """Correlated scalar subquery aggregating ``expression`` over ``queryset``"""
+    return Subquery(
+        queryset.values('user').annotate(value=expression).values('value')[:1],
+        output_field=output_field,
+    )
+
+
+def get_daily_target(user, day):
+    """Daily macro target for ``day``, materialized from the active macro plan when missing"""
+    daily_target = DailyMacroTarget.objects.filter(user=user, date=day).first()
+    if daily_target:
+        return daily_target
+
+    active_plan = MacroPlan.objects.filter(user=user, active=True).first()
+    if not active_plan:
+        return None
+
+    return DailyMacroTarget.objects.create(
+        user=user, date=day,
+        calorie_target=active_plan.calorie_target,
+        protein_g=active_plan.protein_g,
+        carbs_g=active_plan.carbs_g,
+        fats_g=active_plan.fats_g
+    )
+
+
+def daily_summary(user, day):
+    """
+    Collect everything the home dashboard needs for one day.
+
+    Runs a fixed number of queries regardless of how many diary entries, logs or
+    workouts exist: one for the target, one aggregate over the diary and one
+    profile row carrying every other lookup as a correlated subquery.
+    """
+    daily_target = get_daily_target(user, day)
+    consumed = diary_totals(FoodDiaryEntry.objects.filter(user=user, date=day))
+
+    user_ref = OuterRef('user')
+    completed_logs = UserWorkoutLog.objects.filter(user=user_ref, date=day, completed=True)
+    activity = DailyActivitySummary.objects.filter(user=user_ref, date=day)
+    todays_workouts = Workout.objects.filter(user=user_ref, date=day)
+    next_workout = todays_workouts.filter(completed=False).order_by('name')
+
+    profile = UserProfile.objects.filter(user=user).annotate(
+        workout_burned=_scalar(completed_logs, Sum('calories_burned'), IntegerField()),
+        workouts_completed=_scalar(completed_logs, Count('id'), IntegerField()),
+        workouts_scheduled=_scalar(todays_workouts, Count('id'), IntegerField()),
+        water_ml=_scalar(WaterLog.objects.filter(user=user_ref, date=day), Sum('amount_ml'), IntegerField()),
+        activity_burned=Subquery(activity.values('calories_burned')[:1]),
+        steps=Subquery(activity.values('steps')[:1]),
+        next_workout_id=Subquery(next_workout.values('id')[:1]),
+        next_workout_name=Subquery(next_workout.values('name')[:1]),
+        last_sleep_hours=Subquery(
+            Checkin.objects.filter(user=user_ref).order_by('-date').values('sleep_hours')[:1]
+        ),
+    ).get()
+
+    return {
+        'target': daily_target,
+        'profile': profile,
+        'consumed': consumed,
+        'burned_calories': (profile.workout_burned or 0) + (profile.activity_burned or 0),
+        'water_ml': profile.water_ml or 0,
+        'steps': profile.steps or 0,
+        'workouts_completed': profile.workouts_completed or 0,
+        'workouts_scheduled': profile.workouts_scheduled or 0,
+        'next_workout': (
+            {'id': profile.next_workout_id, 'name': profile.next_workout_name}
+            if profile.next_workout_id else None
+        ),
+        'last_sleep_hours': profile.last_sleep_hours,
+    }
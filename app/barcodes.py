@@ -0,0 +1,126 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import FoodBarcode
+from .serializers import FoodSerializer
+
+LRU_SIZE = 2048
+SHARED_TIMEOUT = 60 * 60 * 24
+GENERATION_KEY = 'barcode:generation'
+# the default cache is per-process LocMem, where an invalidation only reaches the process that
+# made the write; expiring the generation bounds how long any other process serves stale foods
+GENERATION_TIMEOUT = 60
+MAX_BATCH_CODES = 500
+
+# cached value for codes that resolve to nothing, so repeated misses stay off the database
+NOT_FOUND = {'found': False}
+
+
+# ---------------------------
+# Two-level cache: per-process LRU in front of the shared Django cache
+# ---------------------------
+
+class _LRU:
+    def __init__(self, size):
+        self.size = size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+_local = _LRU(LRU_SIZE)
+
+
+def _generation():
+    """
+    Current cache generation.
+
+    All keys embed it, so invalidation is a single write. A generation that expires
+    (after ``GENERATION_TIMEOUT``) or is evicted is replaced by a fresh one, which
+    orphans every older entry; with a shared cache backend the write reaches every
+    process at once.
+    """
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        generation = uuid.uuid4().hex
+        cache.add(GENERATION_KEY, generation, GENERATION_TIMEOUT)
+        generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def _new_generation():
+    cache.set(GENERATION_KEY, uuid.uuid4().hex, GENERATION_TIMEOUT)
+    _local.clear()
+
+
+def invalidate_barcodes():
+    """
+    Drop every cached barcode lookup (called on Food/FoodBrand/FoodPortion/FoodBarcode writes).
+
+    Deferred to commit: bumping earlier would let a concurrent lookup cache the old
+    rows under the new generation, and a rolled-back write needs no bump at all.
+    """
+    transaction.on_commit(_new_generation)
+
+
+def lookup_barcodes(codes):
+    """
+    Serialized foods for ``codes`` as ``{code: {'found': bool, 'food': data}}``.
+
+    Codes are answered from the process LRU, then the shared cache. Whatever is
+    left is resolved in one ``code__in`` query with the brand joined and portions
+    prefetched.
+    """
+    generation = _generation()
+    results, missing = {}, []
+    for code in dict.fromkeys(codes):
+        hit = _local.get((generation, code))
+        if hit is None:
+            missing.append(code)
+        else:
+            results[code] = hit
+
+    if missing:
+        shared = cache.get_many([f'barcode:{generation}:{code}' for code in missing])
+        for code in missing:
+            hit = shared.get(f'barcode:{generation}:{code}')
+            if hit is not None:
+                results[code] = hit
+                _local.set((generation, code), hit)
+        missing = [code for code in missing if code not in results]
+
+    if missing:
+        barcodes = (
+            FoodBarcode.objects.filter(code__in=missing)
+            .select_related('food__brand')
+            .prefetch_related('food__portions')
+        )
+        resolved = {barcode.code: {'found': True, 'food': FoodSerializer(barcode.food).data} for barcode in barcodes}
+        fresh = {code: resolved.get(code, NOT_FOUND) for code in missing}
+        cache.set_many({f'barcode:{generation}:{code}': value for code, value in fresh.items()}, SHARED_TIMEOUT)
+        for code, value in fresh.items():
+            _local.set((generation, code), value)
+        results.update(fresh)
+
+    return results
@@ -0,0 +1,73 @@
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import UserProfile
+
+
+# ---------------------------
+# Per-user time zones
+# ---------------------------
+
+def _zone(name):
+    try:
+        return ZoneInfo(name) if name else timezone.get_default_timezone()
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def user_timezone(user):
+    """The user's profile time zone, falling back to the project default when unset or unknown"""
+    profile = getattr(user, 'profile', None) if getattr(user, 'is_authenticated', False) else None
+    return _zone(getattr(profile, 'timezone', None))
+
+
+def timezone_for(user_id):
+    """``user_timezone`` by id, for code paths that only hold ``user_id``"""
+    name = UserProfile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first()
+    return _zone(name)
+
+
+def timezones_for(user_ids):
+    """``{user_id: tzinfo}`` for many users in one query; users without a profile get the default"""
+    names = dict(UserProfile.objects.filter(user_id__in=user_ids).values_list('user_id', 'timezone'))
+    return {user_id: _zone(names.get(user_id)) for user_id in user_ids}
+
+
+# ---------------------------
+# Local dates -> timestamp ranges
+# ---------------------------
+
+def day_bounds(start_day, end_day=None, tz=None):
+    """
+    Half-open ``[start, end)`` aware datetimes covering local days ``start_day..end_day``.
+
+    Both bounds are local midnights, so DST days are 23 or 25 hours long as they should be.
+    """
+    tz = tz or timezone.get_default_timezone()
+    end_day = end_day or start_day
+    start = datetime.combine(start_day, time.min, tzinfo=tz)
+    end = datetime.combine(end_day + timedelta(days=1), time.min, tzinfo=tz)
+    return start, end
+
+
+def date_window(field, start_day=None, end_day=None, tz=None):
+    """
+    Filter on a timestamp ``field`` by local date, without wrapping the column in ``DATE()``.
+
+    Either bound may be omitted. The plain range comparison can use (user, ``field``)
+    indexes, which a ``field__date`` lookup cannot.
+    """
+    condition = Q()
+    if start_day:
+        condition &= Q(**{f'{field}__gte': day_bounds(start_day, tz=tz)[0]})
+    if end_day:
+        condition &= Q(**{f'{field}__lt': day_bounds(end_day, tz=tz)[1]})
+    return condition
+
+
+def local_date(value, tz):
+    """Calendar date of an aware timestamp in ``tz``"""
+    return timezone.localtime(value, tz).date()
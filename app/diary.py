@@ -0,0 +1,90 @@
+from django.db import connection, transaction
+
+from .models import Food, FoodDiaryEntry, FoodPortion, Meal, Recipe
+from .recents import remember_entries
+from .rollups import refresh_rollup
+
+MAX_DIARY_BATCH = 200
+# a copy repeats what was logged, nutrition snapshot included, like an INSERT ... SELECT
+ENTRY_COPY_FIELDS = (
+    'meal_time', 'time', 'food_id', 'recipe_id', 'meal_id', 'portion_id', 'servings', 'notes',
+) + FoodDiaryEntry.NUTRITION_FIELDS
+ENTRY_SOURCES = ('food', 'recipe', 'meal', 'portion')
+
+
+# ---------------------------
+# Bulk writes
+# ---------------------------
+
+def save_entries(user_id, entries):
+    """
+    Insert one user's unsaved entries, snapshots already filled, in one transaction.
+
+    ``bulk_create`` skips the FoodDiaryEntry signals, so the rollups of the touched
+    days and the user's recent foods are maintained here. Backends without
+    RETURNING (MySQL) leave bulk-created pks unset and entries have no natural key
+    to read them back by, so there the rows are saved one by one and the signals
+    do the maintenance.
+    """
+    if not entries:
+        return entries
+    with transaction.atomic():
+        if not connection.features.can_return_rows_from_bulk_insert:
+            for entry in entries:
+                # keep the filled snapshot: save() only re-resolves when what was eaten changed
+                entry._nutrition_source = entry._current_nutrition_source()
+                entry.save(force_insert=True)
+            return entries
+        FoodDiaryEntry.objects.bulk_create(entries)
+        for day in {entry.date for entry in entries}:
+            refresh_rollup(user_id, day, sources=[FoodDiaryEntry])
+        remember_entries(entries)
+    return entries
+
+
+def copy_entries(user_id, sources, day, meal_time=None):
+    """Copy the entries of ``sources`` to ``day`` (and into one ``meal_time`` slot when given)"""
+    entries = [
+        FoodDiaryEntry(user_id=user_id, date=day, **{**row, 'meal_time': meal_time or row['meal_time']})
+        for row in sources.order_by('id').values(*ENTRY_COPY_FIELDS)
+    ]
+    return save_entries(user_id, entries)
+
+
+# ---------------------------
+# Resolving many new entries
+# ---------------------------
+
+def _ids(entries, kind):
+    return {getattr(entry, f'{kind}_id') for entry in entries if getattr(entry, f'{kind}_id')}
+
+
+def entry_sources(entries):
+    """``{kind: {id: object}}`` for the foods, recipes, meals and portions the entries name, one query per kind"""
+    return {
+        'food': Food.objects.in_bulk(_ids(entries, 'food')),
+        'recipe': Recipe.objects.only('servings', *Recipe.NUTRITION_FIELDS).in_bulk(_ids(entries, 'recipe')),
+        'meal': Meal.objects.in_bulk(_ids(entries, 'meal')),
+        'portion': FoodPortion.objects.in_bulk(_ids(entries, 'portion')),
+    }
+
+
+def source_errors(entry, sources):
+    """Field errors for ids that do not exist (or a portion of another food), in serializer error shape"""
+    errors = {}
+    for kind in ENTRY_SOURCES:
+        item_id = getattr(entry, f'{kind}_id')
+        if item_id and item_id not in sources[kind]:
+            errors[kind] = [f'{kind.title()} not found']
+    if entry.portion_id and not errors and sources['portion'][entry.portion_id].food_id != entry.food_id:
+        errors['portion'] = ['Portion does not belong to this food']
+    return errors
+
+
+def resolve_entry(entry, sources):
+    """Fill the snapshot of an unsaved entry from already loaded sources (no queries)"""
+    for kind in ('food', 'meal', 'portion'):
+        item_id = getattr(entry, f'{kind}_id')
+        if item_id:
+            setattr(entry, kind, sources[kind][item_id])
+    entry.resolve_nutrition(recipe=sources['recipe'].get(entry.recipe_id))
@@ -0,0 +1,235 @@
+import csv
+import math
+import os
+from itertools import islice
+
+import ijson
+from django.db import connection, transaction
+
+from .barcodes import invalidate_barcodes
+from .models import Food, FoodBarcode, FoodBrand, FoodPortion, ServingUnit
+from .recipes import refresh_recipes_using
+from .search import index_foods
+
+IMPORT_CHUNK_SIZE = 2000
+FOOD_ID_LENGTH = Food._meta.get_field('food_id').max_length
+FOOD_NAME_LENGTH = Food._meta.get_field('name').max_length
+BRAND_NAME_LENGTH = FoodBrand._meta.get_field('name').max_length
+ALLERGENS_LENGTH = Food._meta.get_field('allergens').max_length
+BARCODE_LENGTH = FoodBarcode._meta.get_field('code').max_length
+PORTION_NAME_LENGTH = FoodPortion._meta.get_field('name').max_length
+REQUIRED_NUTRIENTS = ('calories', 'protein', 'carbs', 'fat')
+# fields an import overwrites on a food that already exists
+FOOD_UPDATE_FIELDS = ('name', 'brand', *REQUIRED_NUTRIENTS, 'fiber', 'allergens')
+# separators inside a CSV cell: "0123|0456" and "1 cup=240|1 slice=30"
+LIST_SEPARATOR = '|'
+PORTION_SEPARATOR = '='
+
+
+# ---------------------------
+# Reading
+# ---------------------------
+
+def read_records(path):
+    """
+    Yield raw records from a ``.csv``, ``.jsonl`` (one object per line) or ``.json``
+    (top-level array) file, streaming so memory does not grow with the file.
+    """
+    suffix = os.path.splitext(path)[1].lower()
+    if suffix == '.csv':
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            yield from csv.DictReader(handle)
+    elif suffix in ('.jsonl', '.ndjson', '.json'):
+        with open(path, 'rb') as handle:
+            if suffix == '.json':
+                yield from ijson.items(handle, 'item')
+            else:
+                yield from ijson.items(handle, '', multiple_values=True)
+    else:
+        raise ValueError(f"Unsupported file type {suffix or '(none)'}: use .csv, .jsonl or .json")
+
+
+def chunked(records, size):
+    records = iter(records)
+    while chunk := list(islice(records, size)):
+        yield chunk
+
+
+# ---------------------------
+# Validation
+# ---------------------------
+
+def _text(raw, field, max_length, required=False):
+    value = str(raw.get(field) or '').strip()
+    if required and not value:
+        raise ValueError(f'{field} is required')
+    if len(value) > max_length:
+        raise ValueError(f'{field} is longer than {max_length} characters')
+    return value
+
+
+def _amount(value, field):
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'{field} must be a number')
+    if not math.isfinite(value) or value < 0:
+        raise ValueError(f'{field} must be zero or more')
+    return value
+
+
+def _items(value):
+    """A JSON list, or a CSV cell holding ``LIST_SEPARATOR``-separated items"""
+    if value in (None, ''):
+        return []
+    if isinstance(value, str):
+        return [item.strip() for item in value.split(LIST_SEPARATOR) if item.strip()]
+    if isinstance(value, list):
+        return value
+    raise ValueError('expected a list')
+
+
+def _portion(item):
+    if isinstance(item, str):
+        name, _, grams = item.rpartition(PORTION_SEPARATOR)
+        item = {'name': name, 'grams': grams}
+    if not isinstance(item, dict):
+        raise ValueError('portions must be objects or "name=grams" strings')
+    name = _text(item, 'name', PORTION_NAME_LENGTH, required=True)
+    grams = _amount(item.get('grams'), 'portion grams')
+    if not grams:
+        raise ValueError('portion grams must be positive')
+    unit = item.get('unit') or ServingUnit.GRAM
+    if unit not in ServingUnit.values:
+        raise ValueError(f'unknown portion unit {unit}')
+    quantity = _amount(item.get('quantity', grams if unit == ServingUnit.GRAM else 1), 'portion quantity')
+    return name, {'unit': unit, 'quantity': quantity, 'grams': grams}
+
+
+def clean_record(raw):
+    """
+    Normalize one raw record; raises ValueError with the reason it cannot be imported.
+
+    Records carry ``food_id``, ``name``, the per-100 g nutrients, and optionally
+    ``brand``, ``fiber``, ``allergens``, ``barcodes`` and ``portions``.
+    """
+    if not isinstance(raw, dict):
+        raise ValueError('record must be an object')
+    food = {
+        'food_id': _text(raw, 'food_id', FOOD_ID_LENGTH, required=True),
+        'name': _text(raw, 'name', FOOD_NAME_LENGTH, required=True),
+        'allergens': _text(raw, 'allergens', ALLERGENS_LENGTH),
+        'fiber': _amount(raw.get('fiber') or 0, 'fiber'),
+    }
+    for nutrient in REQUIRED_NUTRIENTS:
+        food[nutrient] = _amount(raw.get(nutrient), nutrient)
+    barcodes = [str(code).strip() for code in _items(raw.get('barcodes'))]
+    if any(not code or len(code) > BARCODE_LENGTH for code in barcodes):
+        raise ValueError(f'barcodes must be 1-{BARCODE_LENGTH} characters')
+    return {
+        'food': food,
+        'brand': _text(raw, 'brand', BRAND_NAME_LENGTH),
+        'barcodes': barcodes,
+        'portions': dict(_portion(item) for item in _items(raw.get('portions'))),
+    }
+
+
+# ---------------------------
+# Writing
+# ---------------------------
+
+def _upsert(model, objects, unique_fields, update_fields):
+    options = {'update_conflicts': True, 'update_fields': update_fields}
+    if connection.features.supports_update_conflicts_with_target:
+        # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target
+        options['unique_fields'] = unique_fields
+    model.objects.bulk_create(objects, batch_size=IMPORT_CHUNK_SIZE, **options)
+
+
+def _brand_ids(names):
+    FoodBrand.objects.bulk_create(
+        [FoodBrand(name=name) for name in names], batch_size=IMPORT_CHUNK_SIZE, ignore_conflicts=True
+    )
+    return dict(FoodBrand.objects.filter(name__in=names).values_list('name', 'id'))
+
+
+def _write_portions(portions):
+    """Upsert ``{(food id, name): fields}``; diary entries point at portions, so none are removed"""
+    existing = {
+        (food_id, name): pk
+        for pk, food_id, name in FoodPortion.objects.filter(
+            food_id__in={food_id for food_id, _ in portions}).values_list('id', 'food_id', 'name')
+    }
+    changed, added = [], []
+    for (food_id, name), fields in portions.items():
+        portion = FoodPortion(id=existing.get((food_id, name)), food_id=food_id, name=name, **fields)
+        (changed if portion.id else added).append(portion)
+    FoodPortion.objects.bulk_update(changed, ['unit', 'quantity', 'grams'], batch_size=IMPORT_CHUNK_SIZE)
+    FoodPortion.objects.bulk_create(added, batch_size=IMPORT_CHUNK_SIZE)
+
+
+def import_chunk(records):
+    """
+    Upsert one chunk of cleaned records in a transaction; returns the foods written.
+
+    Brands are created by name, foods upserted by ``food_id``, barcodes moved onto
+    the imported food and portions upserted by name, each in batched statements. The
+    bulk writes skip the Food signals, so the search index and the totals of recipes
+    using these foods are refreshed here; the caller invalidates the barcode cache.
+    """
+    # later rows win when a file repeats a food or a barcode
+    records = {record['food']['food_id']: record for record in records}
+    if not records:
+        return 0
+    with transaction.atomic():
+        brand_ids = _brand_ids({record['brand'] for record in records.values() if record['brand']})
+        _upsert(
+            Food,
+            [
+                Food(brand_id=brand_ids.get(record['brand']), is_custom=False, **record['food'])
+                for record in records.values()
+            ],
+            ['food_id'], FOOD_UPDATE_FIELDS,
+        )
+        # MySQL returns no ids from an upsert, so read them back by the natural key
+        ids = dict(Food.objects.filter(food_id__in=records).values_list('food_id', 'id'))
+
+        barcodes = {code: ids[food_id] for food_id, record in records.items() for code in record['barcodes']}
+        _upsert(FoodBarcode, [FoodBarcode(code=code, food_id=food_id) for code, food_id in barcodes.items()],
+                ['code'], ['food'])
+        _write_portions({
+            (ids[food_id], name): fields
+            for food_id, record in records.items() for name, fields in record['portions'].items()
+        })
+
+        index_foods(Food.objects.select_related('brand').filter(id__in=ids.values()))
+        refresh_recipes_using(ids.values())
+    return len(records)
+
+
+def import_foods(records, chunk_size=IMPORT_CHUNK_SIZE, start=0, on_error=None, on_chunk=None):
+    """
+    Clean and import an iterable of raw records ``chunk_size`` at a time.
+
+    The first ``start`` records are skipped (read but not cleaned or written), which
+    is how an interrupted import resumes from its checkpoint.
+
+    ``on_error(number, message)`` is called for each rejected record (numbered from 1)
+    and ``on_chunk(read, written)`` after each committed chunk with the running totals,
+    which is where callers keep a checkpoint. Returns ``(read, written)``.
+    """
+    read, written = start, 0
+    for chunk in chunked(islice(records, start, None), chunk_size):
+        cleaned = []
+        for number, raw in enumerate(chunk, start=read + 1):
+            try:
+                cleaned.append(clean_record(raw))
+            except ValueError as exc:
+                if on_error:
+                    on_error(number, str(exc))
+        written += import_chunk(cleaned)
+        read += len(chunk)
+        invalidate_barcodes()
+        if on_chunk:
+            on_chunk(read, written)
+    return read, written
@@ -0,0 +1,326 @@
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Avg, Count, Max, Min, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import HeartRateSample
+
+BPM_RANGE = (20, 250)
+MAX_SAMPLES_PER_SYNC = 50000
+INGEST_BATCH_SIZE = 2000
+MAX_REPORTED_ERRORS = 20
+
+
+# ---------------------------
+# Payload decoding
+# ---------------------------
+
+def _parse_ts(value):
+    """ISO 8601 string or epoch seconds -> aware datetime"""
+    if isinstance(value, bool):
+        raise ValueError('invalid timestamp')
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value, tz=dt_timezone.utc)
+    parsed = parse_datetime(value) if isinstance(value, str) else None
+    if parsed is None:
+        raise ValueError('invalid timestamp')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def _parse_bpm(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != int(value):
+        raise ValueError('bpm must be an integer')
+    if not BPM_RANGE[0] <= value <= BPM_RANGE[1]:
+        raise ValueError(f'bpm must be between {BPM_RANGE[0]} and {BPM_RANGE[1]}')
+    return int(value)
+
+
+def _columns(payload):
+    """
+    Normalise the accepted body shapes into parallel (timestamps, bpms) lists.
+
+    * ``{"samples": [{"ts": ..., "bpm": ...}, ...]}`` - one object per sample
+    * ``{"ts": [...], "bpm": [...]}`` - parallel arrays
+    * ``{"start": ..., "deltas": [...], "bpm": [...]}`` - each delta is seconds since
+      the previous sample (the first one since ``start``)
+    """
+    if 'samples' in payload:
+        samples = payload['samples']
+        if not isinstance(samples, list):
+            raise ValueError('samples must be a list')
+        return (
+            [s.get('ts') if isinstance(s, dict) else None for s in samples],
+            [s.get('bpm') if isinstance(s, dict) else None for s in samples],
+        )
+
+    bpms = payload.get('bpm')
+    if not isinstance(bpms, list):
+        raise ValueError('Provide samples, ts/bpm arrays or start/deltas/bpm arrays')
+
+    if 'deltas' in payload:
+        deltas = payload['deltas']
+        if not isinstance(deltas, list) or len(deltas) != len(bpms):
+            raise ValueError('deltas and bpm must be lists of the same length')
+        try:
+            current = _parse_ts(payload.get('start'))
+        except (TypeError, ValueError):
+            raise ValueError('start must be an ISO 8601 timestamp or epoch seconds')
+        timestamps = []
+        for delta in deltas:
+            if isinstance(delta, bool) or not isinstance(delta, (int, float)) or delta < 0:
+                raise ValueError('deltas must be non-negative numbers')
+            current = current + timedelta(seconds=delta)
+            timestamps.append(current)
+        return timestamps, bpms
+
+    timestamps = payload.get('ts')
+    if not isinstance(timestamps, list) or len(timestamps) != len(bpms):
+        raise ValueError('ts and bpm must be lists of the same length')
+    return timestamps, bpms
+
+
+def parse_samples(payload):
+    """
+    Validate a whole sync payload before anything is written.
+
+    Returns ``(samples, errors)`` where ``samples`` is a list of ``(aware ts, bpm)``
+    pairs and ``errors`` lists ``{'index', 'error'}`` for rejected rows. Raises
+    ``ValueError`` when the body itself is malformed. Samples repeated inside the
+    payload keep the last value and are reported by ``ingest_samples`` as duplicates.
+    """
+    timestamps, bpms = _columns(payload)
+    if len(bpms) > MAX_SAMPLES_PER_SYNC:
+        raise ValueError(f'At most {MAX_SAMPLES_PER_SYNC} samples per sync')
+
+    samples, errors = [], []
+    for index, (ts, bpm) in enumerate(zip(timestamps, bpms)):
+        try:
+            samples.append((ts if isinstance(ts, datetime) else _parse_ts(ts), _parse_bpm(bpm)))
+        except (TypeError, ValueError, OverflowError, OSError) as e:
+            errors.append({'index': index, 'error': str(e)})
+    return samples, errors
+
+
+# ---------------------------
+# Ingestion
+# ---------------------------
+
+def ingest_samples(user, samples, batch_size=INGEST_BATCH_SIZE):
+    """
+    Store parsed ``(ts, bpm)`` samples for ``user``, skipping ones already stored.
+
+    Existing timestamps are read back with one range query over the (user, ts)
+    index; the rest go out in ``bulk_create`` batches. ``ignore_conflicts`` covers
+    concurrent syncs racing on the unique (user, ts) constraint. Returns
+    ``(accepted, duplicates)``.
+    """
+    by_ts = dict(samples)
+    duplicates = len(samples) - len(by_ts)
+    if not by_ts:
+        return 0, duplicates
+
+    existing = set(
+        HeartRateSample.objects
+        .filter(user=user, ts__range=(min(by_ts), max(by_ts)))
+        .values_list('ts', flat=True)
+    )
+    new = [HeartRateSample(user=user, ts=ts, bpm=bpm) for ts, bpm in by_ts.items() if ts not in existing]
+
+    with transaction.atomic():
+        HeartRateSample.objects.bulk_create(new, batch_size=batch_size, ignore_conflicts=True)
+    return len(new), duplicates + len(by_ts) - len(new)
+
+
+# ---------------------------
+# Time-series reads
+# ---------------------------
+
+# bucket -> (Trunc kind, number of truncated units folded together)
+HR_BUCKETS = {
+    '1m': ('minute', 1),
+    '5m': ('minute', 5),
+    '1h': ('hour', 1),
+    '1d': ('day', 1),
+}
+MAX_POINTS = 5000
+STREAM_CHUNK_SIZE = 2000
+
+
+def range_stats(queryset):
+    """avg/max/min bpm over a sample queryset in a single aggregate"""
+    stats = queryset.aggregate(avg=Avg('bpm'), high=Max('bpm'), low=Min('bpm'))
+    return {
+        'avg_bpm': round(stats['avg']) if stats['avg'] is not None else 0,
+        'max_bpm': stats['high'] or 0,
+        'min_bpm': stats['low'] or 0,
+    }
+
+
+def _fold(rows, width):
+    """Merge consecutive truncated rows into ``width``-unit buckets aligned to the hour"""
+    current = None
+    for row in rows:
+        start = row['bucket']
+        if width > 1:
+            start = start.replace(minute=start.minute - start.minute % width)
+        if current and current['bucket'] == start:
+            current['total'] += row['total']
+            current['count'] += row['count']
+            current['low'] = min(current['low'], row['low'])
+            current['high'] = max(current['high'], row['high'])
+            continue
+        if current:
+            yield current
+        current = {**row, 'bucket': start}
+    if current:
+        yield current
+
+
+def bucket_rows(queryset, bucket, tz=None):
+    """
+    Per-bucket ``{bucket, total, count, low, high}`` rows aggregated in the database.
+
+    Buckets are cut in ``tz`` (the user's zone), so ``1d`` buckets are local days.
+
+    Rows are grouped on the truncated timestamp and read with ``iterator()`` so a long
+    range never sits in memory; 5-minute buckets fold five minute rows on the way out.
+    """
+    kind, width = HR_BUCKETS[bucket]
+    rows = (
+        queryset.annotate(bucket=Trunc('ts', kind, tzinfo=tz))
+        .values('bucket')
+        .annotate(total=Sum('bpm'), count=Count('id'), low=Min('bpm'), high=Max('bpm'))
+        .order_by('bucket')
+    )
+    return _fold(rows.iterator(chunk_size=STREAM_CHUNK_SIZE), width)
+
+
+def stream_buckets(queryset, bucket, tz=None):
+    """JSON body for a bucketed range, produced chunk by chunk with overall stats at the end"""
+    total = count = 0
+    low = high = None
+    yield '{"bucket": %s, "buckets": [' % json.dumps(bucket)
+    for index, row in enumerate(bucket_rows(queryset, bucket, tz)):
+        total += row['total']
+        count += row['count']
+        low = row['low'] if low is None else min(low, row['low'])
+        high = row['high'] if high is None else max(high, row['high'])
+        yield (',' if index else '') + json.dumps({
+            'ts': row['bucket'].isoformat(),
+            'avg_bpm': round(row['total'] / row['count'], 1),
+            'min_bpm': row['low'],
+            'max_bpm': row['high'],
+            'count': row['count'],
+        })
+    yield '], "avg_bpm": %d, "max_bpm": %d, "min_bpm": %d}' % (
+        round(total / count) if count else 0, high or 0, low or 0)
+
+
+def lttb(points, threshold):
+    """
+    Largest-Triangle-Three-Buckets downsampling of ``(x, y, ...)`` points sorted by x.
+
+    Keeps the first and last point and, from each of ``threshold - 2`` buckets in
+    between, the point forming the largest triangle with the previously kept point
+    and the average of the next bucket, which preserves peaks and troughs.
+    """
+    if threshold >= len(points) or threshold < 3:
+        return list(points)
+
+    sampled = [points[0]]
+    every = (len(points) - 2) / (threshold - 2)
+    kept = 0
+    for i in range(threshold - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_end = min(int((i + 2) * every) + 1, len(points))
+
+        next_bucket = points[end:next_end] or points[-1:]
+        avg_x = sum(p[0] for p in next_bucket) / len(next_bucket)
+        avg_y = sum(p[1] for p in next_bucket) / len(next_bucket)
+
+        ax, ay = points[kept][:2]
+        best_area, best = -1, start
+        for j in range(start, end):
+            area = abs((ax - avg_x) * (points[j][1] - ay) - (ax - points[j][0]) * (avg_y - ay))
+            if area > best_area:
+                best_area, best = area, j
+        sampled.append(points[best])
+        kept = best
+
+    sampled.append(points[-1])
+    return sampled
+
+
+def downsample(queryset, points):
+    """Raw ``(ts, bpm)`` series for a range reduced to at most ``points`` samples with LTTB"""
+    series = [
+        (ts.timestamp(), bpm, ts)
+        for ts, bpm in queryset.values_list('ts', 'bpm').iterator(chunk_size=STREAM_CHUNK_SIZE)
+    ]
+    return [{'ts': ts, 'bpm': bpm} for _, bpm, ts in lttb(series, points)]
+
+
+# ---------------------------
+# Cardio session summaries
+# ---------------------------
+
+# zone -> lower bound as a fraction of max HR; everything under 60% counts as z1
+HR_ZONES = (('z1', 0.0), ('z2', 0.6), ('z3', 0.7), ('z4', 0.8), ('z5', 0.9))
+DEFAULT_AGE = 30
+MAX_SAMPLE_GAP = timedelta(seconds=30)
+SESSION_TRACE_POINTS = 120
+
+
+def estimated_max_hr(user):
+    """220 - age, using a default age when the profile has none"""
+    age = getattr(getattr(user, 'profile', None), 'age', None) or DEFAULT_AGE
+    return 220 - age
+
+
+def _zone(bpm, max_hr):
+    name = HR_ZONES[0][0]
+    for zone, lower in HR_ZONES:
+        if bpm >= lower * max_hr:
+            name = zone
+    return name
+
+
+def summarize_session(session, max_hr):
+    """
+    Heart-rate fields for a cardio session from the samples recorded during it.
+
+    Reads ``(ts, bpm)`` for ``[started_at, ended_at]`` in one range query. Each sample
+    counts towards its zone for the time until the next sample, capped at
+    ``MAX_SAMPLE_GAP`` so watch dropouts do not inflate a zone. Returns ``{}`` when
+    no samples were recorded, leaving any client-supplied values alone.
+    """
+    samples = list(
+        HeartRateSample.objects
+        .filter(user_id=session.user_id, ts__range=(session.started_at, session.ended_at))
+        .order_by('ts')
+        .values_list('ts', 'bpm')
+    )
+    if not samples:
+        return {}
+
+    zones = {zone: 0 for zone, _ in HR_ZONES}
+    for (ts, bpm), (next_ts, _) in zip(samples, samples[1:] + [(session.ended_at, None)]):
+        zones[_zone(bpm, max_hr)] += min(next_ts - ts, MAX_SAMPLE_GAP).total_seconds()
+
+    bpms = [bpm for _, bpm in samples]
+    series = [((ts - session.started_at).total_seconds(), bpm) for ts, bpm in samples]
+    return {
+        'avg_hr': round(sum(bpms) / len(bpms)),
+        'max_hr': max(bpms),
+        'min_hr': min(bpms),
+        'hr_sample_count': len(samples),
+        'hr_zones': {zone: round(seconds) for zone, seconds in zones.items()},
+        'hr_trace': [[round(x), y] for x, y in lttb(series, SESSION_TRACE_POINTS)],
+    }
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from app.analytics import entry_nutrient_expression
+from app.models import FoodDiaryEntry
+from app.rollups import refresh_rollup
+
+
+class Command(BaseCommand):
+    help = (
+        "Re-resolve the nutrition snapshot columns of existing FoodDiaryEntry rows from their food, recipe "
+        "or meal, and refresh the daily rollups of the days touched"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help="Entries resolved per pass")
+        parser.add_argument('--start-id', type=int, default=0, help="Resume after this entry id")
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+
+        nutrients = FoodDiaryEntry.NUTRITION_FIELDS
+        last_id = options['start_id']
+        updated = 0
+        while True:
+            rows = list(
+                FoodDiaryEntry.objects.filter(id__gt=last_id).order_by('id')
+                .annotate(**{f'live_{n}': entry_nutrient_expression(n) for n in nutrients})
+                .values('id', 'user_id', 'date', *(f'live_{n}' for n in nutrients))[:chunk_size]
+            )
+            if not rows:
+                break
+
+            entries = [
+                FoodDiaryEntry(id=row['id'], **{n: row[f'live_{n}'] or 0 for n in nutrients})
+                for row in rows
+            ]
+            with transaction.atomic():
+                FoodDiaryEntry.objects.bulk_update(entries, nutrients)
+                # bulk_update skips the signals, so refresh the rollups of the days these entries count towards
+                for user_id, day in {(row['user_id'], row['date']) for row in rows}:
+                    refresh_rollup(user_id, day, sources=[FoodDiaryEntry])
+
+            updated += len(rows)
+            last_id = rows[-1]['id']
+            self.stdout.write(f"... {updated} entries (last id {last_id})")
+
+        self.stdout.write(self.style.SUCCESS(f"Backfilled nutrition for {updated} diary entries"))
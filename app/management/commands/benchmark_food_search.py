@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Q
+
+from app.models import Food, FoodBrand
+from app.search import rebuild_index, search_foods
+
+ADJECTIVES = ['organic', 'greek', 'smoked', 'roasted', 'light', 'spicy', 'whole', 'frozen', 'classic', 'crunchy']
+BASES = ['chicken', 'yogurt', 'oats', 'almond', 'salmon', 'rice', 'banana', 'cheddar', 'granola', 'tofu',
+         'spinach', 'lentil', 'turkey', 'peanut', 'quinoa', 'avocado', 'mozzarella', 'broccoli', 'tortilla', 'hummus']
+FORMS = ['bar', 'bites', 'salad', 'wrap', 'soup', 'bowl', 'butter', 'milk', 'chips', 'breast', 'slices', 'mix']
+SYLLABLES = ['ka', 'lo', 'mi', 'ne', 'ru', 'ta', 'vo', 'zi', 'be', 'do', 'fa', 'gu', 'pe', 'so', 'xa']
+DEFAULT_QUERIES = ['chicken breast', 'greek yog', 'organic oats bar', 'peanut', 'chiken', 'mozarella slices', 'brand7 granola', 'kalomi', 'tofu rutavo']
+
+
+class Command(BaseCommand):
+    help = "Measure food search latency over a synthetic food table (rolled back afterwards unless --keep)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1_000_000, help="Synthetic foods to generate")
+        parser.add_argument('--brands', type=int, default=500)
+        parser.add_argument('--repeat', type=int, default=20, help="Runs per query")
+        parser.add_argument('--query', dest='queries', action='append', help="Query to time (repeatable)")
+        parser.add_argument('--keep', action='store_true', help="Keep the synthetic rows")
+
+    def generate(self, rows, brand_count, batch_size=5000):
+        brands = FoodBrand.objects.bulk_create(
+            [FoodBrand(name=f'Brand{i} {random.choice(BASES).title()} Co') for i in range(brand_count)])
+        rng = random.Random(42)
+        # a few thousand made-up variety words give the name vocabulary a realistic long tail
+        varieties = [''.join(rng.choice(SYLLABLES) for _ in range(3)) for _ in range(5000)]
+        for start in range(0, rows, batch_size):
+            Food.objects.bulk_create([
+                Food(
+                    food_id=f'bench-{start + i}',
+                    name=f'{rng.choice(ADJECTIVES)} {rng.choice(BASES)} {rng.choice(FORMS)} {rng.choice(varieties)}'.title(),
+                    brand=rng.choice(brands) if rng.random() < 0.7 else None,
+                    calories=rng.uniform(20, 600), protein=rng.uniform(0, 40),
+                    carbs=rng.uniform(0, 80), fat=rng.uniform(0, 40),
+                )
+                for i in range(min(batch_size, rows - start))
+            ])
+
+    def timed(self, run, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        timings.sort()
+        return statistics.median(timings), timings[int(len(timings) * 0.95) - 1 if len(timings) > 1 else 0]
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1:
+            raise CommandError("--rows must be positive")
+        queries = options['queries'] or DEFAULT_QUERIES
+
+        with transaction.atomic():
+            started = time.perf_counter()
+            self.generate(options['rows'], options['brands'])
+            self.stdout.write(f"Generated {options['rows']} foods in {time.perf_counter() - started:.1f}s")
+
+            started = time.perf_counter()
+            rebuild_index()
+            self.stdout.write(f"Indexed in {time.perf_counter() - started:.1f}s")
+
+            self.stdout.write(f"{'query':<20} {'index p50':>10} {'p95':>8} {'icontains p50':>14} {'hits':>5}")
+            for query in queries:
+                index_p50, index_p95 = self.timed(lambda: search_foods(query), options['repeat'])
+                scan_p50, _ = self.timed(lambda: list(
+                    Food.objects.filter(Q(name__icontains=query) | Q(brand__name__icontains=query))[:20]
+                ), max(1, options['repeat'] // 4))
+                hits = len(search_foods(query))
+                self.stdout.write(f"{query:<20} {index_p50:>8.1f}ms {index_p95:>6.1f}ms {scan_p50:>12.1f}ms {hits:>5}")
+
+            if not options['keep']:
+                transaction.set_rollback(True)
@@ -0,0 +1,57 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from app.heart_rate import ingest_samples, parse_samples
+from app.models import HeartRateSample
+
+
+class Command(BaseCommand):
+    help = "Compare heart-rate sync throughput (samples/sec): per-row create loop vs batched ingestion"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--samples', type=int, default=10000, help="Samples per simulated watch sync")
+        parser.add_argument('--batch-size', type=int, default=2000, help="bulk_create batch size")
+
+    def legacy_loop(self, user, payload):
+        # what HeartRateViewSet.bulk used to do: one INSERT per sample
+        for sample in payload['samples']:
+            HeartRateSample.objects.create(user=user, ts=sample['ts'], bpm=sample['bpm'])
+
+    def batched(self, user, payload, batch_size):
+        samples, _ = parse_samples(payload)
+        ingest_samples(user, samples, batch_size=batch_size)
+
+    def timed(self, label, run, count):
+        """Run inside a rolled-back transaction so the database is left untouched"""
+        with transaction.atomic():
+            user = User.objects.create_user(username=f'hr-benchmark-{time.time_ns()}')
+            started = time.perf_counter()
+            run(user)
+            elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+        self.stdout.write(f"{label:<10} {count:>8} samples  {elapsed:8.3f}s  {count / elapsed:>12,.0f} samples/sec")
+        return elapsed
+
+    def handle(self, *args, **options):
+        count = options['samples']
+        if count < 1:
+            raise CommandError("--samples must be positive")
+
+        start = timezone.now().replace(microsecond=0) - timedelta(seconds=count)
+        bpms = [random.randint(55, 180) for _ in range(count)]
+        objects = {'samples': [
+            {'ts': (start + timedelta(seconds=i)).isoformat(), 'bpm': bpm} for i, bpm in enumerate(bpms)
+        ]}
+        columnar = {'start': start.isoformat(), 'deltas': [0] + [1] * (count - 1), 'bpm': bpms}
+
+        legacy = self.timed('loop', lambda user: self.legacy_loop(user, objects), count)
+        batched = self.timed('batched', lambda user: self.batched(user, objects, options['batch_size']), count)
+        self.timed('columnar', lambda user: self.batched(user, columnar, options['batch_size']), count)
+
+        self.stdout.write(self.style.SUCCESS(f"Batched ingestion is {legacy / batched:.1f}x the per-row loop"))
@@ -0,0 +1,83 @@
+import json
+import os
+import time
+
+import ijson
+from django.core.management.base import BaseCommand, CommandError
+
+from app.food_import import IMPORT_CHUNK_SIZE, import_foods, read_records
+
+# rejected records printed individually before only the count is kept
+MAX_REPORTED_ERRORS = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Stream a food composition table or branded product dump (.csv, .jsonl or .json) into the food "
+        "library, upserting foods by food_id with their brand, barcodes and portions"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="File to import")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE, help="Records written per transaction")
+        parser.add_argument('--checkpoint', help="Progress file to resume from (default: <path>.checkpoint)")
+        parser.add_argument('--restart', action='store_true', help="Ignore an existing checkpoint and start over")
+
+    def load_checkpoint(self, checkpoint, source):
+        if not os.path.exists(checkpoint):
+            return 0
+        with open(checkpoint) as handle:
+            state = json.load(handle)
+        if state.get('source') != source:
+            raise CommandError(f"{checkpoint} belongs to another import ({state.get('source')}); use --restart")
+        return state['records']
+
+    def save_checkpoint(self, checkpoint, source, records):
+        # write-then-rename so an interrupted write never leaves a truncated checkpoint
+        with open(f'{checkpoint}.tmp', 'w') as handle:
+            json.dump({'source': source, 'records': records}, handle)
+        os.replace(f'{checkpoint}.tmp', checkpoint)
+
+    def handle(self, *args, **options):
+        path = options['path']
+        chunk_size = options['chunk_size']
+        if chunk_size < 1:
+            raise CommandError("--chunk-size must be positive")
+        if not os.path.isfile(path):
+            raise CommandError(f"{path} does not exist")
+
+        source = os.path.abspath(path)
+        checkpoint = options['checkpoint'] or f'{path}.checkpoint'
+        start = 0 if options['restart'] else self.load_checkpoint(checkpoint, source)
+        if start:
+            self.stdout.write(f"Resuming after record {start}")
+
+        rejected = 0
+        started = time.perf_counter()
+
+        def on_error(number, message):
+            nonlocal rejected
+            rejected += 1
+            if rejected <= MAX_REPORTED_ERRORS:
+                self.stderr.write(f"record {number}: {message}")
+
+        def on_chunk(read, written):
+            self.save_checkpoint(checkpoint, source, read)
+            rate = (read - start) / max(time.perf_counter() - started, 1e-9)
+            self.stdout.write(f"... {read} records read, {written} foods written ({rate:,.0f} rows/sec)")
+
+        try:
+            read, written = import_foods(
+                read_records(path), chunk_size=chunk_size, start=start, on_error=on_error, on_chunk=on_chunk
+            )
+        except (ValueError, ijson.JSONError) as exc:
+            # unsupported file types and malformed JSON; the checkpoint still marks the last committed chunk
+            raise CommandError(str(exc))
+
+        if os.path.exists(checkpoint):
+            os.remove(checkpoint)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {written} foods from {read - start} records in {elapsed:.1f}s "
+            f"({(read - start) / max(elapsed, 1e-9):,.0f} rows/sec), {rejected} rejected"
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from app.search import INDEX_BATCH_SIZE, rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Re-tokenize every Food into the search index (run after bulk imports or on first deploy)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=INDEX_BATCH_SIZE, help="Foods tokenized per pass")
+
+    def handle(self, *args, **options):
+        indexed = rebuild_index(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Indexed {indexed} foods"))
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from app.models import UserWorkoutLog
+from app.records import rebuild_personal_records
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild PersonalRecord rows from the logged sets"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='users', type=int, action='append', help="Limit to a user id (repeatable)")
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if user_ids is None:
+            user_ids = (
+                UserWorkoutLog.objects.filter(sets__isnull=False)
+                .values_list('user_id', flat=True).distinct().order_by('user_id')
+            )
+
+        users = records = 0
+        for user_id in user_ids:
+            records += len(rebuild_personal_records(user_id))
+            users += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {records} personal records for {users} users"))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from app.models import FoodDiaryEntry
+from app.recents import rebuild_recent_foods
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild the per-user recent foods from the food diary"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='users', type=int, action='append', help="Limit to a user id (repeatable)")
+
+    def handle(self, *args, **options):
+        user_ids = options['users']
+        if user_ids is None:
+            user_ids = FoodDiaryEntry.objects.values_list('user_id', flat=True).distinct().order_by('user_id')
+
+        users = items = 0
+        for user_id in user_ids:
+            items += rebuild_recent_foods(user_id)
+            users += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {items} recent items for {users} users"))
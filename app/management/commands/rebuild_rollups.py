@@ -0,0 +1,46 @@
+from datetime import date, datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Min
+from django.utils import timezone
+
+from app.models import CardioSession
+from app.rollups import ROLLUP_FACETS, rebuild_rollups
+
+
+class Command(BaseCommand):
+    help = "Backfill or rebuild DailyUserRollup rows from the raw diary, activity and training logs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', help="First day to rebuild (YYYY-MM-DD). Defaults to the earliest log.")
+        parser.add_argument('--to', dest='end', help="Last day to rebuild (YYYY-MM-DD). Defaults to today.")
+        parser.add_argument('--user', dest='users', type=int, action='append', help="Limit to a user id (repeatable)")
+        parser.add_argument('--chunk-days', type=int, default=31, help="Days aggregated per pass")
+
+    def parse_day(self, value, option):
+        try:
+            return datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f"Invalid {option} date '{value}'. Use YYYY-MM-DD.")
+
+    def earliest_day(self, model):
+        if model is CardioSession:
+            first = model.objects.aggregate(first=Min('started_at'))['first']
+            # sessions count on their owner's local date, which can be a day before the server's
+            return timezone.localdate(first) - timedelta(days=1) if first else None
+        return model.objects.aggregate(first=Min('date'))['first']
+
+    def handle(self, *args, **options):
+        end = self.parse_day(options['end'], '--to') if options['end'] else date.today()
+        if options['start']:
+            start = self.parse_day(options['start'], '--from')
+        else:
+            earliest = [self.earliest_day(model) for model in ROLLUP_FACETS]
+            earliest = [day for day in earliest if day]
+            start = min(earliest) if earliest else end - timedelta(days=30)
+
+        if start > end:
+            raise CommandError("--from must not be after --to")
+
+        written = rebuild_rollups(start, end, user_ids=options['users'], chunk_days=options['chunk_days'])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} rollup rows for {start} .. {end}"))
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:04
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0002_alter_exercise_created_by_alter_mealbox_week_start'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyUserRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('calories', models.FloatField(default=0)),
+                ('protein', models.FloatField(default=0)),
+                ('carbs', models.FloatField(default=0)),
+                ('fats', models.FloatField(default=0)),
+                ('steps', models.PositiveIntegerField(default=0)),
+                ('water_ml', models.PositiveIntegerField(default=0)),
+                ('weight', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('workouts_completed', models.PositiveSmallIntegerField(default=0)),
+                ('cardio_sessions', models.PositiveSmallIntegerField(default=0)),
+                ('cardio_distance_m', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-date'],
+                'unique_together': {('user', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:09
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def drop_duplicate_samples(apps, schema_editor):
+    """Keep the first sample for every (user, ts) so the unique constraint can be added"""
+    HeartRateSample = apps.get_model('app', 'HeartRateSample')
+    duplicated = (
+        HeartRateSample.objects.values('user', 'ts')
+        .annotate(n=Count('id'), keep=Min('id'))
+        .filter(n__gt=1)
+        .order_by()
+    )
+    for row in duplicated.iterator():
+        HeartRateSample.objects.filter(user=row['user'], ts=row['ts']).exclude(id=row['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0004_activitystreak'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_samples, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='heartratesample',
+            constraint=models.UniqueConstraint(fields=('user', 'ts'), name='unique_hr_sample_user_ts'),
+        ),
+        migrations.RemoveIndex(
+            model_name='heartratesample',
+            name='app_heartra_user_id_fc7e50_idx',
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0005_heartrate_unique_user_ts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cardiosession',
+            name='hr_sample_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='cardiosession',
+            name='hr_trace',
+            field=models.JSONField(blank=True, default=list, help_text='Downsampled [seconds from start, bpm] pairs'),
+        ),
+        migrations.AddField(
+            model_name='cardiosession',
+            name='hr_zones',
+            field=models.JSONField(blank=True, default=dict, help_text='Seconds spent in each HR zone'),
+        ),
+        migrations.AddField(
+            model_name='cardiosession',
+            name='min_hr',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+    ]
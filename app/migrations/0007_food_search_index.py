@@ -0,0 +1,35 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0006_cardiosession_hr_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FoodSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=32, unique=True)),
+                ('length', models.PositiveSmallIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='FoodSearchToken',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('token', models.CharField(max_length=32)),
+                ('field', models.CharField(choices=[('name', 'Name'), ('brand', 'Brand')], default='name', max_length=5)),
+                ('position', models.PositiveSmallIntegerField(default=0)),
+                ('food', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_tokens', to='app.food')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['token', 'food'], name='app_foodsea_token_27a3f8_idx')],
+            },
+        ),
+    ]
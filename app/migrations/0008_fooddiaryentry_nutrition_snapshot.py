@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0007_food_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fooddiaryentry',
+            name='calories',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fooddiaryentry',
+            name='carbs',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fooddiaryentry',
+            name='fats',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fooddiaryentry',
+            name='fiber',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='fooddiaryentry',
+            name='protein',
+            field=models.FloatField(default=0),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0008_fooddiaryentry_nutrition_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='checkin',
+            index=models.Index(fields=['user', 'date'], name='checkin_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fooddiaryentry',
+            index=models.Index(fields=['user', 'date'], name='fooddiary_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='usermeallog',
+            index=models.Index(fields=['user', 'date'], name='meallog_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userworkoutlog',
+            index=models.Index(fields=['user', 'date'], name='workoutlog_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='waterlog',
+            index=models.Index(fields=['user', 'date'], name='waterlog_user_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='workout',
+            index=models.Index(fields=['user', 'date'], name='workout_user_date_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:26
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0009_user_date_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cardiosession',
+            index=models.Index(fields=['user', 'started_at'], name='cardio_user_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['thread', 'created_at'], name='chatmsg_thread_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='chatmessage',
+            index=models.Index(fields=['reciever', 'read_at'], name='chatmsg_reciever_read_idx'),
+        ),
+    ]
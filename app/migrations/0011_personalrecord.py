@@ -0,0 +1,38 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:34
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0010_cardio_chat_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PersonalRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('max_weight_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('max_weight_reps', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('max_weight_date', models.DateField(blank=True, null=True)),
+                ('max_reps', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('max_reps_weight_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True)),
+                ('max_reps_date', models.DateField(blank=True, null=True)),
+                ('best_e1rm_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=7, null=True)),
+                ('best_e1rm_date', models.DateField(blank=True, null=True)),
+                ('best_volume_kg', models.DecimalField(blank=True, decimal_places=2, max_digits=9, null=True)),
+                ('best_volume_date', models.DateField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exercise', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to='app.exercise')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='personal_records', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'exercise'), name='unique_pr_user_exercise')],
+            },
+        ),
+    ]
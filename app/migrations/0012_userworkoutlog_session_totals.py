@@ -0,0 +1,70 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:36
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, Sum
+
+TOTAL_FIELDS = ['total_sets', 'total_reps', 'total_volume_kg', 'total_duration_seconds', 'exercises_count']
+
+
+def fill_session_totals(apps, schema_editor):
+    """Compute the totals of existing sessions from their completed sets in one grouped pass"""
+    SetLog = apps.get_model('app', 'SetLog')
+    UserWorkoutLog = apps.get_model('app', 'UserWorkoutLog')
+    rows = (
+        SetLog.objects.filter(completed=True).values('session_id')
+        .annotate(
+            set_count=Count('id'),
+            rep_count=Sum('reps'),
+            volume=Sum(F('weight_kg') * F('reps'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+            seconds=Sum('time_seconds'),
+            exercises=Count('exercise_id', distinct=True),
+        )
+        .order_by()
+    )
+    batch = []
+    for row in rows.iterator():
+        batch.append(UserWorkoutLog(
+            id=row['session_id'], total_sets=row['set_count'], total_reps=row['rep_count'] or 0,
+            total_volume_kg=row['volume'] or 0, total_duration_seconds=row['seconds'] or 0,
+            exercises_count=row['exercises'],
+        ))
+        if len(batch) == 1000:
+            UserWorkoutLog.objects.bulk_update(batch, TOTAL_FIELDS)
+            batch = []
+    UserWorkoutLog.objects.bulk_update(batch, TOTAL_FIELDS)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0011_personalrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userworkoutlog',
+            name='exercises_count',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userworkoutlog',
+            name='total_duration_seconds',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userworkoutlog',
+            name='total_reps',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userworkoutlog',
+            name='total_sets',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='userworkoutlog',
+            name='total_volume_kg',
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=10),
+        ),
+        migrations.RunPython(fill_session_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,74 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:42
+
+import django.core.validators
+from django.db import migrations, models
+from django.db.models import F, FloatField, Sum
+
+# Recipe field -> Food field; Food values are per 100 g
+NUTRIENTS = {'calories': 'calories', 'protein': 'protein', 'carbs': 'carbs', 'fats': 'fat', 'fiber': 'fiber'}
+
+
+def fill_recipe_totals(apps, schema_editor):
+    """Store the totals of existing recipes from their ingredients in one grouped pass"""
+    Recipe = apps.get_model('app', 'Recipe')
+    RecipeIngredient = apps.get_model('app', 'RecipeIngredient')
+    rows = (
+        RecipeIngredient.objects.values('recipe_id')
+        .annotate(sum_grams=Sum('grams'), **{
+            f'sum_{field}': Sum(F(f'food__{food_field}') * F('grams') / 100.0, output_field=FloatField())
+            for field, food_field in NUTRIENTS.items()
+        })
+        .order_by()
+    )
+    recipes = [
+        Recipe(id=row['recipe_id'], total_grams=row['sum_grams'] or 0,
+               **{field: row[f'sum_{field}'] or 0 for field in NUTRIENTS})
+        for row in rows.iterator()
+    ]
+    Recipe.objects.bulk_update(recipes, ['total_grams', *NUTRIENTS], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0012_userworkoutlog_session_totals'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='calories',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='carbs',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fats',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='fiber',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='protein',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='servings',
+            field=models.PositiveSmallIntegerField(default=1, validators=[django.core.validators.MinValueValidator(1)]),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='total_grams',
+            field=models.FloatField(default=0),
+        ),
+        migrations.RunPython(fill_recipe_totals, migrations.RunPython.noop),
+    ]
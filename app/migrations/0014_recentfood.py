@@ -0,0 +1,37 @@
+# Generated by Django 5.2.4 on 2026-10-18 04:54
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0013_recipe_totals'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RecentFood',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_key', models.CharField(max_length=24)),
+                ('meal_time', models.CharField(blank=True, choices=[('breakfast', 'Breakfast'), ('lunch', 'Lunch'), ('dinner', 'Dinner'), ('snack', 'Snack')], default='', max_length=20)),
+                ('score', models.FloatField()),
+                ('times_logged', models.PositiveIntegerField(default=0)),
+                ('last_logged_at', models.DateTimeField()),
+                ('last_servings', models.FloatField(default=1.0)),
+                ('food', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.food')),
+                ('last_portion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='app.foodportion')),
+                ('meal', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.meal')),
+                ('recipe', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='app.recipe')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recent_foods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'meal_time', '-score'], name='recentfood_user_time_score')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'item_key', 'meal_time'), name='unique_recent_food_item')],
+            },
+        ),
+    ]
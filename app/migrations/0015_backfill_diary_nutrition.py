@@ -0,0 +1,63 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:10
+
+from django.db import migrations
+from django.db.models import Case, F, FloatField, Value, When
+from django.db.models.functions import Coalesce
+
+# diary nutrient -> (Food field, Meal field); Food values are per 100 g, Recipe values whole-recipe totals
+NUTRIENTS = {
+    'calories': ('calories', 'calories'),
+    'protein': ('protein', 'protein'),
+    'carbs': ('carbs', 'carbs'),
+    'fats': ('fat', 'fats'),
+    'fiber': ('fiber', 'fiber'),
+}
+CHUNK_SIZE = 1000
+
+
+def _live(nutrient):
+    food_field, meal_field = NUTRIENTS[nutrient]
+    per_serving = Case(
+        When(food__isnull=False, then=F(f'food__{food_field}') * Coalesce(F('portion__grams'), Value(100.0)) / 100.0),
+        When(meal__isnull=False, then=F(f'meal__{meal_field}')),
+        When(recipe__isnull=False, then=F(f'recipe__{nutrient}') * 1.0 / F('recipe__servings')),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return per_serving * F('servings')
+
+
+def fill_diary_snapshots(apps, schema_editor):
+    """
+    Snapshot entries logged before 0008 added the columns (still all zero), in id chunks.
+
+    Entries written since then already hold the values of the day they were logged,
+    so they are left alone.
+    """
+    FoodDiaryEntry = apps.get_model('app', 'FoodDiaryEntry')
+    pending = FoodDiaryEntry.objects.filter(**{nutrient: 0 for nutrient in NUTRIENTS})
+    last_id = 0
+    while True:
+        rows = list(
+            pending.filter(id__gt=last_id).order_by('id')
+            .annotate(**{f'live_{nutrient}': _live(nutrient) for nutrient in NUTRIENTS})
+            .values('id', *(f'live_{nutrient}' for nutrient in NUTRIENTS))[:CHUNK_SIZE]
+        )
+        if not rows:
+            return
+        FoodDiaryEntry.objects.bulk_update(
+            [FoodDiaryEntry(id=row['id'], **{n: row[f'live_{n}'] or 0 for n in NUTRIENTS}) for row in rows],
+            list(NUTRIENTS),
+        )
+        last_id = rows[-1]['id']
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0014_recentfood'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_diary_snapshots, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,79 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:40
+
+from collections import defaultdict
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.db import migrations
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats')
+USER_CHUNK_SIZE = 200
+
+
+def _zone(name):
+    try:
+        return ZoneInfo(name) if name else timezone.get_default_timezone()
+    except (ZoneInfoNotFoundError, ValueError):
+        return timezone.get_default_timezone()
+
+
+def _daily_facts(apps, user_ids):
+    """``{(user_id, date): {field: value}}`` from every source, for a chunk of users"""
+    def logs(name):
+        return apps.get_model('app', name).objects.filter(user_id__in=user_ids)
+
+    facts = defaultdict(dict)
+    nutrition = logs('FoodDiaryEntry').values('user_id', 'date').annotate(
+        **{f'total_{nutrient}': Sum(nutrient) for nutrient in NUTRIENTS})
+    for row in nutrition.order_by():
+        facts[(row['user_id'], row['date'])].update({n: row[f'total_{n}'] or 0 for n in NUTRIENTS})
+    for row in logs('DailyActivitySummary').values('user_id', 'date', 'steps'):
+        facts[(row['user_id'], row['date'])]['steps'] = row['steps']
+    for row in logs('WaterLog').values('user_id', 'date').annotate(total=Sum('amount_ml')).order_by():
+        facts[(row['user_id'], row['date'])]['water_ml'] = row['total'] or 0
+    for row in logs('Progress').values('user_id', 'date', 'weight'):
+        facts[(row['user_id'], row['date'])]['weight'] = row['weight']
+    workouts = logs('UserWorkoutLog').filter(completed=True).values('user_id', 'date').annotate(n=Count('id'))
+    for row in workouts.order_by():
+        facts[(row['user_id'], row['date'])]['workouts_completed'] = row['n']
+
+    # cardio counts on the owner's local date
+    zones = dict(apps.get_model('app', 'UserProfile').objects.filter(user_id__in=user_ids)
+                 .values_list('user_id', 'timezone'))
+    for user_id, started_at, distance in logs('CardioSession').values_list('user_id', 'started_at', 'distance_m'):
+        row = facts[(user_id, timezone.localtime(started_at, _zone(zones.get(user_id))).date())]
+        row['cardio_sessions'] = row.get('cardio_sessions', 0) + 1
+        row['cardio_distance_m'] = row.get('cardio_distance_m', 0) + (distance or 0)
+    return facts
+
+
+def fill_rollups(apps, schema_editor):
+    """
+    Build the rollup rows the dashboards read from the logs written before 0003 (or
+    while signals were bypassed), replacing whatever rows exist, a chunk of users at a time.
+    """
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    DailyUserRollup = apps.get_model('app', 'DailyUserRollup')
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    for offset in range(0, len(user_ids), USER_CHUNK_SIZE):
+        chunk = user_ids[offset:offset + USER_CHUNK_SIZE]
+        facts = _daily_facts(apps, chunk)
+        DailyUserRollup.objects.filter(user_id__in=chunk).delete()
+        DailyUserRollup.objects.bulk_create(
+            [DailyUserRollup(user_id=user_id, date=day, **values) for (user_id, day), values in facts.items()],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0015_backfill_diary_nutrition'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rollups, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:20
+
+import re
+import unicodedata
+
+from django.db import migrations
+
+MAX_TOKEN_LENGTH = 32
+CHUNK_SIZE = 2000
+
+
+def _normalize(text):
+    folded = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return [token[:MAX_TOKEN_LENGTH] for token in re.findall(r'[a-z0-9]+', folded.lower())]
+
+
+def fill_search_index(apps, schema_editor):
+    """Tokenize the names and brands of foods created before 0007, in id chunks"""
+    Food = apps.get_model('app', 'Food')
+    FoodSearchToken = apps.get_model('app', 'FoodSearchToken')
+    FoodSearchTerm = apps.get_model('app', 'FoodSearchTerm')
+    last_id = 0
+    while True:
+        rows = list(
+            Food.objects.filter(id__gt=last_id).order_by('id')
+            .values_list('id', 'name', 'brand__name')[:CHUNK_SIZE]
+        )
+        if not rows:
+            return
+        tokens = []
+        for food_id, name, brand_name in rows:
+            for field, text in (('name', name), ('brand', brand_name)):
+                tokens += [
+                    FoodSearchToken(food_id=food_id, token=token, field=field, position=position)
+                    for position, token in enumerate(_normalize(text))
+                ]
+        FoodSearchToken.objects.filter(food_id__in=[row[0] for row in rows]).delete()
+        FoodSearchToken.objects.bulk_create(tokens, batch_size=CHUNK_SIZE)
+        FoodSearchTerm.objects.bulk_create(
+            [FoodSearchTerm(term=term, length=len(term)) for term in {token.token for token in tokens}],
+            batch_size=CHUNK_SIZE, ignore_conflicts=True,
+        )
+        last_id = rows[-1][0]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0016_backfill_rollups'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_search_index, migrations.RunPython.noop),
+    ]
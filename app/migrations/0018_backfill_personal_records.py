@@ -0,0 +1,75 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:35
+
+from decimal import Decimal
+from itertools import groupby
+
+from django.conf import settings
+from django.db import migrations
+
+# the rules of app.records as of this migration
+E1RM_MAX_REPS = 12
+E1RM_FORMULA_SWITCH = 10
+CENTS = Decimal('0.01')
+USER_CHUNK_SIZE = 200
+
+
+def _e1rm(weight, reps):
+    if not weight or not reps or reps > E1RM_MAX_REPS:
+        return None
+    weight = Decimal(weight)
+    if reps == 1:
+        return weight.quantize(CENTS)
+    if reps < E1RM_FORMULA_SWITCH:
+        return (weight * 36 / (37 - reps)).quantize(CENTS)
+    return (weight * (1 + Decimal(reps) / 30)).quantize(CENTS)
+
+
+def _apply(record, weight, reps, day):
+    candidates = (
+        ('max_weight_kg', weight, {'max_weight_reps': reps, 'max_weight_date': day}),
+        ('max_reps', reps, {'max_reps_weight_kg': weight, 'max_reps_date': day}),
+        ('best_e1rm_kg', _e1rm(weight, reps), {'best_e1rm_date': day}),
+        ('best_volume_kg', (Decimal(weight) * reps).quantize(CENTS) if weight and reps else None,
+         {'best_volume_date': day}),
+    )
+    for field, value, details in candidates:
+        current = getattr(record, field)
+        if value is not None and (current is None or value > current):
+            setattr(record, field, value)
+            for name, detail in details.items():
+                setattr(record, name, detail)
+
+
+def fill_personal_records(apps, schema_editor):
+    """Fold the completed sets logged before 0011 into records, a chunk of users at a time"""
+    User = apps.get_model(settings.AUTH_USER_MODEL)
+    SetLog = apps.get_model('app', 'SetLog')
+    PersonalRecord = apps.get_model('app', 'PersonalRecord')
+    user_ids = list(User.objects.order_by('pk').values_list('pk', flat=True))
+    for offset in range(0, len(user_ids), USER_CHUNK_SIZE):
+        chunk = user_ids[offset:offset + USER_CHUNK_SIZE]
+        rows = (
+            SetLog.objects.filter(session__user_id__in=chunk, completed=True)
+            .order_by('session__user_id', 'exercise_id', 'session__date', 'id')
+            .values_list('session__user_id', 'exercise_id', 'weight_kg', 'reps', 'session__date')
+        )
+        records = []
+        for (user_id, exercise_id), sets in groupby(rows.iterator(), key=lambda row: row[:2]):
+            record = PersonalRecord(user_id=user_id, exercise_id=exercise_id)
+            for _, _, weight, reps, day in sets:
+                _apply(record, weight, reps, day)
+            records.append(record)
+        PersonalRecord.objects.filter(user_id__in=chunk).delete()
+        PersonalRecord.objects.bulk_create(records, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('app', '0017_backfill_food_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_personal_records, migrations.RunPython.noop),
+    ]
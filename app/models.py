@@ -73,6 +73,7 @@ class Workout(models.Model):
     class Meta:
         ordering = ['-date', 'name']
         unique_together = ['user', 'name', 'date']
+        indexes = [models.Index(fields=['user', 'date'], name='workout_user_date_idx')]
 
     def __str__(self):
         return f"{self.user.username}'s {self.name} on {self.date}"
@@ -293,6 +294,13 @@ class UserWorkoutLog(models.Model):
     notes = models.TextField(blank=True)
     calories_burned = models.PositiveIntegerField(null=True, blank=True)
 
+    # totals over the session's completed sets, maintained by app.signals
+    total_sets = models.PositiveIntegerField(default=0)
+    total_reps = models.PositiveIntegerField(default=0)
+    total_volume_kg = models.DecimalField(max_digits=10, decimal_places=2, default=0)
+    total_duration_seconds = models.PositiveIntegerField(default=0)
+    exercises_count = models.PositiveSmallIntegerField(default=0)
+
     @property
     def duration_actual(self):
         if self.start_time and self.end_time:
@@ -306,6 +314,7 @@ class UserWorkoutLog(models.Model):
         verbose_name = "Workout Log"
         verbose_name_plural = "Workout Logs"
         unique_together = ['user', 'workout', 'date']
+        indexes = [models.Index(fields=['user', 'date'], name='workoutlog_user_date_idx')]
 
     def __str__(self):
         status = "Completed" if self.completed else "Planned"
@@ -353,6 +362,7 @@ class UserMealLog(models.Model):
 
     class Meta:
         ordering = ['-date', '-consumed_at']
+        indexes = [models.Index(fields=['user', 'date'], name='meallog_user_date_idx')]
         verbose_name = "Meal Log"
         verbose_name_plural = "Meal Logs"
 
@@ -546,6 +556,7 @@ class WaterLog(models.Model):
 
     class Meta:
         ordering = ["-date", "-created_at"]
+        indexes = [models.Index(fields=["user", "date"], name="waterlog_user_date_idx")]
 
     def __str__(self):
         return f"{self.user.username} {self.amount_ml} ml on {self.date}"
@@ -572,7 +583,7 @@ class HeartRateSample(models.Model):
     bpm = models.PositiveSmallIntegerField()
 
     class Meta:
-        indexes = [models.Index(fields=["user", "ts"])]
+        constraints = [models.UniqueConstraint(fields=["user", "ts"], name="unique_hr_sample_user_ts")]
 
     def __str__(self):
         return f"{self.user.username} {self.bpm} bpm @ {self.ts}"
@@ -622,6 +633,7 @@ class Checkin(TimeStampedModel):
 
     class Meta:
         ordering = ["-date"]
+        indexes = [models.Index(fields=["user", "date"], name="checkin_user_date_idx")]
 
     def __str__(self):
         return f"{self.user.username} check-in {self.date}"
@@ -693,11 +705,54 @@ class FoodPortion(models.Model):
         return f"{self.food.name} - {self.name}"
 
 
+class FoodSearchToken(models.Model):
+    """Normalized name/brand tokens for food search (maintained by app.signals)"""
+    FIELD_CHOICES = [("name", "Name"), ("brand", "Brand")]
+
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, related_name="search_tokens")
+    token = models.CharField(max_length=32)
+    field = models.CharField(max_length=5, choices=FIELD_CHOICES, default="name")
+    position = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [models.Index(fields=["token", "food"])]
+
+    def __str__(self):
+        return f"{self.token} -> {self.food_id}"
+
+
+class FoodSearchTerm(models.Model):
+    """Distinct search vocabulary, used for typo-tolerant matching"""
+    term = models.CharField(max_length=32, unique=True)
+    length = models.PositiveSmallIntegerField()
+
+    def __str__(self):
+        return self.term
+
+
 class Recipe(models.Model):
     name = models.CharField(max_length=200)
     created_by = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recipes")
     is_public = models.BooleanField(default=False)
     image = models.ImageField(upload_to="recipe_images/", null=True, blank=True)
+    servings = models.PositiveSmallIntegerField(default=1, validators=[MinValueValidator(1)])
+
+    # whole-recipe totals over the ingredients, maintained by app.signals
+    total_grams = models.FloatField(default=0)
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fats = models.FloatField(default=0)
+    fiber = models.FloatField(default=0)
+
+    NUTRITION_FIELDS = ("calories", "protein", "carbs", "fats", "fiber")
+
+    def nutrition_per_serving(self):
+        return {field: getattr(self, field) / (self.servings or 1) for field in self.NUTRITION_FIELDS}
+
+    def nutrition_per_100g(self):
+        scale = 100.0 / self.total_grams if self.total_grams else 0.0
+        return {field: getattr(self, field) * scale for field in self.NUTRITION_FIELDS}
 
     def __str__(self):
         return self.name
@@ -725,14 +780,103 @@ class FoodDiaryEntry(models.Model):
 
     notes = models.CharField(max_length=255, blank=True)
 
+    # nutrition snapshot for the whole entry (servings applied), resolved when it is written
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fats = models.FloatField(default=0)
+    fiber = models.FloatField(default=0)
+
+    NUTRITION_FIELDS = ("calories", "protein", "carbs", "fats", "fiber")
+    NUTRITION_SOURCE_FIELDS = ("food_id", "recipe_id", "meal_id", "portion_id", "servings")
+
     class Meta:
         ordering = ["-date", "-time"]
+        indexes = [models.Index(fields=["user", "date"], name="fooddiary_user_date_idx")]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._nutrition_source = instance._current_nutrition_source()
+        return instance
+
+    def _current_nutrition_source(self):
+        if self.get_deferred_fields().intersection(self.NUTRITION_SOURCE_FIELDS):
+            return None
+        return tuple(getattr(self, field) for field in self.NUTRITION_SOURCE_FIELDS)
+
+    def resolve_nutrition(self, recipe=None):
+        """
+        Fill the snapshot columns from the food (scaled by portion grams, 100 g when
+        none), one serving of the recipe (its stored totals) or the curated meal,
+        times servings. Bulk writers pass a just-read ``recipe`` to skip re-reading it.
+        """
+        per_serving = dict.fromkeys(self.NUTRITION_FIELDS, 0.0)
+        if self.food_id:
+            grams = self.portion.grams if self.portion_id else 100.0
+            food = self.food
+            per_serving.update(
+                calories=food.calories, protein=food.protein, carbs=food.carbs, fats=food.fat, fiber=food.fiber)
+            per_serving = {key: value * grams / 100.0 for key, value in per_serving.items()}
+        elif self.recipe_id:
+            # read the stored totals fresh: a cached recipe instance may predate its latest ingredients
+            if recipe is None or recipe.pk != self.recipe_id:
+                recipe = Recipe.objects.only("servings", *Recipe.NUTRITION_FIELDS).get(pk=self.recipe_id)
+            per_serving.update(recipe.nutrition_per_serving())
+        elif self.meal_id:
+            meal = self.meal
+            per_serving.update(
+                calories=meal.calories, protein=meal.protein, carbs=meal.carbs, fats=meal.fats, fiber=meal.fiber)
+
+        for key, value in per_serving.items():
+            setattr(self, key, value * self.servings)
+        self._nutrition_source = self._current_nutrition_source()
+
+    def save(self, *args, **kwargs):
+        # later edits to the Food/Meal/Recipe rows must not rewrite logged history,
+        # so the snapshot is only re-resolved when what was eaten changes
+        if getattr(self, "_nutrition_source", None) != self._current_nutrition_source():
+            self.resolve_nutrition()
+            if kwargs.get("update_fields") is not None:
+                kwargs["update_fields"] = set(kwargs["update_fields"]) | set(self.NUTRITION_FIELDS)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         label = self.food.name if self.food else (self.recipe.name if self.recipe else (self.meal.name if self.meal else "Item"))
         return f"{self.user.username} - {label} ({self.date})"
 
 
+class RecentFood(models.Model):
+    """
+    How often and how lately a user logs a food, recipe or meal, per meal time
+    (plus one row across all meal times), maintained from FoodDiaryEntry creates by app.signals
+    """
+    ANY_MEAL_TIME = ""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="recent_foods")
+    item_key = models.CharField(max_length=24)  # "food:<id>", "recipe:<id>" or "meal:<id>"
+    food = models.ForeignKey(Food, on_delete=models.CASCADE, null=True, blank=True)
+    recipe = models.ForeignKey(Recipe, on_delete=models.CASCADE, null=True, blank=True)
+    meal = models.ForeignKey(Meal, on_delete=models.CASCADE, null=True, blank=True)
+    meal_time = models.CharField(max_length=20, choices=MealTime.choices, blank=True, default=ANY_MEAL_TIME)
+
+    # log2 of the time-decayed log count, taken against a fixed origin so rows rank without rescoring
+    score = models.FloatField()
+    times_logged = models.PositiveIntegerField(default=0)
+    last_logged_at = models.DateTimeField()
+    last_servings = models.FloatField(default=1.0)
+    last_portion = models.ForeignKey(FoodPortion, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "item_key", "meal_time"], name="unique_recent_food_item"),
+        ]
+        indexes = [models.Index(fields=["user", "meal_time", "-score"], name="recentfood_user_time_score")]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.item_key} ({self.meal_time or 'any'})"
+
+
 # ---------------------------
 # NEW: Exercise library + per-set logs
 # ---------------------------
@@ -822,6 +966,31 @@ class SetLog(models.Model):
         return f"{self.session_id} - {self.exercise.name} set {self.set_number}"
 
 
+class PersonalRecord(models.Model):
+    """Best completed sets per (user, exercise), maintained from SetLog writes by app.signals"""
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="personal_records")
+    exercise = models.ForeignKey(Exercise, on_delete=models.CASCADE, related_name="personal_records")
+    max_weight_kg = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    max_weight_reps = models.PositiveSmallIntegerField(null=True, blank=True)
+    max_weight_date = models.DateField(null=True, blank=True)
+    max_reps = models.PositiveSmallIntegerField(null=True, blank=True)
+    max_reps_weight_kg = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    max_reps_date = models.DateField(null=True, blank=True)
+    best_e1rm_kg = models.DecimalField(max_digits=7, decimal_places=2, null=True, blank=True)
+    best_e1rm_date = models.DateField(null=True, blank=True)
+    best_volume_kg = models.DecimalField(max_digits=9, decimal_places=2, null=True, blank=True)
+    best_volume_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "exercise"], name="unique_pr_user_exercise"),
+        ]
+
+    def __str__(self):
+        return f"{self.user.username} - {self.exercise.name} PRs"
+
+
 # ---------------------------
 # NEW: Cardio sessions (run/walk/cycle)
 # ---------------------------
@@ -844,6 +1013,15 @@ class CardioSession(TimeStampedModel):
     max_hr = models.PositiveSmallIntegerField(null=True, blank=True)
     notes = models.TextField(blank=True)
 
+    # heart-rate summary computed from HeartRateSample when the session is finished
+    min_hr = models.PositiveSmallIntegerField(null=True, blank=True)
+    hr_sample_count = models.PositiveIntegerField(default=0)
+    hr_zones = models.JSONField(default=dict, blank=True, help_text="Seconds spent in each HR zone")
+    hr_trace = models.JSONField(default=list, blank=True, help_text="Downsampled [seconds from start, bpm] pairs")
+
+    class Meta:
+        indexes = [models.Index(fields=["user", "started_at"], name="cardio_user_started_idx")]
+
     @property
     def duration(self):
         if self.ended_at:
@@ -854,6 +1032,60 @@ class CardioSession(TimeStampedModel):
         return f"{self.user.username} {self.activity} @ {self.started_at.date()}"
 
 
+# ---------------------------
+# NEW: Per-user daily rollups (maintained by app.signals)
+# ---------------------------
+
+class DailyUserRollup(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="daily_rollups")
+    date = models.DateField()
+
+    # nutrition from FoodDiaryEntry
+    calories = models.FloatField(default=0)
+    protein = models.FloatField(default=0)
+    carbs = models.FloatField(default=0)
+    fats = models.FloatField(default=0)
+
+    # activity, water and body weight
+    steps = models.PositiveIntegerField(default=0)
+    water_ml = models.PositiveIntegerField(default=0)
+    weight = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+
+    # training
+    workouts_completed = models.PositiveSmallIntegerField(default=0)
+    cardio_sessions = models.PositiveSmallIntegerField(default=0)
+    cardio_distance_m = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ["user", "date"]
+        ordering = ["-date"]
+
+    @property
+    def workout_completed(self):
+        return self.workouts_completed > 0
+
+    def __str__(self):
+        return f"{self.user.username} rollup {self.date}"
+
+
+class ActivityStreak(models.Model):
+    """Cached training streak per user (maintained by app.signals)"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name="activity_streak")
+    current_streak = models.PositiveIntegerField(default=0)
+    longest_streak = models.PositiveIntegerField(default=0)
+    last_active_date = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def current_as_of(self, day):
+        """Length of the run ending on ``day`` (0 when ``day`` itself had no activity)"""
+        return self.current_streak if self.last_active_date == day else 0
+
+    def __str__(self):
+        return f"{self.user.username} streak {self.current_streak}/{self.longest_streak}"
+
+
 # ---------------------------
 # NEW: Subscriptions, checkout, delivery
 # ---------------------------
@@ -1063,6 +1295,12 @@ class ChatMessage(TimeStampedModel):
     text = models.TextField(blank=True)
     read_at = models.DateTimeField(null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=["thread", "created_at"], name="chatmsg_thread_created_idx"),
+            models.Index(fields=["reciever", "read_at"], name="chatmsg_reciever_read_idx"),
+        ]
+
     def __str__(self):
         return f"Msg {self.id} in Thread {self.thread_id}"
 
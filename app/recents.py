@@ -0,0 +1,144 @@
+import math
+from datetime import datetime, time, timezone as dt_timezone
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from .models import FoodDiaryEntry, RecentFood
+
+# a log counts half as much after this long
+HALF_LIFE_DAYS = 14
+# scores are log2 weights measured from here; ranking never needs the current time
+SCORE_ORIGIN = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+RECENT_FOODS_LIMIT = 30
+MAX_RECENT_FOODS = 100
+REBUILD_CHUNK_SIZE = 2000
+RECENT_UPDATE_FIELDS = ('score', 'times_logged', 'last_logged_at', 'last_servings', 'last_portion')
+
+
+# ---------------------------
+# Forward-decayed scores
+# ---------------------------
+
+def _exponent(when):
+    """log2 weight of a log made at ``when``: one more for every half-life after SCORE_ORIGIN"""
+    return (when - SCORE_ORIGIN).total_seconds() / (HALF_LIFE_DAYS * 86400)
+
+
+def _log2_add(a, b):
+    """``log2(2**a + 2**b)`` without overflowing"""
+    high, low = max(a, b), min(a, b)
+    return high + math.log2(1 + 2 ** (low - high))
+
+
+def decayed_count(score, now=None):
+    """How many fresh logs ``score`` is worth at ``now``"""
+    return 2 ** (score - _exponent(now or timezone.now()))
+
+
+# ---------------------------
+# Maintenance
+# ---------------------------
+
+def item_key(entry):
+    for kind in ('food', 'recipe', 'meal'):
+        item_id = getattr(entry, f'{kind}_id')
+        if item_id:
+            return kind, f'{kind}:{item_id}'
+    return None, None
+
+
+def fold_entries(logs):
+    """
+    Fold ``(entry, logged_at)`` pairs into their users' RecentFood rows.
+
+    Each entry bumps its (item, meal time) row and the item's any-meal-time row. The
+    touched rows are read in one query and written with one ``bulk_update`` and one
+    ``bulk_create``, however many entries come in.
+    """
+    bumps = {}
+    for entry, logged_at in logs:
+        kind, key = item_key(entry)
+        if key is None:
+            continue
+        exponent = _exponent(logged_at)
+        for meal_time in (entry.meal_time, RecentFood.ANY_MEAL_TIME):
+            bump = bumps.get((entry.user_id, key, meal_time))
+            if bump is None:
+                bump = bumps[(entry.user_id, key, meal_time)] = {
+                    'kind': kind, 'item_id': getattr(entry, f'{kind}_id'), 'score': exponent, 'count': 0,
+                }
+            else:
+                bump['score'] = _log2_add(bump['score'], exponent)
+            bump['count'] += 1
+            if 'logged_at' not in bump or logged_at >= bump['logged_at']:
+                bump.update(logged_at=logged_at, servings=entry.servings, portion_id=entry.portion_id)
+    if not bumps:
+        return
+
+    existing = {
+        (row.user_id, row.item_key, row.meal_time): row
+        for row in RecentFood.objects.filter(
+            user_id__in={user_id for user_id, _, _ in bumps},
+            item_key__in={key for _, key, _ in bumps},
+            meal_time__in={meal_time for _, _, meal_time in bumps},
+        )
+    }
+    changed, created = [], []
+    for (user_id, key, meal_time), bump in bumps.items():
+        row = existing.get((user_id, key, meal_time))
+        if row is None:
+            row = RecentFood(user_id=user_id, item_key=key, meal_time=meal_time, score=bump['score'],
+                             **{f"{bump['kind']}_id": bump['item_id']})
+            created.append(row)
+        else:
+            row.score = _log2_add(row.score, bump['score'])
+            changed.append(row)
+        row.times_logged += bump['count']
+        if row.last_logged_at is None or bump['logged_at'] >= row.last_logged_at:
+            row.last_logged_at = bump['logged_at']
+            row.last_servings = bump['servings']
+            row.last_portion_id = bump['portion_id']
+
+    with transaction.atomic():
+        RecentFood.objects.bulk_update(changed, RECENT_UPDATE_FIELDS)
+        # a concurrent first log of the same item may win the insert; losing one bump is harmless
+        RecentFood.objects.bulk_create(created, ignore_conflicts=True)
+
+
+def remember_entries(entries, when=None):
+    """Count newly created diary entries as logged now (deleting an entry later keeps the habit)"""
+    when = when or timezone.now()
+    fold_entries((entry, when) for entry in entries)
+
+
+def _logged_at(entry):
+    return datetime.combine(entry.date, entry.time or time(12), tzinfo=dt_timezone.utc)
+
+
+def rebuild_recent_foods(user_id):
+    """Recompute a user's rows from the whole diary, dating each entry by its diary date and time"""
+    entries = (
+        FoodDiaryEntry.objects.filter(user_id=user_id).order_by('date', 'id')
+        .only('user', 'date', 'time', 'meal_time', 'food', 'recipe', 'meal', 'servings', 'portion')
+        .iterator(chunk_size=REBUILD_CHUNK_SIZE)
+    )
+    with transaction.atomic():
+        RecentFood.objects.filter(user_id=user_id).delete()
+        while chunk := list(islice(entries, REBUILD_CHUNK_SIZE)):
+            fold_entries((entry, _logged_at(entry)) for entry in chunk)
+    return RecentFood.objects.filter(user_id=user_id, meal_time=RecentFood.ANY_MEAL_TIME).count()
+
+
+# ---------------------------
+# Querying
+# ---------------------------
+
+def recent_items(user, meal_time=RecentFood.ANY_MEAL_TIME, limit=RECENT_FOODS_LIMIT):
+    """The user's top items for ``meal_time`` (all meal times by default), one query on the score index"""
+    return list(
+        RecentFood.objects.filter(user=user, meal_time=meal_time)
+        .select_related('food__brand', 'recipe', 'meal')
+        .order_by('-score')[:limit]
+    )
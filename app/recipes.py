@@ -0,0 +1,244 @@
+import csv
+import io
+
+from django.db import connection, transaction
+from django.db.models import F, FloatField, Sum
+
+from .analytics import NUTRIENT_FIELDS
+from .models import Food, Recipe, RecipeIngredient
+
+TOTAL_FIELDS = ('total_grams',) + Recipe.NUTRITION_FIELDS
+MAX_INGREDIENTS_PER_RECIPE = 200
+MAX_IMPORT_RECIPES = 1000
+WRITE_BATCH_SIZE = 1000
+RECIPE_NAME_LENGTH = Recipe._meta.get_field('name').max_length
+
+
+# ---------------------------
+# Stored recipe totals
+# ---------------------------
+
+def recipe_totals(recipe_ids):
+    """``{recipe_id: {field: value}}`` over the ingredients of ``recipe_ids`` in one grouped query"""
+    grams_weighted = {
+        f'sum_{nutrient}': Sum(F(f'food__{NUTRIENT_FIELDS[nutrient][0]}') * F('grams') / 100.0, output_field=FloatField())
+        for nutrient in Recipe.NUTRITION_FIELDS
+    }
+    rows = (
+        RecipeIngredient.objects.filter(recipe_id__in=recipe_ids)
+        .values('recipe_id')
+        .annotate(sum_grams=Sum('grams'), **grams_weighted)
+        .order_by()
+    )
+    return {
+        row['recipe_id']: {
+            'total_grams': row['sum_grams'] or 0,
+            **{nutrient: row[f'sum_{nutrient}'] or 0 for nutrient in Recipe.NUTRITION_FIELDS},
+        }
+        for row in rows
+    }
+
+
+def refresh_recipe_totals(recipe_ids):
+    """Recompute and store the totals of ``recipe_ids`` (recipes left without ingredients go to zero)"""
+    recipe_ids = set(recipe_ids)
+    if not recipe_ids:
+        return
+    totals = recipe_totals(recipe_ids)
+    zero = dict.fromkeys(TOTAL_FIELDS, 0)
+    Recipe.objects.bulk_update(
+        [Recipe(id=recipe_id, **totals.get(recipe_id, zero)) for recipe_id in recipe_ids],
+        TOTAL_FIELDS,
+    )
+
+
+def refresh_recipes_using(food_ids):
+    """Recompute every recipe that has one of ``food_ids`` as an ingredient"""
+    refresh_recipe_totals(
+        RecipeIngredient.objects.filter(food_id__in=food_ids).values_list('recipe_id', flat=True).distinct()
+    )
+
+
+# ---------------------------
+# Write pipeline
+# ---------------------------
+
+def load_foods(food_ids):
+    """``{food_id: {recipe nutrient: value per 100 g}}`` for the foods that exist, one query"""
+    columns = {nutrient: NUTRIENT_FIELDS[nutrient][0] for nutrient in Recipe.NUTRITION_FIELDS}
+    return {
+        row['id']: {nutrient: row[column] for nutrient, column in columns.items()}
+        for row in Food.objects.filter(id__in=set(food_ids)).values('id', *columns.values())
+    }
+
+
+def _number(value, cast):
+    if isinstance(value, bool):
+        raise ValueError
+    return cast(value)
+
+
+def parse_ingredients(items):
+    """
+    Shape-check ``[{food_id, grams}]`` without touching the database.
+
+    Returns ``(rows, errors)``: ``(food_id, grams)`` pairs and ``{'ingredient', 'error'}``
+    entries for the items that are malformed.
+    """
+    if not isinstance(items, list) or not items:
+        return [], [{'ingredient': None, 'error': 'ingredients must be a non-empty list'}]
+    if len(items) > MAX_INGREDIENTS_PER_RECIPE:
+        return [], [{'ingredient': None, 'error': f'At most {MAX_INGREDIENTS_PER_RECIPE} ingredients per recipe'}]
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            food_id = _number(item.get('food_id'), int)
+            grams = _number(item.get('grams'), float)
+        except (AttributeError, TypeError, ValueError):
+            errors.append({'ingredient': index, 'error': 'food_id must be a food id and grams a number'})
+            continue
+        if not 0 < grams < float('inf'):
+            errors.append({'ingredient': index, 'error': 'grams must be positive'})
+            continue
+        rows.append((food_id, grams))
+    return rows, errors
+
+
+def unknown_food_errors(rows, foods):
+    return [
+        {'ingredient': index, 'error': f'Food {food_id} not found'}
+        for index, (food_id, _) in enumerate(rows) if food_id not in foods
+    ]
+
+
+def apply_totals(recipe, rows, foods):
+    """Set the stored totals of an unsaved recipe from already-loaded food values (no queries)"""
+    recipe.total_grams = sum(grams for _, grams in rows)
+    for nutrient in Recipe.NUTRITION_FIELDS:
+        setattr(recipe, nutrient, sum(foods[food_id][nutrient] * grams / 100.0 for food_id, grams in rows))
+
+
+def _insert_recipes(recipes):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Recipe.objects.bulk_create(recipes, batch_size=WRITE_BATCH_SIZE)
+    # recipes have no natural key to read ids back by, so backends without RETURNING insert one by one
+    for recipe in recipes:
+        recipe.save(force_insert=True)
+    return recipes
+
+
+def write_recipes(pairs):
+    """
+    Insert ``(unsaved recipe, ingredient rows)`` pairs in one transaction.
+
+    Callers validate the food ids and fill the recipes' stored totals first (see
+    ``apply_totals``), so the ingredients can go out in ``bulk_create`` batches
+    without the per-row RecipeIngredient signals.
+    """
+    with transaction.atomic():
+        recipes = _insert_recipes([recipe for recipe, _ in pairs])
+        RecipeIngredient.objects.bulk_create(
+            [
+                RecipeIngredient(recipe=recipe, food_id=food_id, grams=grams)
+                for recipe, (_, rows) in zip(recipes, pairs) for food_id, grams in rows
+            ],
+            batch_size=WRITE_BATCH_SIZE,
+        )
+    return recipes
+
+
+def copy_recipe(original, user, **overrides):
+    """Copy a recipe and its ingredients for ``user``; the stored totals are carried over as-is"""
+    fields = {field: getattr(original, field) for field in ('name', 'image', 'servings') + TOTAL_FIELDS}
+    fields.update(overrides)
+    rows = list(original.ingredients.values_list('food_id', 'grams'))
+    return write_recipes([(Recipe(created_by=user, **fields), rows)])[0]
+
+
+# ---------------------------
+# Bulk import
+# ---------------------------
+
+def recipes_from_csv(text):
+    """
+    Group a CSV recipe book (one ingredient per row) into import specs.
+
+    Columns: ``recipe, servings, is_public, food_id, grams``. Rows sharing a recipe
+    name form one recipe; servings and is_public are read from its first row. Each
+    spec keeps the CSV line of every ingredient so errors can point back at it.
+    """
+    reader = csv.DictReader(io.StringIO(text))
+    missing = [column for column in ('recipe', 'food_id', 'grams') if column not in (reader.fieldnames or ())]
+    if missing:
+        raise ValueError(f"CSV is missing the column(s): {', '.join(missing)}")
+    specs = {}
+    for row in reader:
+        name = (row.get('recipe') or '').strip()
+        spec = specs.setdefault(name, {
+            'name': name,
+            'servings': row.get('servings') or 1,
+            'is_public': (row.get('is_public') or '').strip().lower() in ('1', 'true', 'yes'),
+            'ingredients': [],
+            'lines': [],
+        })
+        spec['ingredients'].append({'food_id': (row.get('food_id') or '').strip(), 'grams': row.get('grams')})
+        spec['lines'].append(reader.line_num)
+    return list(specs.values())
+
+
+def _recipe_fields(spec):
+    """Validated Recipe field values of an import spec, or an error message"""
+    if not isinstance(spec, dict):
+        return None, 'each recipe must be an object'
+    name = spec.get('name')
+    if not isinstance(name, str) or not name.strip() or len(name.strip()) > RECIPE_NAME_LENGTH:
+        return None, f'name must be 1-{RECIPE_NAME_LENGTH} characters'
+    try:
+        servings = _number(spec.get('servings', 1), int)
+    except (TypeError, ValueError):
+        servings = 0
+    if not 1 <= servings <= 32767:
+        return None, 'servings must be a positive whole number'
+    return {'name': name.strip(), 'servings': servings, 'is_public': bool(spec.get('is_public', False))}, None
+
+
+def import_recipes(user, specs):
+    """
+    Validate and store many recipes for ``user`` at once.
+
+    All food ids across every recipe are checked with one query. Recipes with a bad
+    field or ingredient are reported and skipped; the rest are written together by
+    ``write_recipes``. Returns one ``{'index', 'status', 'id' | 'errors'}`` result per
+    spec, in order; CSV specs also carry the line of each failing ingredient.
+    """
+    checked = []
+    for spec in specs:
+        fields, error = _recipe_fields(spec)
+        if error:
+            checked.append((None, [], [{'ingredient': None, 'error': error}]))
+        else:
+            checked.append((fields, *parse_ingredients(spec.get('ingredients'))))
+
+    foods = load_foods(food_id for _, rows, _ in checked for food_id, _ in rows)
+
+    results, pairs = [], []
+    for index, (spec, (fields, rows, errors)) in enumerate(zip(specs, checked)):
+        errors = errors or unknown_food_errors(rows, foods)
+        if errors:
+            lines = spec.get('lines') if isinstance(spec, dict) else None
+            for entry in errors:
+                if lines and entry['ingredient'] is not None:
+                    entry['line'] = lines[entry['ingredient']]
+            results.append({'index': index, 'status': 'error', 'errors': errors})
+            continue
+        recipe = Recipe(created_by=user, **fields)
+        apply_totals(recipe, rows, foods)
+        pairs.append((recipe, rows))
+        results.append({'index': index, 'status': 'created', 'recipe': recipe})
+
+    if pairs:
+        write_recipes(pairs)
+    for result in results:
+        if 'recipe' in result:
+            result['id'] = result.pop('recipe').pk
+    return results
@@ -0,0 +1,141 @@
+from decimal import Decimal
+from itertools import groupby
+
+from django.db import transaction
+
+from .models import PersonalRecord, SetLog
+
+# e1RM is not estimated above this many reps; both formulas drift badly on long sets
+E1RM_MAX_REPS = 12
+# Brzycki below this rep count, Epley from it on (the two agree at 10 reps)
+E1RM_FORMULA_SWITCH = 10
+CENTS = Decimal('0.01')
+RECORD_FIELDS = (
+    'max_weight_kg', 'max_weight_reps', 'max_weight_date',
+    'max_reps', 'max_reps_weight_kg', 'max_reps_date',
+    'best_e1rm_kg', 'best_e1rm_date', 'best_volume_kg', 'best_volume_date',
+)
+
+
+# ---------------------------
+# Per-set metrics
+# ---------------------------
+
+def estimated_1rm(weight, reps):
+    """Estimated one-rep max for a set, ``None`` when it cannot be estimated"""
+    if not weight or not reps or reps > E1RM_MAX_REPS:
+        return None
+    weight = Decimal(weight)
+    if reps == 1:
+        return weight.quantize(CENTS)
+    if reps < E1RM_FORMULA_SWITCH:
+        return (weight * 36 / (37 - reps)).quantize(CENTS)   # Brzycki
+    return (weight * (1 + Decimal(reps) / 30)).quantize(CENTS)   # Epley
+
+
+def set_volume(weight, reps):
+    return (Decimal(weight) * reps).quantize(CENTS) if weight and reps else None
+
+
+def _apply(record, weight, reps, day):
+    """Fold one completed set into ``record``; returns True when any record moved"""
+    changed = False
+    candidates = (
+        ('max_weight_kg', weight, {'max_weight_reps': reps, 'max_weight_date': day}),
+        ('max_reps', reps, {'max_reps_weight_kg': weight, 'max_reps_date': day}),
+        ('best_e1rm_kg', estimated_1rm(weight, reps), {'best_e1rm_date': day}),
+        ('best_volume_kg', set_volume(weight, reps), {'best_volume_date': day}),
+    )
+    for field, value, details in candidates:
+        current = getattr(record, field)
+        # strictly better only, so the first day a record was reached is the one kept
+        if value is not None and (current is None or value > current):
+            setattr(record, field, value)
+            for name, detail in details.items():
+                setattr(record, name, detail)
+            changed = True
+    return changed
+
+
+# ---------------------------
+# Maintenance
+# ---------------------------
+
+def record_sets(user_id, day, set_logs):
+    """
+    Fold newly logged sets from one session into their (user, exercise) records.
+
+    Existing records are read in one query; changed ones are written with one
+    ``bulk_update`` and first-time exercises with one ``bulk_create``.
+    """
+    completed = [set_log for set_log in set_logs if set_log.completed]
+    if not completed:
+        return
+    existing = {
+        record.exercise_id: record
+        for record in PersonalRecord.objects.filter(
+            user_id=user_id, exercise_id__in={set_log.exercise_id for set_log in completed})
+    }
+    created, changed = {}, {}
+    for set_log in completed:
+        record = existing.get(set_log.exercise_id)
+        if record is None:
+            record = created.setdefault(
+                set_log.exercise_id, PersonalRecord(user_id=user_id, exercise_id=set_log.exercise_id))
+        if _apply(record, set_log.weight_kg, set_log.reps, day) and set_log.exercise_id in existing:
+            changed[set_log.exercise_id] = record
+
+    with transaction.atomic():
+        PersonalRecord.objects.bulk_update(list(changed.values()), RECORD_FIELDS)
+        PersonalRecord.objects.bulk_create(list(created.values()))
+
+
+def record_set(set_log):
+    """Fold one newly logged set into its (user, exercise) record"""
+    session = set_log.session
+    record_sets(session.user_id, session.date, [set_log])
+
+
+def rebuild_personal_records(user_id, exercise_ids=None, create=True):
+    """
+    Recompute records from scratch for a user (optionally only some exercises).
+
+    Completed sets are read in one pass ordered by exercise and date and folded in
+    Python, so the cost stays flat however many exercises the user has trained.
+    Used after edits and deletes, which can lower a record. Records whose sets are
+    all gone are removed; with ``create=False`` no new record rows are added (used on
+    deletes, where the user itself may be going away).
+    """
+    sets = SetLog.objects.filter(session__user_id=user_id, completed=True)
+    existing = PersonalRecord.objects.filter(user_id=user_id)
+    if exercise_ids is not None:
+        sets = sets.filter(exercise_id__in=exercise_ids)
+        existing = existing.filter(exercise_id__in=exercise_ids)
+    existing = {record.exercise_id: record for record in existing}
+    rows = (
+        sets.order_by('exercise_id', 'session__date', 'id')
+        .values_list('exercise_id', 'weight_kg', 'reps', 'session__date')
+    )
+
+    fresh = {}
+    for exercise_id, exercise_sets in groupby(rows.iterator(), key=lambda row: row[0]):
+        record = fresh[exercise_id] = PersonalRecord(user_id=user_id, exercise_id=exercise_id)
+        for _, weight, reps, day in exercise_sets:
+            _apply(record, weight, reps, day)
+
+    updated, gone = [], []
+    for exercise_id, record in existing.items():
+        if exercise_id in fresh:
+            for field in RECORD_FIELDS:
+                setattr(record, field, getattr(fresh[exercise_id], field))
+            updated.append(record)
+        else:
+            gone.append(record.id)
+
+    with transaction.atomic():
+        PersonalRecord.objects.filter(id__in=gone).delete()
+        PersonalRecord.objects.bulk_update(updated, RECORD_FIELDS)
+        if create:
+            PersonalRecord.objects.bulk_create(
+                [record for exercise_id, record in fresh.items() if exercise_id not in existing])
+    return list(fresh.values())
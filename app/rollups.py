@@ -0,0 +1,265 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+
+from .analytics import diary_totals
+from .dates import date_window, local_date, timezone_for, timezones_for
+from .models import (
+    CardioSession, DailyActivitySummary, DailyUserRollup, FoodDiaryEntry, Progress,
+    UserWorkoutLog, WaterLog,
+)
+
+NUTRIENTS = ('calories', 'protein', 'carbs', 'fats')
+
+
+# ---------------------------
+# Per-source facets for a single (user, date)
+# ---------------------------
+
+def _nutrition(user_id, day):
+    return diary_totals(FoodDiaryEntry.objects.filter(user_id=user_id, date=day), NUTRIENTS)
+
+
+def _activity(user_id, day):
+    steps = DailyActivitySummary.objects.filter(user_id=user_id, date=day).values_list('steps', flat=True).first()
+    return {'steps': steps or 0}
+
+
+def _water(user_id, day):
+    total = WaterLog.objects.filter(user_id=user_id, date=day).aggregate(total=Sum('amount_ml'))['total']
+    return {'water_ml': total or 0}
+
+
+def _weight(user_id, day):
+    return {'weight': Progress.objects.filter(user_id=user_id, date=day).values_list('weight', flat=True).first()}
+
+
+def _training(user_id, day):
+    count = UserWorkoutLog.objects.filter(user_id=user_id, date=day, completed=True).count()
+    return {'workouts_completed': count}
+
+
+def _cardio(user_id, day):
+    window = date_window('started_at', day, day, timezone_for(user_id))
+    totals = CardioSession.objects.filter(window, user_id=user_id).aggregate(
+        sessions=Count('id'), distance=Sum('distance_m'))
+    return {'cardio_sessions': totals['sessions'], 'cardio_distance_m': totals['distance'] or 0}
+
+
+ROLLUP_FACETS = {
+    FoodDiaryEntry: _nutrition,
+    DailyActivitySummary: _activity,
+    WaterLog: _water,
+    Progress: _weight,
+    UserWorkoutLog: _training,
+    CardioSession: _cardio,
+}
+
+
+# the field that decides which rollup day a source row counts towards, when not ``date``
+ROLLUP_DATE_FIELDS = {CardioSession: 'started_at'}
+
+
+def owner_timezone(row):
+    """``timezone_for`` the row's owner, kept on the row: one save runs several handlers that need it"""
+    cached = getattr(row, '_owner_timezone', None)
+    if cached is None or cached[0] != row.user_id:
+        cached = row._owner_timezone = (row.user_id, timezone_for(row.user_id))
+    return cached[1]
+
+
+def rollup_date(model, row):
+    """
+    The rollup day a row of ``model`` contributes to (cardio uses the owner's local date).
+
+    ``row`` is a ``model`` instance, or anything else carrying its ``user_id`` and date field.
+    Cardio days are fixed by the time zone at write time; ``rebucket_cardio`` moves them
+    when the owner changes it.
+    """
+    if model is CardioSession:
+        return local_date(row.started_at, owner_timezone(row))
+    return row.date
+
+
+def refresh_rollup(user_id, day, sources=None, create=True):
+    """
+    Recompute the rollup row for one (user, date).
+
+    Only the facets fed by ``sources`` are recomputed, so a water log touches the
+    water column and nothing else. With ``create=False`` a missing row is left
+    missing (used on deletes, where the user itself may be going away).
+    """
+    values = {}
+    for model in sources or ROLLUP_FACETS:
+        values.update(ROLLUP_FACETS[model](user_id, day))
+    if create:
+        DailyUserRollup.objects.update_or_create(user_id=user_id, date=day, defaults=values)
+    else:
+        DailyUserRollup.objects.filter(user_id=user_id, date=day).update(**values)
+
+
+# ---------------------------
+# Set-based rebuild for backfills
+# ---------------------------
+
+def collect_daily_facts(start, end, user_ids=None):
+    """
+    Aggregate every source once for a date range, grouped by (user, date).
+
+    Returns ``{(user_id, date): {field: value}}`` with only the fields that had data.
+    """
+    def scoped(queryset, date_field='date'):
+        queryset = queryset.filter(**{f'{date_field}__gte': start, f'{date_field}__lte': end})
+        if user_ids is not None:
+            queryset = queryset.filter(user_id__in=user_ids)
+        return queryset
+
+    facts = defaultdict(dict)
+
+    nutrition = scoped(FoodDiaryEntry.objects.all()).values('user_id', 'date').annotate(**{
+        f'total_{nutrient}': Sum(nutrient) for nutrient in NUTRIENTS
+    })
+    for row in nutrition.order_by():
+        facts[(row['user_id'], row['date'])].update({n: row[f'total_{n}'] or 0 for n in NUTRIENTS})
+
+    for row in scoped(DailyActivitySummary.objects.all()).values('user_id', 'date', 'steps'):
+        facts[(row['user_id'], row['date'])]['steps'] = row['steps']
+
+    water = scoped(WaterLog.objects.all()).values('user_id', 'date').annotate(total=Sum('amount_ml'))
+    for row in water.order_by():
+        facts[(row['user_id'], row['date'])]['water_ml'] = row['total'] or 0
+
+    for row in scoped(Progress.objects.all()).values('user_id', 'date', 'weight'):
+        facts[(row['user_id'], row['date'])]['weight'] = row['weight']
+
+    workouts = scoped(UserWorkoutLog.objects.filter(completed=True)).values('user_id', 'date').annotate(n=Count('id'))
+    for row in workouts.order_by():
+        facts[(row['user_id'], row['date'])]['workouts_completed'] = row['n']
+
+    # sessions are bucketed on each owner's local date; the window is padded by a day
+    # either side so every time zone is covered, and the padding is dropped below
+    cardio = CardioSession.objects.filter(
+        date_window('started_at', start - timedelta(days=1), end + timedelta(days=1))
+    )
+    if user_ids is not None:
+        cardio = cardio.filter(user_id__in=user_ids)
+    cardio = list(cardio.values_list('user_id', 'started_at', 'distance_m'))
+    zones = timezones_for({user_id for user_id, _, _ in cardio})
+    for user_id, started_at, distance in cardio:
+        day = local_date(started_at, zones[user_id])
+        if start <= day <= end:
+            row = facts[(user_id, day)]
+            row['cardio_sessions'] = row.get('cardio_sessions', 0) + 1
+            row['cardio_distance_m'] = row.get('cardio_distance_m', 0) + (distance or 0)
+
+    return facts
+
+
+def rebuild_rollups(start, end, user_ids=None, chunk_days=31, batch_size=1000):
+    """
+    Replace rollup rows in ``[start, end]`` with values recomputed from the raw logs.
+
+    Works through the range ``chunk_days`` at a time so memory stays bounded on
+    large backfills. Returns the number of rollup rows written.
+    """
+    written = 0
+    chunk_start = start
+    while chunk_start <= end:
+        chunk_end = min(chunk_start + timedelta(days=chunk_days - 1), end)
+        facts = collect_daily_facts(chunk_start, chunk_end, user_ids)
+
+        with transaction.atomic():
+            stale = DailyUserRollup.objects.filter(date__gte=chunk_start, date__lte=chunk_end)
+            if user_ids is not None:
+                stale = stale.filter(user_id__in=user_ids)
+            stale.delete()
+            DailyUserRollup.objects.bulk_create(
+                [DailyUserRollup(user_id=user_id, date=day, **values) for (user_id, day), values in facts.items()],
+                batch_size=batch_size,
+            )
+
+        written += len(facts)
+        chunk_start = chunk_end + timedelta(days=1)
+    return written
+
+
+def rebucket_cardio(user_id):
+    """
+    Rebuild a user's rollups over the days their cardio sessions span after a time zone
+    change, so every session counts on its new local date. Returns the rows written.
+    """
+    span = CardioSession.objects.filter(user_id=user_id).aggregate(first=Min('started_at'), last=Max('started_at'))
+    if span['first'] is None:
+        return 0
+    # a day either side covers the sessions' old and new local dates, whatever the two zones
+    return rebuild_rollups(span['first'].date() - timedelta(days=1), span['last'].date() + timedelta(days=1),
+                           user_ids=[user_id])
+
+
+# ---------------------------
+# Week windows for the weekly analytics views
+# ---------------------------
+
+DAY_FACT_DEFAULTS = {
+    'calories': 0, 'protein': 0, 'carbs': 0, 'fats': 0,
+    'steps': 0, 'water_ml': 0, 'weight': None,
+    'workouts_completed': 0, 'cardio_sessions': 0, 'cardio_distance_m': 0,
+}
+
+
+def load_week_windows(user, first_week_start, weeks=1):
+    """
+    Dense per-day facts for ``weeks`` consecutive weeks starting at ``first_week_start``.
+
+    All weeks come from a single range query; days without a rollup row are filled
+    with zeros so every window has exactly seven entries.
+    """
+    last_day = first_week_start + timedelta(days=7 * weeks - 1)
+    rows = {
+        row['date']: row
+        for row in DailyUserRollup.objects
+        .filter(user=user, date__range=[first_week_start, last_day])
+        .values('date', *DAY_FACT_DEFAULTS)
+    }
+
+    windows = []
+    for week in range(weeks):
+        week_start = first_week_start + timedelta(weeks=week)
+        days = []
+        for offset in range(7):
+            day = week_start + timedelta(days=offset)
+            days.append({**DAY_FACT_DEFAULTS, **rows.get(day, {}), 'date': day})
+        windows.append({'week_start': week_start, 'week_end': week_start + timedelta(days=6), 'days': days})
+    return windows
+
+
+def weights_as_of(user, days):
+    """
+    Latest Progress weight on or before each of ``days``, as ``{day: weight}``.
+
+    Uses two queries however many days are asked for: the last entry before the
+    earliest day, then every entry inside the span.
+    """
+    days = sorted(days)
+    if not days:
+        return {}
+    anchor = (
+        Progress.objects.filter(user=user, date__lte=days[0])
+        .order_by('-date').values_list('date', 'weight').first()
+    )
+    entries = list(
+        Progress.objects.filter(user=user, date__gt=days[0], date__lte=days[-1])
+        .order_by('date').values_list('date', 'weight')
+    )
+
+    result = {}
+    current = anchor[1] if anchor else None
+    position = 0
+    for day in days:
+        while position < len(entries) and entries[position][0] <= day:
+            current = entries[position][1]
+            position += 1
+        result[day] = current
+    return result
@@ -0,0 +1,208 @@
+import re
+import unicodedata
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Max, Q, Value, When
+from rapidfuzz import fuzz, process
+
+from .models import Food, FoodSearchTerm, FoodSearchToken
+
+MAX_TOKEN_LENGTH = 32
+MAX_QUERY_TOKENS = 6
+MIN_PREFIX_LENGTH = 2
+INDEX_BATCH_SIZE = 2000
+
+# ranking weights, applied per candidate food
+SCORE_EXACT_NAME = 100
+SCORE_OWN_CUSTOM = 40
+SCORE_LEADING = 20
+SCORE_EXACT_TOKEN = 10
+SCORE_BRAND = 8
+
+FUZZY_CUTOFF = 75
+FUZZY_MIN_LENGTH = 3
+FUZZY_LENGTH_SLACK = 2
+
+
+# ---------------------------
+# Normalization
+# ---------------------------
+
+def normalize(text):
+    """Lowercase ASCII word tokens with accents folded (``"Crème Brûlée"`` -> ``["creme", "brulee"]``)"""
+    folded = unicodedata.normalize('NFKD', text or '').encode('ascii', 'ignore').decode('ascii')
+    return [token[:MAX_TOKEN_LENGTH] for token in re.findall(r'[a-z0-9]+', folded.lower())]
+
+
+# ---------------------------
+# Index maintenance
+# ---------------------------
+
+def _brand_tokens(food_id, brand_name):
+    return [
+        FoodSearchToken(food_id=food_id, token=token, field='brand', position=position)
+        for position, token in enumerate(normalize(brand_name))
+    ]
+
+
+def _food_tokens(food):
+    tokens = [
+        FoodSearchToken(food_id=food.id, token=token, field='name', position=position)
+        for position, token in enumerate(normalize(food.name))
+    ]
+    if food.brand_id:
+        tokens += _brand_tokens(food.id, food.brand.name)
+    return tokens
+
+
+def _write_tokens(tokens):
+    FoodSearchToken.objects.bulk_create(tokens, batch_size=INDEX_BATCH_SIZE)
+    terms = {token.token for token in tokens}
+    FoodSearchTerm.objects.bulk_create(
+        [FoodSearchTerm(term=term, length=len(term)) for term in terms],
+        batch_size=INDEX_BATCH_SIZE, ignore_conflicts=True,
+    )
+
+
+def index_foods(foods):
+    """Replace the search tokens of ``foods`` (brands should be select_related)"""
+    foods = list(foods)
+    with transaction.atomic():
+        FoodSearchToken.objects.filter(food__in=[food.id for food in foods]).delete()
+        _write_tokens([token for food in foods for token in _food_tokens(food)])
+
+
+def index_brand(brand):
+    """Refresh the brand tokens of every food carrying ``brand``"""
+    food_ids = list(Food.objects.filter(brand=brand).values_list('id', flat=True))
+    with transaction.atomic():
+        FoodSearchToken.objects.filter(field='brand', food__in=food_ids).delete()
+        _write_tokens([token for food_id in food_ids for token in _brand_tokens(food_id, brand.name)])
+
+
+def drop_brand_tokens(brand):
+    FoodSearchToken.objects.filter(field='brand', food__brand=brand).delete()
+
+
+def rebuild_index(batch_size=INDEX_BATCH_SIZE):
+    """Re-tokenize every food in id order, ``batch_size`` at a time. Returns the food count."""
+    indexed = 0
+    last_id = 0
+    while True:
+        batch = list(
+            Food.objects.select_related('brand').filter(id__gt=last_id).order_by('id')[:batch_size]
+        )
+        if not batch:
+            return indexed
+        index_foods(batch)
+        indexed += len(batch)
+        last_id = batch[-1].id
+
+
+# ---------------------------
+# Querying
+# ---------------------------
+
+def _prefix(token, field='token'):
+    # tokens are [a-z0-9], so bumping the last character bounds the prefix as an index range
+    # (``startswith`` becomes LIKE, which SQLite cannot serve from the index)
+    return Q(**{f'{field}__gte': token, f'{field}__lt': token[:-1] + chr(ord(token[-1]) + 1)})
+
+
+def _flag(condition):
+    return Max(Case(When(condition, then=Value(1)), default=Value(0), output_field=IntegerField()))
+
+
+def ranked_food_ids(tokens, user=None, raw_query='', limit=20, prefix_last=True, exclude=()):
+    """
+    Ids of foods whose name or brand contains every token, best match first.
+
+    Every token must match exactly, except the last, which may be a prefix of an
+    indexed token (search-as-you-type). Foods matching all tokens are found with
+    one semi-join per token on the (token, food) index, then grouped and ranked
+    in SQL by these signals:
+
+    - exact full-name match
+    - the user's own custom foods
+    - a name starting with the query
+    - how many tokens matched exactly
+    - a brand hit
+    """
+    conditions = []
+    for i, token in enumerate(tokens):
+        if prefix_last and i == len(tokens) - 1 and len(token) >= MIN_PREFIX_LENGTH:
+            conditions.append(_prefix(token))
+        else:
+            conditions.append(Q(token=token))
+
+    own = Q(food__is_custom=True, food__created_by=user) if user else Q(pk__in=[])
+    rows = FoodSearchToken.objects.filter(reduce(or_, conditions)).exclude(food__in=exclude)
+    for condition in conditions if len(conditions) > 1 else ():
+        # semi-join per token keeps only foods matching all of them before anything is grouped
+        rows = rows.filter(food__in=FoodSearchToken.objects.filter(condition).values('food_id'))
+
+    rows = (
+        rows.values('food_id')
+        .annotate(
+            exact_tokens=Count('token', filter=Q(token__in=tokens), distinct=True),
+            brand_hit=_flag(Q(field='brand')),
+            leading=_flag(Q(field='name', position=0) & conditions[0]),
+            exact_name=_flag(Q(food__name__iexact=raw_query.strip())),
+            own=_flag(own),
+        )
+        .annotate(score=(
+            F('exact_name') * SCORE_EXACT_NAME
+            + F('own') * SCORE_OWN_CUSTOM
+            + F('leading') * SCORE_LEADING
+            + F('exact_tokens') * SCORE_EXACT_TOKEN
+            + F('brand_hit') * SCORE_BRAND
+        ))
+        .order_by('-score', 'food_id')
+    )
+    return list(rows.values_list('food_id', flat=True)[:limit])
+
+
+def fuzzy_corrections(tokens):
+    """
+    Closest indexed term for each token, using RapidFuzz over a narrowed vocabulary.
+
+    Candidates share the token's first or second letter and are within a couple of
+    characters of its length, which keeps the comparison set small on large tables.
+    Short tokens and tokens with no close term are kept as they are.
+    """
+    corrected = []
+    for token in tokens:
+        if len(token) < FUZZY_MIN_LENGTH:
+            corrected.append(token)
+            continue
+        candidates = FoodSearchTerm.objects.filter(
+            _prefix(token[:1], 'term') | _prefix(token[1:2], 'term'),
+            length__gte=len(token) - FUZZY_LENGTH_SLACK,
+            length__lte=len(token) + FUZZY_LENGTH_SLACK,
+        ).values_list('term', flat=True)
+        best = process.extractOne(token, list(candidates), scorer=fuzz.ratio, score_cutoff=FUZZY_CUTOFF)
+        corrected.append(best[0] if best else token)
+    return corrected
+
+
+def search_foods(query, user=None, limit=20):
+    """
+    Ranked foods for a free-text query.
+
+    Runs the exact/prefix index search first. If it returns fewer than ``limit``
+    foods, the rest is filled with results for the typo-corrected query.
+    """
+    tokens = normalize(query)[:MAX_QUERY_TOKENS]
+    if not tokens:
+        return []
+
+    ids = ranked_food_ids(tokens, user, query, limit)
+    if len(ids) < limit:
+        corrected = fuzzy_corrections(tokens)
+        if corrected != tokens:
+            ids += ranked_food_ids(corrected, user, query, limit - len(ids), prefix_last=False, exclude=ids)
+
+    foods = Food.objects.select_related('brand').prefetch_related('portions').in_bulk(ids)
+    return [foods[food_id] for food_id in ids if food_id in foods]
@@ -1,9 +1,34 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery
 from .models import *
 from datetime import date, datetime
 
 
+# ---------------------------
+# Eager loading
+# ---------------------------
+
+class EagerLoadingMixin:
+    """
+    Serializers list the relations they render so viewsets can load them up front.
+
+    ``select_related_fields`` / ``prefetch_related_fields`` mirror the nested fields;
+    ``setup_eager_loading`` applies them and is called automatically by viewsets
+    using ``EagerLoadingViewSetMixin``.
+    """
+    select_related_fields = []
+    prefetch_related_fields = []
+
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        if cls.select_related_fields:
+            queryset = queryset.select_related(*cls.select_related_fields)
+        if cls.prefetch_related_fields:
+            queryset = queryset.prefetch_related(*cls.prefetch_related_fields)
+        return queryset
+
+
 # ---------------------------
 # User & Auth Serializers
 # ---------------------------
@@ -133,8 +158,12 @@ class WorkoutExerciseSerializer(serializers.ModelSerializer):
         ]
 
 
-class WorkoutSerializer(serializers.ModelSerializer):
+class WorkoutSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     items = WorkoutExerciseSerializer(many=True, read_only=True)
+    prefetch_related_fields = [
+        Prefetch('items', queryset=WorkoutExercise.objects.select_related('exercise__primary_muscle')),
+        'items__exercise__secondary_muscles',
+    ]
     
     class Meta:
         model = Workout
@@ -156,10 +185,20 @@ class SetLogSerializer(serializers.ModelSerializer):
         ]
 
 
-class UserWorkoutLogSerializer(serializers.ModelSerializer):
+SESSION_TOTAL_FIELDS = ['total_sets', 'total_reps', 'total_volume_kg', 'total_duration_seconds', 'exercises_count']
+
+
+class UserWorkoutLogSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     workout = WorkoutSerializer(read_only=True)
     sets = SetLogSerializer(many=True, read_only=True)
     duration_actual = serializers.DurationField(read_only=True)
+    select_related_fields = ['workout']
+    prefetch_related_fields = [
+        Prefetch('workout__items', queryset=WorkoutExercise.objects.select_related('exercise__primary_muscle')),
+        'workout__items__exercise__secondary_muscles',
+        Prefetch('sets', queryset=SetLog.objects.select_related('exercise__primary_muscle')),
+        'sets__exercise__secondary_muscles',
+    ]
     
     class Meta:
         model = UserWorkoutLog
@@ -167,7 +206,23 @@ class UserWorkoutLogSerializer(serializers.ModelSerializer):
             'id', 'workout', 'date', 'start_time', 'end_time',
             'completed', 'satisfaction', 'notes', 'calories_burned',
             'sets', 'duration_actual'
-        ]
+        ] + SESSION_TOTAL_FIELDS
+        read_only_fields = SESSION_TOTAL_FIELDS
+
+
+class UserWorkoutLogSummarySerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """History rows without the nested sets, using the stored session totals"""
+    workout_name = serializers.CharField(source='workout.name', read_only=True)
+    duration_actual = serializers.DurationField(read_only=True)
+    select_related_fields = ['workout']
+
+    class Meta:
+        model = UserWorkoutLog
+        fields = [
+            'id', 'workout', 'workout_name', 'date', 'start_time', 'end_time',
+            'completed', 'satisfaction', 'calories_burned', 'duration_actual'
+        ] + SESSION_TOTAL_FIELDS
+        read_only_fields = fields
 
 class WorkoutLogCreateSerializer(serializers.ModelSerializer):
     class Meta:
@@ -193,6 +248,19 @@ class SetLogCreateSerializer(serializers.ModelSerializer):
         ]
 
 
+class SetLogBatchItemSerializer(serializers.ModelSerializer):
+    """One set of an add_sets batch; exercise ids are checked together by the view in one query"""
+    exercise = serializers.IntegerField(source='exercise_id')
+
+    class Meta:
+        model = SetLog
+        fields = [
+            'exercise', 'order', 'set_number', 'reps',
+            'weight_kg', 'time_seconds', 'distance_m', 'rpe',
+            'completed', 'notes'
+        ]
+
+
 
 class CardioSessionSerializer(serializers.ModelSerializer):
     duration = serializers.ReadOnlyField()
@@ -201,9 +269,10 @@ class CardioSessionSerializer(serializers.ModelSerializer):
         model = CardioSession
         fields = [
             'id', 'activity', 'started_at', 'ended_at', 'distance_m',
-            'calories', 'avg_hr', 'max_hr', 'notes', 'duration',
-            'created_at'
+            'calories', 'avg_hr', 'max_hr', 'min_hr', 'hr_sample_count',
+            'hr_zones', 'hr_trace', 'notes', 'duration', 'created_at'
         ]
+        read_only_fields = ['min_hr', 'hr_sample_count', 'hr_zones', 'hr_trace']
 
 
 # ---------------------------
@@ -221,9 +290,11 @@ class FoodPortionSerializer(serializers.ModelSerializer):
         model = FoodPortion
         fields = ['id', 'name', 'unit', 'quantity', 'grams']
 
-class FoodSerializer(serializers.ModelSerializer):
+class FoodSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     portions = FoodPortionSerializer(many=True, read_only=True)
+    select_related_fields = ['brand']
+    prefetch_related_fields = ['portions']
 
     class Meta:
         model = Food
@@ -269,33 +340,152 @@ class RecipeIngredientSerializer(serializers.ModelSerializer):
         fields = ['id', 'food', 'food_id', 'grams']
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    ingredients = RecipeIngredientSerializer(many=True, read_only=True)
+RECIPE_TOTAL_FIELDS = ['total_grams', 'calories', 'protein', 'carbs', 'fats', 'fiber']
+
+
+def _rounded(values):
+    return {key: round(value, 2) for key, value in values.items()}
+
+
+class RecipeSummarySerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """Recipe with its stored totals and per-serving / per-100 g macros, without the ingredient tree"""
     created_by_username = serializers.CharField(source='created_by.username', read_only=True)
-    
+    per_serving = serializers.SerializerMethodField()
+    per_100g = serializers.SerializerMethodField()
+    select_related_fields = ['created_by']
+
     class Meta:
         model = Recipe
         fields = [
             'id', 'name', 'created_by', 'created_by_username',
-            'is_public', 'image', 'ingredients'
-        ]
+            'is_public', 'image', 'servings', 'per_serving', 'per_100g'
+        ] + RECIPE_TOTAL_FIELDS
+        read_only_fields = fields
+
+    def get_per_serving(self, obj):
+        return _rounded(obj.nutrition_per_serving())
+
+    def get_per_100g(self, obj):
+        return _rounded(obj.nutrition_per_100g())
+
+
+class RecipeSerializer(RecipeSummarySerializer):
+    ingredients = RecipeIngredientSerializer(many=True, read_only=True)
+    prefetch_related_fields = [
+        Prefetch('ingredients', queryset=RecipeIngredient.objects.select_related('food__brand')),
+        'ingredients__food__portions',
+    ]
+    
+    class Meta(RecipeSummarySerializer.Meta):
+        fields = RecipeSummarySerializer.Meta.fields + ['ingredients']
+        read_only_fields = RECIPE_TOTAL_FIELDS
+
 
+class RecentFoodSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    """A food, recipe or meal the user logs often, with what they logged last time for one-tap re-logging"""
+    type = serializers.SerializerMethodField()
+    item = serializers.SerializerMethodField()
+    select_related_fields = ['food__brand', 'recipe', 'meal']
 
-class FoodDiaryEntrySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = RecentFood
+        fields = [
+            'type', 'item', 'meal_time', 'times_logged', 'last_logged_at', 'last_servings', 'last_portion'
+        ]
+        read_only_fields = fields
+
+    def get_type(self, obj):
+        return obj.item_key.split(':', 1)[0]
+
+    def get_item(self, obj):
+        if obj.food_id:
+            food = obj.food
+            return {
+                'id': food.id, 'name': food.name, 'brand_name': food.brand.name if food.brand_id else None,
+                'calories': food.calories, 'protein': food.protein, 'carbs': food.carbs, 'fat': food.fat,
+            }
+        if obj.recipe_id:
+            return {'id': obj.recipe.id, 'name': obj.recipe.name, **_rounded(obj.recipe.nutrition_per_serving())}
+        meal = obj.meal
+        return {
+            'id': meal.id, 'name': meal.name,
+            'calories': meal.calories, 'protein': meal.protein, 'carbs': meal.carbs, 'fats': meal.fats,
+        }
+
+
+class FoodDiaryEntrySerializer(EagerLoadingMixin, serializers.ModelSerializer):
     food_details = FoodSerializer(source='food', read_only=True)
     recipe_details = RecipeSerializer(source='recipe', read_only=True)
     meal_details = MealSerializer(source='meal', read_only=True)
     portion_details = FoodPortionSerializer(source='portion', read_only=True)
+    total_calories = serializers.FloatField(source='calories', read_only=True)
+    total_protein = serializers.FloatField(source='protein', read_only=True)
+    total_carbs = serializers.FloatField(source='carbs', read_only=True)
+    total_fats = serializers.FloatField(source='fats', read_only=True)
+    total_fiber = serializers.FloatField(source='fiber', read_only=True)
+    select_related_fields = ['food__brand', 'recipe__created_by', 'meal', 'portion']
+    prefetch_related_fields = [
+        'food__portions',
+        Prefetch('recipe__ingredients', queryset=RecipeIngredient.objects.select_related('food__brand')),
+        'recipe__ingredients__food__portions',
+    ]
     
     class Meta:
         model = FoodDiaryEntry
         fields = [
             'id', 'date', 'time', 'meal_time', 'food', 'food_details',
             'recipe', 'recipe_details', 'meal', 'meal_details',
-            'portion', 'portion_details', 'servings', 'notes'
+            'portion', 'portion_details', 'servings', 'notes',
+            'total_calories', 'total_protein', 'total_carbs', 'total_fats', 'total_fiber'
         ]
 
 
+class FoodDiaryBatchItemSerializer(serializers.ModelSerializer):
+    """One entry of a bulk diary write; the food/recipe/meal/portion ids are checked together by the view"""
+    food = serializers.IntegerField(source='food_id', required=False, allow_null=True)
+    recipe = serializers.IntegerField(source='recipe_id', required=False, allow_null=True)
+    meal = serializers.IntegerField(source='meal_id', required=False, allow_null=True)
+    portion = serializers.IntegerField(source='portion_id', required=False, allow_null=True)
+
+    class Meta:
+        model = FoodDiaryEntry
+        fields = ['date', 'time', 'meal_time', 'food', 'recipe', 'meal', 'portion', 'servings', 'notes']
+        extra_kwargs = {'date': {'required': True}}
+
+    def validate(self, attrs):
+        if sum(1 for field in ('food_id', 'recipe_id', 'meal_id') if attrs.get(field)) != 1:
+            raise serializers.ValidationError('Give exactly one of food, recipe or meal')
+        if attrs.get('portion_id') and not attrs.get('food_id'):
+            raise serializers.ValidationError({'portion': ['A portion needs a food']})
+        return attrs
+
+
+class DiaryDayCopySerializer(serializers.Serializer):
+    from_date = serializers.DateField()
+    to_date = serializers.DateField()
+    meal_times = serializers.ListField(child=serializers.ChoiceField(choices=MealTime.choices), required=False)
+
+    def validate(self, attrs):
+        if attrs['from_date'] == attrs['to_date']:
+            raise serializers.ValidationError('from_date and to_date must differ')
+        return attrs
+
+
+class DiaryMealCopySerializer(serializers.Serializer):
+    """Copy one meal slot; the target date and slot default to the source's"""
+    from_date = serializers.DateField()
+    meal_time = serializers.ChoiceField(choices=MealTime.choices)
+    to_date = serializers.DateField(required=False)
+    to_meal_time = serializers.ChoiceField(choices=MealTime.choices, required=False)
+
+    def validate(self, attrs):
+        attrs.setdefault('to_date', attrs['from_date'])
+        attrs.setdefault('to_meal_time', attrs['meal_time'])
+        if (attrs['to_date'], attrs['to_meal_time']) == (attrs['from_date'], attrs['meal_time']):
+            raise serializers.ValidationError('Copy to another date or meal_time')
+        return attrs
+
+
 class UserMealLogSerializer(serializers.ModelSerializer):
     meal_details = MealSerializer(source='meal', read_only=True)
     total_calories = serializers.ReadOnlyField()
@@ -614,10 +804,11 @@ class ChatMessageSerializer(serializers.ModelSerializer):
         ]
 
 
-class ChatThreadSerializer(serializers.ModelSerializer):
+class ChatThreadSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     participants_details = UserSerializer(source='participants', many=True, read_only=True)
     last_message = serializers.SerializerMethodField()
     unread_count = serializers.SerializerMethodField()
+    prefetch_related_fields = ['participants']
     
     class Meta:
         model = ChatThread
@@ -626,11 +817,33 @@ class ChatThreadSerializer(serializers.ModelSerializer):
             'is_support', 'last_message', 'unread_count', 'created_at'
         ]
     
+    @classmethod
+    def setup_eager_loading(cls, queryset, request=None):
+        queryset = super().setup_eager_loading(queryset, request)
+        latest = ChatMessage.objects.filter(thread=OuterRef('thread')).order_by('-created_at', '-id')
+        queryset = queryset.prefetch_related(Prefetch(
+            'messages',
+            queryset=ChatMessage.objects
+            .filter(id=Subquery(latest.values('id')[:1]))
+            .select_related('sender', 'reciever')
+            .prefetch_related('attachments'),
+            to_attr='latest_messages',
+        ))
+        if request is not None:
+            queryset = queryset.annotate(unread=Count(
+                'messages', filter=Q(messages__reciever=request.user, messages__read_at__isnull=True)))
+        return queryset
+
     def get_last_message(self, obj):
-        last = obj.messages.order_by('-created_at').first()
+        if hasattr(obj, 'latest_messages'):
+            last = obj.latest_messages[0] if obj.latest_messages else None
+        else:
+            last = obj.messages.order_by('-created_at').first()
         return ChatMessageSerializer(last).data if last else None
     
     def get_unread_count(self, obj):
+        if hasattr(obj, 'unread'):
+            return obj.unread
         user = self.context.get('request').user
         return obj.messages.filter(reciever=user, read_at__isnull=True).count()
 
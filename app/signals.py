@@ -0,0 +1,312 @@
+import threading
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+
+from .barcodes import invalidate_barcodes
+from .models import (
+    CardioSession, Exercise, Food, FoodBarcode, FoodBrand, FoodDiaryEntry, FoodPortion, Muscle, RecipeIngredient,
+    SetLog, UserProfile, UserWorkoutLog,
+)
+from .recents import remember_entries
+from .recipes import refresh_recipe_totals, refresh_recipes_using
+from .records import rebuild_personal_records, record_set
+from .rollups import ROLLUP_DATE_FIELDS, ROLLUP_FACETS, owner_timezone, rebucket_cardio, refresh_rollup, rollup_date
+from .search import drop_brand_tokens, index_brand, index_foods
+from .streaks import record_activity, refresh_streak
+from .volume import invalidate_muscle_matrix, refresh_session_totals
+
+
+# ---------------------------
+# Daily rollup maintenance
+# ---------------------------
+
+def _rollup_key_fields(model):
+    """What decides the rollup day (and the streak credit) of a row, read back before it is saved"""
+    fields = ('user_id', ROLLUP_DATE_FIELDS.get(model, 'date'))
+    return fields + ('completed',) if model is UserWorkoutLog else fields
+
+
+def remember_rollup_day(sender, instance, raw=False, update_fields=None, **kwargs):
+    """
+    Keep the day an existing row used to count towards, so moving it refreshes both days.
+
+    Only the key fields are read back, and a save limited to other fields reads
+    nothing: the stored key is then the one on the instance.
+    """
+    if raw or instance.pk is None:
+        return
+    fields = _rollup_key_fields(sender)
+    if update_fields is not None and not {sender._meta.get_field(name).attname for name in update_fields} & set(fields):
+        previous = {field: getattr(instance, field) for field in fields}
+    else:
+        previous = sender.objects.filter(pk=instance.pk).values(*fields).first()
+    previous = SimpleNamespace(**previous) if previous else None
+    if previous and sender in ROLLUP_DATE_FIELDS:
+        # the row usually keeps its owner, so the old and new day share one profile read
+        previous._owner_timezone = (instance.user_id, owner_timezone(instance))
+    instance._previous_row = previous
+    instance._previous_rollup_key = (previous.user_id, rollup_date(sender, previous)) if previous else None
+
+
+def update_rollup_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    key = (instance.user_id, rollup_date(sender, instance))
+    previous = getattr(instance, '_previous_rollup_key', None)
+    if previous and previous != key:
+        refresh_rollup(*previous, sources=[sender], create=False)
+    refresh_rollup(*key, sources=[sender])
+
+
+def update_rollup_on_delete(sender, instance, **kwargs):
+    refresh_rollup(instance.user_id, rollup_date(sender, instance), sources=[sender], create=False)
+
+
+for model in ROLLUP_FACETS:
+    pre_save.connect(remember_rollup_day, sender=model, dispatch_uid=f'rollup-pre-save-{model.__name__}')
+    post_save.connect(update_rollup_on_save, sender=model, dispatch_uid=f'rollup-save-{model.__name__}')
+    post_delete.connect(update_rollup_on_delete, sender=model, dispatch_uid=f'rollup-delete-{model.__name__}')
+
+
+def remember_profile_timezone(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or instance.pk is None or (update_fields is not None and 'timezone' not in update_fields):
+        return
+    instance._previous_timezone = sender.objects.filter(pk=instance.pk).values_list('timezone', flat=True).first()
+
+
+def rebucket_cardio_on_timezone_change(sender, instance, created=False, raw=False, **kwargs):
+    """Cardio counts on the owner's local date, so a new time zone moves sessions between days"""
+    previous = settings.TIME_ZONE if created else getattr(instance, '_previous_timezone', None)
+    if raw or previous is None or previous == instance.timezone:
+        return
+    if rebucket_cardio(instance.user_id):
+        refresh_streak(instance.user_id, create=False)
+
+
+pre_save.connect(remember_profile_timezone, sender=UserProfile, dispatch_uid='rollup-pre-save-profile')
+post_save.connect(rebucket_cardio_on_timezone_change, sender=UserProfile, dispatch_uid='rollup-save-profile')
+
+
+# ---------------------------
+# Activity streak maintenance
+# ---------------------------
+
+def _counts_towards_streak(model, row):
+    """``row`` is an instance or the key fields remembered before its save"""
+    return row is not None and (model is not UserWorkoutLog or row.completed)
+
+
+def update_streak_on_save(sender, instance, raw=False, **kwargs):
+    """Completing a workout or logging cardio extends the streak; anything else recomputes it"""
+    if raw:
+        return
+    previous = getattr(instance, '_previous_row', None)
+    counted_before = _counts_towards_streak(sender, previous)
+    counts_now = _counts_towards_streak(sender, instance)
+    day = rollup_date(sender, instance)
+    moved = counted_before and instance._previous_rollup_key[1] != day
+
+    if counted_before and (moved or not counts_now):
+        refresh_streak(instance.user_id)
+    elif counts_now:
+        record_activity(instance.user_id, day)
+
+
+def update_streak_on_delete(sender, instance, **kwargs):
+    if _counts_towards_streak(sender, instance):
+        refresh_streak(instance.user_id, create=False)
+
+
+for model in (UserWorkoutLog, CardioSession):
+    post_save.connect(update_streak_on_save, sender=model, dispatch_uid=f'streak-save-{model.__name__}')
+    post_delete.connect(update_streak_on_delete, sender=model, dispatch_uid=f'streak-delete-{model.__name__}')
+
+
+# ---------------------------
+# Personal record maintenance
+# ---------------------------
+
+# sessions being deleted, per thread: their sets go first and must not each rebuild records
+_session_deletes = threading.local()
+
+
+def _set_owner(set_log):
+    return UserWorkoutLog.objects.filter(pk=set_log.session_id).values_list('user_id', flat=True).first()
+
+
+def remember_previous_set(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        return
+    instance._previous_set = sender.objects.filter(pk=instance.pk).values('exercise_id', 'session_id').first()
+
+
+def update_records_on_set_save(sender, instance, created=False, raw=False, **kwargs):
+    """New sets can only raise a record; edits may lower one, so they recompute the exercise"""
+    if raw:
+        return
+    if created:
+        record_set(instance)
+        return
+    previous = getattr(instance, '_previous_set', None) or {}
+    exercise_ids = {instance.exercise_id, previous.get('exercise_id')} - {None}
+    rebuild_personal_records(_set_owner(instance), exercise_ids)
+
+
+def update_records_on_set_delete(sender, instance, **kwargs):
+    if instance.session_id in _deleting_sessions():
+        return
+    user_id = _set_owner(instance)
+    if user_id is not None:
+        rebuild_personal_records(user_id, [instance.exercise_id], create=False)
+
+
+def _deleting_sessions():
+    """``{session id: (user id, exercise ids)}`` for sessions whose delete cascade is running in this thread"""
+    if not hasattr(_session_deletes, 'pending'):
+        _session_deletes.pending = {}
+    return _session_deletes.pending
+
+
+def remember_deleted_session(sender, instance, **kwargs):
+    """
+    A session's sets are deleted in its cascade; note what they trained so the
+    per-set handlers stand aside and the records are rebuilt once afterwards.
+    """
+    exercise_ids = set(instance.sets.values_list('exercise_id', flat=True))
+    _deleting_sessions()[instance.pk] = (instance.user_id, exercise_ids)
+
+
+def update_records_on_session_delete(sender, instance, **kwargs):
+    user_id, exercise_ids = _deleting_sessions().pop(instance.pk, (None, None))
+    if exercise_ids:
+        rebuild_personal_records(user_id, exercise_ids, create=False)
+
+
+def redate_records_on_session_save(sender, instance, raw=False, **kwargs):
+    """Records carry the session date, so moving a session recomputes the exercises it holds"""
+    previous = getattr(instance, '_previous_row', None)
+    if raw or previous is None or previous.date == instance.date:
+        return
+    exercise_ids = set(instance.sets.values_list('exercise_id', flat=True))
+    if exercise_ids:
+        rebuild_personal_records(instance.user_id, exercise_ids)
+
+
+pre_save.connect(remember_previous_set, sender=SetLog, dispatch_uid='records-pre-save-set')
+post_save.connect(update_records_on_set_save, sender=SetLog, dispatch_uid='records-save-set')
+post_delete.connect(update_records_on_set_delete, sender=SetLog, dispatch_uid='records-delete-set')
+post_save.connect(redate_records_on_session_save, sender=UserWorkoutLog, dispatch_uid='records-save-session')
+pre_delete.connect(remember_deleted_session, sender=UserWorkoutLog, dispatch_uid='records-pre-delete-session')
+post_delete.connect(update_records_on_session_delete, sender=UserWorkoutLog, dispatch_uid='records-delete-session')
+
+
+# ---------------------------
+# Workout session totals
+# ---------------------------
+
+def update_session_totals_on_set_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous = getattr(instance, '_previous_set', None)
+    if previous and previous['session_id'] != instance.session_id:
+        refresh_session_totals(previous['session_id'])
+    refresh_session_totals(instance.session_id)
+
+
+def update_session_totals_on_set_delete(sender, instance, **kwargs):
+    if instance.session_id not in _deleting_sessions():
+        refresh_session_totals(instance.session_id)
+
+
+post_save.connect(update_session_totals_on_set_save, sender=SetLog, dispatch_uid='session-totals-save-set')
+post_delete.connect(update_session_totals_on_set_delete, sender=SetLog, dispatch_uid='session-totals-delete-set')
+
+
+# ---------------------------
+# Recipe totals maintenance
+# ---------------------------
+
+def update_recipe_totals_on_ingredient_change(sender, instance, raw=False, **kwargs):
+    if not raw:
+        refresh_recipe_totals([instance.recipe_id])
+
+
+def update_recipe_totals_on_food_save(sender, instance, created=False, raw=False, **kwargs):
+    # a new food is in no recipe yet
+    if not raw and not created:
+        refresh_recipes_using([instance.id])
+
+
+post_save.connect(update_recipe_totals_on_ingredient_change, sender=RecipeIngredient,
+                  dispatch_uid='recipe-totals-save-ingredient')
+post_delete.connect(update_recipe_totals_on_ingredient_change, sender=RecipeIngredient,
+                    dispatch_uid='recipe-totals-delete-ingredient')
+post_save.connect(update_recipe_totals_on_food_save, sender=Food, dispatch_uid='recipe-totals-save-food')
+
+
+# ---------------------------
+# Recent foods maintenance
+# ---------------------------
+
+def remember_logged_entry(sender, instance, created=False, raw=False, **kwargs):
+    # only new logs count; edits and deletes leave the user's habits as they were
+    if created and not raw:
+        remember_entries([instance])
+
+
+post_save.connect(remember_logged_entry, sender=FoodDiaryEntry, dispatch_uid='recent-foods-save-entry')
+
+
+# ---------------------------
+# Food search index maintenance
+# ---------------------------
+
+def index_food_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        index_foods([instance])
+
+
+def index_brand_on_save(sender, instance, created=False, raw=False, **kwargs):
+    # a new brand has no foods yet; renames re-tokenize the brand on every food carrying it
+    if not raw and not created:
+        index_brand(instance)
+
+
+def unindex_brand_on_delete(sender, instance, **kwargs):
+    # Food.brand is SET_NULL via a queryset update, so drop the brand tokens while the link still exists
+    drop_brand_tokens(instance)
+
+
+post_save.connect(index_food_on_save, sender=Food, dispatch_uid='search-index-food')
+post_save.connect(index_brand_on_save, sender=FoodBrand, dispatch_uid='search-index-brand')
+pre_delete.connect(unindex_brand_on_delete, sender=FoodBrand, dispatch_uid='search-unindex-brand')
+
+
+# ---------------------------
+# Barcode lookup cache invalidation
+# ---------------------------
+
+def invalidate_barcode_cache(sender, **kwargs):
+    invalidate_barcodes()
+
+
+for model in (Food, FoodBrand, FoodPortion, FoodBarcode):
+    post_save.connect(invalidate_barcode_cache, sender=model, dispatch_uid=f'barcode-cache-save-{model.__name__}')
+    post_delete.connect(invalidate_barcode_cache, sender=model, dispatch_uid=f'barcode-cache-delete-{model.__name__}')
+
+
+# ---------------------------
+# Exercise -> muscle matrix invalidation
+# ---------------------------
+
+def invalidate_muscle_matrix_cache(sender, **kwargs):
+    invalidate_muscle_matrix()
+
+
+for model in (Exercise, Muscle):
+    post_save.connect(invalidate_muscle_matrix_cache, sender=model, dispatch_uid=f'muscle-matrix-save-{model.__name__}')
+    post_delete.connect(invalidate_muscle_matrix_cache, sender=model, dispatch_uid=f'muscle-matrix-delete-{model.__name__}')
+m2m_changed.connect(invalidate_muscle_matrix_cache, sender=Exercise.secondary_muscles.through,
+                    dispatch_uid='muscle-matrix-secondary')
@@ -0,0 +1,70 @@
+from datetime import timedelta
+
+from django.db.models.functions import TruncDate
+
+from .dates import timezone_for
+from .models import ActivityStreak, CardioSession, UserWorkoutLog
+
+
+# ---------------------------
+# Activity streaks
+# ---------------------------
+
+def active_dates(user_id):
+    """Distinct days with a completed workout or a cardio session, oldest first"""
+    tz = timezone_for(user_id)
+    workouts = UserWorkoutLog.objects.filter(user_id=user_id, completed=True).values_list('date')
+    cardio = (
+        CardioSession.objects.filter(user_id=user_id)
+        .annotate(day=TruncDate('started_at', tzinfo=tz))
+        .values_list('day')
+    )
+    return sorted(day for (day,) in workouts.order_by().union(cardio.order_by()))
+
+
+def walk_streaks(days):
+    """``(current, longest, last_day)`` for a sorted list of distinct days"""
+    current = longest = 0
+    previous = None
+    for day in days:
+        current = current + 1 if previous and day - previous == timedelta(days=1) else 1
+        longest = max(longest, current)
+        previous = day
+    return current, longest, previous
+
+
+def refresh_streak(user_id, create=True):
+    """Recompute a user's cached streak from scratch"""
+    current, longest, last_day = walk_streaks(active_dates(user_id))
+    values = {'current_streak': current, 'longest_streak': longest, 'last_active_date': last_day}
+    if create:
+        return ActivityStreak.objects.update_or_create(user_id=user_id, defaults=values)[0]
+    ActivityStreak.objects.filter(user_id=user_id).update(**values)
+
+
+def record_activity(user_id, day):
+    """
+    Extend the cached streak with activity on ``day``.
+
+    Activity on the last active day or the day after it is applied in place;
+    anything older (a backfilled log) falls back to a full recompute.
+    """
+    streak = ActivityStreak.objects.filter(user_id=user_id).first()
+    if streak is None or streak.last_active_date is None or day < streak.last_active_date:
+        return refresh_streak(user_id)
+    if day == streak.last_active_date:
+        return streak
+
+    if day - streak.last_active_date == timedelta(days=1):
+        streak.current_streak += 1
+    else:
+        streak.current_streak = 1
+    streak.longest_streak = max(streak.longest_streak, streak.current_streak)
+    streak.last_active_date = day
+    streak.save(update_fields=['current_streak', 'longest_streak', 'last_active_date', 'updated_at'])
+    return streak
+
+
+def get_streak(user):
+    """Cached streak for ``user``, built on first use"""
+    return ActivityStreak.objects.filter(user=user).first() or refresh_streak(user.id)
@@ -1,3 +1,1368 @@
+import json
+import os
+import tempfile
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from importlib import import_module
+from io import StringIO
+from unittest import mock
+from zoneinfo import ZoneInfo
+
+from django.apps import apps as django_apps
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+
+from .dates import date_window, timezone_for, user_timezone
+from .recents import remember_entries
+from .models import *
+from .records import rebuild_personal_records
+from .rollups import rebuild_rollups
+from .views import (
+    copy_recipe, duplicate_workout, exercise_personal_records, muscle_group_volume, user_stats, workout_calendar,
+)
+
+
+class QueryCountTestCase(TestCase):
+    """Shared fixtures for endpoints that must not scale queries with row counts"""
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='athlete', password='pass12345')
+        UserProfile.objects.create(user=self.user, weight=80, height=180, goal='Lose weight')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.food = Food.objects.create(food_id='oats', name='Oats', calories=380, protein=13, carbs=67, fat=7)
+        self.meal = Meal.objects.create(name='Chicken Bowl', meal_type='lunch', calories=550, protein=45, carbs=50, fats=15)
+
+    def count_queries(self, url, **params):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return len(ctx.captured_queries)
+
+    def add_diary_entries(self, count, day=None):
+        day = day or date.today()
+        entries = [
+            FoodDiaryEntry(user=self.user, date=day, food=self.food if i % 2 else None,
+                           meal=None if i % 2 else self.meal, servings=1)
+            for i in range(count)
+        ]
+        for entry in entries:
+            entry.resolve_nutrition()
+        FoodDiaryEntry.objects.bulk_create(entries)
+
+
+class DashboardTodayTests(QueryCountTestCase):
+    url = '/api/dashboard/today/'
+
+    def test_query_count_is_constant(self):
+        self.add_diary_entries(2)
+        baseline = self.count_queries(self.url)
+
+        self.add_diary_entries(40)
+        WaterLog.objects.create(user=self.user, amount_ml=500)
+        Workout.objects.create(user=self.user, name='Push', description='', duration=timedelta(hours=1),
+                               level='beginner', calories_burned=300, date=date.today())
+
+        self.assertEqual(self.count_queries(self.url), baseline)
+        self.assertLessEqual(baseline, 4)
+
+    def test_totals(self):
+        portion = FoodPortion.objects.create(food=self.food, name='50 g', grams=50)
+        FoodDiaryEntry.objects.create(user=self.user, food=self.food, portion=portion, servings=2)
+        FoodDiaryEntry.objects.create(user=self.user, meal=self.meal, servings=1)
+        recipe = Recipe.objects.create(name='Porridge', created_by=self.user)
+        RecipeIngredient.objects.create(recipe=recipe, food=self.food, grams=200)
+        FoodDiaryEntry.objects.create(user=self.user, recipe=recipe, servings=0.5)
+        WaterLog.objects.create(user=self.user, amount_ml=750)
+
+        data = self.client.get(self.url).json()
+
+        self.assertEqual(data['calories']['consumed'], round(380 + 550 + 380))
+        self.assertEqual(data['water']['consumed_ml'], 750)
+
+
+class DailyUserRollupTests(QueryCountTestCase):
+
+    def rollup(self, day=None):
+        return DailyUserRollup.objects.get(user=self.user, date=day or date.today())
+
+    def test_signals_keep_rollup_current(self):
+        entry = FoodDiaryEntry.objects.create(user=self.user, meal=self.meal, servings=2)
+        WaterLog.objects.create(user=self.user, amount_ml=250)
+        WaterLog.objects.create(user=self.user, amount_ml=500)
+        self.assertEqual(self.rollup().calories, 1100)
+        self.assertEqual(self.rollup().water_ml, 750)
+
+        yesterday = date.today() - timedelta(days=1)
+        entry.date = yesterday
+        entry.save()
+        self.assertEqual(self.rollup().calories, 0)
+        self.assertEqual(self.rollup(yesterday).calories, 1100)
+
+        entry.delete()
+        self.assertEqual(self.rollup(yesterday).calories, 0)
+
+    def test_rebuild_command_backfills_range(self):
+        self.add_diary_entries(4)
+        DailyUserRollup.objects.all().delete()
+
+        call_command('rebuild_rollups', '--from', str(date.today()), stdout=StringIO())
+
+        self.assertEqual(self.rollup().calories, 2 * 550 + 2 * 380)
+
+    def test_migration_backfills_existing_logs(self):
+        fill_rollups = import_module('app.migrations.0016_backfill_rollups').fill_rollups
+        self.add_diary_entries(4)
+        WaterLog.objects.create(user=self.user, amount_ml=500)
+        CardioSession.objects.create(user=self.user, activity='run', distance_m=5000)
+        DailyUserRollup.objects.all().delete()
+
+        fill_rollups(django_apps, None)
+
+        rollup = self.rollup()
+        self.assertEqual(rollup.calories, 2 * 550 + 2 * 380)
+        self.assertEqual((rollup.water_ml, rollup.cardio_sessions, rollup.cardio_distance_m), (500, 1, 5000))
+
+    def test_saves_read_back_only_the_key_fields(self):
+        entry = FoodDiaryEntry.objects.create(user=self.user, meal=self.meal, servings=2)
+        with CaptureQueriesContext(connection) as ctx:
+            entry.notes = 'seconds'
+            entry.save(update_fields=['notes'])
+        self.assertFalse(any(q['sql'].startswith('SELECT "app_fooddiaryentry"') for q in ctx.captured_queries))
+
+        with CaptureQueriesContext(connection) as ctx:
+            entry.save()
+        reads = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT "app_fooddiaryentry"."user_id"')]
+        self.assertEqual(len(reads), 1)
+        self.assertNotIn('"notes"', reads[0])
+
+    def test_weekly_progress_reads_rollups(self):
+        self.add_diary_entries(10)
+        call_command('rebuild_rollups', '--from', str(date.today()), stdout=StringIO())
+        baseline = self.count_queries('/api/dashboard/weekly-progress/')
+        self.add_diary_entries(30, day=date.today() - timedelta(days=1))
+        self.assertEqual(self.count_queries('/api/dashboard/weekly-progress/'), baseline)
+
+
+class WeekWindowTests(QueryCountTestCase):
+
+    def test_multi_week_trend_uses_same_queries(self):
+        week_start = date.today() - timedelta(days=date.today().weekday())
+        for weeks_back in range(4):
+            day = week_start - timedelta(weeks=weeks_back)
+            FoodDiaryEntry.objects.create(user=self.user, date=day, meal=self.meal, servings=1)
+            Progress.objects.create(user=self.user, date=day + timedelta(days=3), weight=80 - weeks_back)
+
+        single = self.count_queries('/api/analytics/weekly/')
+        self.assertEqual(self.count_queries('/api/analytics/weekly/', weeks=4), single)
+
+        data = self.client.get('/api/analytics/weekly/', {'weeks': 4}).json()
+        self.assertEqual(len(data['weeks']), 4)
+        self.assertEqual(data['weeks'][-1]['week_start'], str(week_start))
+        self.assertEqual(data['weeks'][0]['daily_breakdown'][0]['calories'], 550)
+        self.assertEqual(data['weeks'][1]['summary']['weight_change'], 1)
+
+    def test_invalid_weeks(self):
+        response = self.client.get('/api/dashboard/weekly-progress/', {'weeks': 'many'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ActivityStreakTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.workout = Workout.objects.create(user=self.user, name='Push', description='', duration=timedelta(hours=1),
+                                              level='beginner', calories_burned=300, date=date.today())
+
+    def log_days(self, *days_back, completed=True):
+        return [
+            UserWorkoutLog.objects.create(user=self.user, workout=self.workout, completed=completed,
+                                          date=date.today() - timedelta(days=days_back_))
+            for days_back_ in days_back
+        ]
+
+    def stats(self):
+        # user_stats is not routed, so call the view directly
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = user_stats(request)
+        return response.data, len(ctx.captured_queries)
+
+    def test_streak_is_read_with_constant_queries(self):
+        self.log_days(0, 1)
+        baseline = self.stats()[1]
+        self.log_days(*range(2, 60))
+        data, queries = self.stats()
+        self.assertEqual(queries, baseline)
+        self.assertEqual(data['current_streak_days'], 60)
+        self.assertEqual(data['longest_streak_days'], 60)
+
+    def test_incremental_updates(self):
+        self.log_days(10, 9, 8, 2, 1)
+        CardioSession.objects.create(user=self.user)
+        streak = ActivityStreak.objects.get(user=self.user)
+        self.assertEqual((streak.current_streak, streak.longest_streak), (3, 3))
+
+        pending, = self.log_days(7, completed=False)
+        self.assertEqual(ActivityStreak.objects.get(user=self.user).longest_streak, 3)
+        pending.completed = True
+        pending.save()
+        self.assertEqual(ActivityStreak.objects.get(user=self.user).longest_streak, 4)
+
+        pending.delete()
+        streak = ActivityStreak.objects.get(user=self.user)
+        self.assertEqual((streak.current_streak, streak.longest_streak), (3, 3))
+
+    def test_current_streak_uses_the_user_local_date(self):
+        UserProfile.objects.filter(user=self.user).update(timezone='America/Los_Angeles')
+        self.user.refresh_from_db()
+        UserWorkoutLog.objects.create(user=self.user, workout=self.workout, completed=True, date=date(2025, 6, 9))
+        # 19:00 on June 9th in Los Angeles, already June 10th in UTC
+        with mock.patch('django.utils.timezone.now', return_value=datetime(2025, 6, 10, 2, 0, tzinfo=dt_timezone.utc)):
+            self.assertEqual(self.stats()[0]['current_streak_days'], 1)
+
+    def test_no_activity_today_breaks_current_streak(self):
+        self.log_days(1, 2)
+        self.assertEqual(self.stats()[0]['current_streak_days'], 0)
+
+
+class HeartRateIngestTests(QueryCountTestCase):
+    url = '/api/heart-rate/bulk/'
+
+    def sync(self, payload):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, payload, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json(), len(ctx.captured_queries)
+
+    def test_columnar_sync_is_batched(self):
+        count = 3000
+        data, queries = self.sync({'start': '2025-01-01T08:00:00Z', 'deltas': [1] * count, 'bpm': [120] * count})
+        self.assertEqual(data['accepted'], count)
+        self.assertLess(queries, 20)
+        self.assertEqual(HeartRateSample.objects.filter(user=self.user).count(), count)
+
+    def test_dedupes_and_rejects(self):
+        HeartRateSample.objects.create(user=self.user, ts='2025-01-01T08:00:00Z', bpm=100)
+
+        data, _ = self.sync({
+            'ts': ['2025-01-01T08:00:00Z', '2025-01-01T08:00:01Z', '2025-01-01T09:00:01+01:00',
+                   'yesterday', 1735718403],
+            'bpm': [100, 101, 102, 103, 999],
+        })
+
+        self.assertEqual((data['accepted'], data['duplicates'], data['rejected']), (1, 2, 2))
+        self.assertEqual([e['index'] for e in data['errors']], [3, 4])
+        self.assertEqual(HeartRateSample.objects.filter(user=self.user).count(), 2)
+
+    def test_malformed_body(self):
+        response = self.client.post(self.url, {'ts': ['2025-01-01T08:00:00Z'], 'bpm': []}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('benchmark_hr_ingest', '--samples', '200', stdout=out)
+        self.assertIn('samples/sec', out.getvalue())
+        self.assertFalse(HeartRateSample.objects.exists())
+
+
+class HeartRateSeriesTests(QueryCountTestCase):
+    url = '/api/heart-rate/'
+
+    def setUp(self):
+        super().setUp()
+        start = timezone.now().replace(hour=10, minute=0, second=0, microsecond=0) - timedelta(days=1)
+        HeartRateSample.objects.bulk_create([
+            HeartRateSample(user=self.user, ts=start + timedelta(seconds=10 * i), bpm=60 + i % 60)
+            for i in range(720)
+        ])
+        self.start = start
+
+    def test_buckets_are_aggregated_in_the_database(self):
+        response = self.client.get(self.url, {'bucket': '5m'})
+        self.assertTrue(response.streaming)
+        data = json.loads(b''.join(response.streaming_content))
+
+        self.assertEqual(len(data['buckets']), 24)
+        first = data['buckets'][0]
+        self.assertEqual(first['count'], 30)
+        self.assertEqual((first['min_bpm'], first['max_bpm']), (60, 89))
+        self.assertEqual((data['min_bpm'], data['max_bpm']), (60, 119))
+
+        hourly = json.loads(b''.join(self.client.get(self.url, {'bucket': '1h'}).streaming_content))
+        self.assertEqual([b['count'] for b in hourly['buckets']], [360, 360])
+
+    def test_day_buckets_follow_the_user_time_zone(self):
+        UserProfile.objects.filter(user=self.user).update(timezone='America/New_York')
+        self.user.refresh_from_db()
+        data = json.loads(b''.join(self.client.get(self.url, {'bucket': '1d'}).streaming_content))
+        self.assertEqual(len(data['buckets']), 1)
+        bucket = datetime.fromisoformat(data['buckets'][0]['ts'])
+        local_start = timezone.localtime(self.start, ZoneInfo('America/New_York'))
+        self.assertEqual(bucket, local_start.replace(hour=0))
+
+    def test_points_downsamples_and_keeps_extremes(self):
+        data = self.client.get(self.url, {'points': 50}).json()
+        self.assertEqual(data['points'], 50)
+        bpms = [s['bpm'] for s in data['samples']]
+        self.assertIn(119, bpms)
+        self.assertIn(60, bpms)
+        self.assertEqual(data['avg_bpm'], round(sum(60 + i % 60 for i in range(720)) / 720))
+
+    def test_invalid_modes(self):
+        self.assertEqual(self.client.get(self.url, {'bucket': '2m'}).status_code, 400)
+        self.assertEqual(self.client.get(self.url, {'points': 'lots'}).status_code, 400)
+
+
+class CardioHeartRateSummaryTests(QueryCountTestCase):
+
+    def test_finish_stores_hr_summary(self):
+        started = timezone.now().replace(microsecond=0) - timedelta(minutes=20)
+        session = CardioSession.objects.create(user=self.user, started_at=started)
+        # 10 minutes at 100 bpm then 10 minutes at 170 bpm, one sample every 5 s
+        HeartRateSample.objects.bulk_create([
+            HeartRateSample(user=self.user, ts=started + timedelta(seconds=5 * i), bpm=100 if i < 120 else 170)
+            for i in range(240)
+        ])
+        HeartRateSample.objects.create(user=self.user, ts=started - timedelta(minutes=5), bpm=200)
+
+        ended = started + timedelta(minutes=20)
+        response = self.client.patch(f'/api/cardio/{session.id}/finish/',
+                                     {'ended_at': ended.isoformat()}, format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+
+        session.refresh_from_db()
+        self.assertEqual((session.avg_hr, session.max_hr, session.min_hr), (135, 170, 100))
+        self.assertEqual(session.hr_sample_count, 240)
+        # max HR 190 (default age 30): 100 bpm is z1, 170 bpm is z4
+        self.assertEqual(session.hr_zones, {'z1': 600, 'z2': 0, 'z3': 0, 'z4': 600, 'z5': 0})
+        self.assertLessEqual(len(session.hr_trace), 120)
+        self.assertEqual(session.hr_trace[0], [0, 100])
+
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.get(f'/api/cardio/{session.id}/').json()
+        self.assertEqual(data['hr_zones']['z4'], 600)
+        self.assertFalse(any('heartratesample' in q['sql'] for q in ctx.captured_queries))
+
+
+class FoodSearchTests(QueryCountTestCase):
+    url = '/api/foods/'
+
+    def setUp(self):
+        super().setUp()
+        quaker = FoodBrand.objects.create(name='Quaker')
+        self.rolled = Food.objects.create(food_id='rolled', name='Rolled Oats', brand=quaker,
+                                          calories=370, protein=13, carbs=60, fat=7)
+        self.bar = Food.objects.create(food_id='bar', name='Oatmeal Bar', calories=420, protein=6, carbs=70, fat=12)
+        self.custom = Food.objects.create(food_id='mine', name='Overnight Oats', is_custom=True,
+                                          created_by=self.user, calories=200, protein=8, carbs=30, fat=5)
+
+    def search(self, q):
+        response = self.client.get(self.url, {'q': q})
+        self.assertEqual(response.status_code, 200, response.content)
+        return [food['name'] for food in response.json()]
+
+    def test_ranking(self):
+        self.assertEqual(self.search('oats'), ['Oats', 'Overnight Oats', 'Rolled Oats'])
+        self.assertEqual(self.search('oat')[:3], ['Overnight Oats', 'Oats', 'Oatmeal Bar'])
+        self.assertEqual(self.search('quaker'), ['Rolled Oats'])
+        self.assertEqual(self.search('Rolled Oa'), ['Rolled Oats'])
+
+    def test_migration_indexes_existing_foods(self):
+        fill_search_index = import_module('app.migrations.0017_backfill_food_search_index').fill_search_index
+        FoodSearchToken.objects.all().delete()
+        self.assertEqual(self.search('quaker'), [])
+        fill_search_index(django_apps, None)
+        self.assertEqual(self.search('oats'), ['Oats', 'Overnight Oats', 'Rolled Oats'])
+        self.assertEqual(self.search('quaker'), ['Rolled Oats'])
+
+    def test_typo_fallback(self):
+        self.assertEqual(self.search('rolld oats')[0], 'Rolled Oats')
+        self.assertIn('Oatmeal Bar', self.search('oatmael'))
+
+    def test_index_follows_writes(self):
+        self.rolled.name = 'Steel Cut Oats'
+        self.rolled.save()
+        self.assertEqual(self.search('steel'), ['Steel Cut Oats'])
+        self.assertEqual(self.search('rolled'), [])
+
+        brand = self.rolled.brand
+        brand.name = 'Bobs Mill'
+        brand.save()
+        self.assertEqual(self.search('bobs'), ['Steel Cut Oats'])
+        brand.delete()
+        self.assertEqual(self.search('bobs'), [])
+        self.assertEqual(self.search('steel'), ['Steel Cut Oats'])
+
+
+class BarcodeLookupTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        FoodPortion.objects.create(food=self.food, name='1 cup', grams=80)
+        FoodBarcode.objects.create(food=self.food, code='0001')
+        rice = Food.objects.create(food_id='rice', name='Rice', calories=130, protein=3, carbs=28, fat=0)
+        FoodBarcode.objects.create(food=rice, code='0002')
+
+    def scan(self, code):
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.post('/api/foods/scan_barcode/', {'barcode': code}, format='json').json()
+        return data, len(ctx.captured_queries)
+
+    def test_repeat_scans_are_cached_until_food_changes(self):
+        data, _ = self.scan('0001')
+        self.assertEqual(data['food']['portions'][0]['name'], '1 cup')
+        _, queries = self.scan('0001')
+        self.assertEqual(queries, 0)
+
+        self.food.name = 'Rolled Oats'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.food.save()
+        data, _ = self.scan('0001')
+        self.assertEqual(data['food']['name'], 'Rolled Oats')
+
+    def test_rolled_back_writes_keep_the_cache(self):
+        self.scan('0001')
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            self.food.name = 'Rolled Oats'
+            self.food.save()
+            raise RuntimeError
+        _, queries = self.scan('0001')
+        self.assertEqual(queries, 0)
+
+    def test_batch_resolve(self):
+        codes = ['0001', '0002', '9999', '0001']
+        with CaptureQueriesContext(connection) as ctx:
+            data = self.client.post('/api/foods/scan_barcodes/', {'barcodes': codes}, format='json').json()
+        self.assertLessEqual(len(ctx.captured_queries), 2)
+        self.assertEqual([r['found'] for r in data['results']], [True, True, False, True])
+        self.assertEqual((data['found'], data['missing']), (3, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            FoodBarcode.objects.create(food=self.food, code='9999')
+        data = self.client.post('/api/foods/scan_barcodes/', {'barcodes': ['9999']}, format='json').json()
+        self.assertTrue(data['results'][0]['found'])
+
+    def test_batch_limit(self):
+        response = self.client.post('/api/foods/scan_barcodes/', {'barcodes': ['1'] * 501}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_non_object_body(self):
+        response = self.client.post('/api/foods/scan_barcodes/', ['0123'], format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class EagerLoadingTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        chest = Muscle.objects.create(name='Pectorals', group='chest')
+        triceps = Muscle.objects.create(name='Triceps', group='arms')
+        self.exercise = Exercise.objects.create(name='Bench Press', primary_muscle=chest, created_by=None)
+        self.exercise.secondary_muscles.add(triceps)
+        self.coach = User.objects.create_user(username='coach', password='pass12345')
+        self.created = 0
+
+    def add_rows(self, count):
+        for _ in range(count):
+            self.created += 1
+            n = self.created
+            recipe = Recipe.objects.create(name=f'Recipe {n}', created_by=self.user)
+            RecipeIngredient.objects.create(recipe=recipe, food=self.food, grams=100)
+            portion = FoodPortion.objects.create(food=self.food, name=f'{n} g', grams=n)
+            FoodDiaryEntry.objects.create(user=self.user, food=self.food, portion=portion, servings=1)
+            FoodDiaryEntry.objects.create(user=self.user, recipe=recipe, servings=1)
+
+            workout = Workout.objects.create(user=self.user, name=f'Workout {n}', description='',
+                                             duration=timedelta(hours=1), level='beginner',
+                                             calories_burned=300, date=date.today())
+            WorkoutExercise.objects.create(workout=workout, exercise=self.exercise, order=1)
+            log = UserWorkoutLog.objects.create(user=self.user, workout=workout, date=date.today())
+            SetLog.objects.create(session=log, exercise=self.exercise, order=1, set_number=1, reps=5)
+
+            thread = ChatThread.objects.create(topic=f'Thread {n}')
+            thread.participants.add(self.user, self.coach)
+            ChatMessage.objects.create(thread=thread, sender=self.coach, reciever=self.user, text='hi')
+            ChatMessage.objects.create(thread=thread, sender=self.coach, reciever=self.user, text='there')
+
+    def test_list_queries_do_not_grow_with_rows(self):
+        urls = ['/api/food-diary/', '/api/recipes/', '/api/workouts/', '/api/workout-logs/',
+                '/api/workout-logs/history/', '/api/chat-threads/']
+        self.add_rows(2)
+        baseline = {url: self.count_queries(url) for url in urls}
+        self.add_rows(6)
+        self.assertEqual({url: self.count_queries(url) for url in urls}, baseline)
+
+    def test_chat_thread_annotations(self):
+        self.add_rows(1)
+        thread, = self.client.get('/api/chat-threads/').json()
+        self.assertEqual(thread['unread_count'], 2)
+        self.assertEqual(thread['last_message']['text'], 'there')
+
+
+class DiaryDayTests(QueryCountTestCase):
+    url = '/api/food-diary/diary/'
+
+    def test_day_is_serialized_with_constant_queries(self):
+        recipe = Recipe.objects.create(name='Porridge', created_by=self.user)
+        RecipeIngredient.objects.create(recipe=recipe, food=self.food, grams=200)
+        portion = FoodPortion.objects.create(food=self.food, name='50 g', grams=50)
+        FoodDiaryEntry.objects.create(user=self.user, food=self.food, portion=portion, servings=2,
+                                      meal_time='breakfast')
+        FoodDiaryEntry.objects.create(user=self.user, recipe=recipe, servings=0.5, meal_time='dinner')
+        FoodDiaryEntry.objects.create(user=self.user, meal=self.meal, servings=1)
+
+        baseline = self.count_queries(self.url)
+        self.add_diary_entries(40)
+        self.assertEqual(self.count_queries(self.url), baseline)
+        # entries + one aggregate, plus the nested portion/ingredient prefetches
+        self.assertLessEqual(baseline, 5)
+
+        data = self.client.get(self.url).json()
+        self.assertEqual(len(data['meals']['lunch']), 41)
+        self.assertEqual(data['meals']['breakfast'][0]['total_calories'], 380)
+        self.assertEqual(data['meals']['dinner'][0]['total_calories'], 380)
+        self.assertEqual(data['total_calories'], round(380 + 380 + 21 * 550 + 20 * 380))
+
+    def test_invalid_date(self):
+        self.assertEqual(self.client.get(self.url, {'date': '2025-13-01'}).status_code, 400)
+
+
+class DiaryNutritionSnapshotTests(QueryCountTestCase):
+
+    def test_snapshot_is_resolved_on_write_and_kept(self):
+        portion = FoodPortion.objects.create(food=self.food, name='50 g', grams=50)
+        entry = FoodDiaryEntry.objects.create(user=self.user, food=self.food, portion=portion, servings=2)
+        self.assertEqual((entry.calories, entry.protein, entry.fats), (380, 13, 7))
+
+        self.food.calories = 999
+        self.food.save()
+        entry = FoodDiaryEntry.objects.get(pk=entry.pk)
+        entry.notes = 'edited'
+        entry.save()
+        self.assertEqual(FoodDiaryEntry.objects.get(pk=entry.pk).calories, 380)
+
+        entry.servings = 1
+        entry.save(update_fields=['servings'])
+        self.assertEqual(FoodDiaryEntry.objects.get(pk=entry.pk).calories, 999 / 2)
+
+    def test_recipe_entries(self):
+        recipe = Recipe.objects.create(name='Porridge', created_by=self.user)
+        RecipeIngredient.objects.create(recipe=recipe, food=self.food, grams=200)
+        entry = FoodDiaryEntry.objects.create(user=self.user, recipe=recipe, servings=0.5)
+        self.assertEqual(entry.carbs, 67)
+
+    def test_backfill_command(self):
+        FoodDiaryEntry.objects.bulk_create([
+            FoodDiaryEntry(user=self.user, meal=self.meal, servings=2),
+            FoodDiaryEntry(user=self.user, food=self.food, servings=1),
+        ])
+        call_command('backfill_diary_nutrition', '--chunk-size', '1', stdout=StringIO())
+        self.assertEqual(sorted(FoodDiaryEntry.objects.values_list('calories', flat=True)), [380, 1100])
+        # bulk_update skips the signals; the command refreshes the day's rollup itself
+        self.assertEqual(DailyUserRollup.objects.get(user=self.user, date=date.today()).calories, 1480)
+
+    def test_backfill_migration_fills_only_empty_snapshots(self):
+        fill_diary_snapshots = import_module('app.migrations.0015_backfill_diary_nutrition').fill_diary_snapshots
+        FoodDiaryEntry.objects.bulk_create([
+            FoodDiaryEntry(user=self.user, meal=self.meal, servings=2),
+            FoodDiaryEntry(user=self.user, food=self.food, servings=1, calories=123),
+        ])
+        fill_diary_snapshots(django_apps, None)
+        self.assertEqual(sorted(FoodDiaryEntry.objects.values_list('calories', flat=True)), [123, 1100])
+
+
+class HotPathIndexTests(QueryCountTestCase):
+    """
+    EXPLAIN each hot per-user query and fail if it stops using its composite index.
+
+    The plan text names the chosen index on both SQLite (EXPLAIN QUERY PLAN) and
+    MySQL (the ``key`` column), so checking for the index name works on either.
+    """
+
+    def hot_queries(self):
+        today = date.today()
+        week = [today - timedelta(days=6), today]
+        now = timezone.now()
+        return [
+            ('fooddiary_user_date_idx', FoodDiaryEntry.objects.filter(user=self.user, date=today)),
+            ('fooddiary_user_date_idx', FoodDiaryEntry.objects.filter(user=self.user, date__range=week)),
+            ('waterlog_user_date_idx', WaterLog.objects.filter(user=self.user, date=today)),
+            ('workoutlog_user_date_idx', UserWorkoutLog.objects.filter(user=self.user, date__range=week)),
+            ('workout_user_date_idx', Workout.objects.filter(user=self.user, date__range=week)),
+            ('checkin_user_date_idx', Checkin.objects.filter(user=self.user).order_by('-date')),
+            ('meallog_user_date_idx', UserMealLog.objects.filter(user=self.user, date=today)),
+            ('cardio_user_started_idx', CardioSession.objects.filter(
+                user=self.user, started_at__gte=now - timedelta(days=7), started_at__lt=now)),
+            ('chatmsg_thread_created_idx', ChatMessage.objects.filter(thread_id=1).order_by('-created_at')),
+            ('chatmsg_reciever_read_idx', ChatMessage.objects.filter(reciever=self.user, read_at__isnull=True)),
+        ]
+
+    def test_hot_queries_use_their_index(self):
+        for index_name, queryset in self.hot_queries():
+            with self.subTest(index=index_name, sql=str(queryset.query)):
+                self.assertIn(index_name, queryset.explain())
+
+
+class LocalDateWindowTests(QueryCountTestCase):
+    """Cardio sessions belong to the owner's local day and are filtered with plain timestamp ranges"""
+
+    def setUp(self):
+        super().setUp()
+        UserProfile.objects.filter(user=self.user).update(timezone='America/New_York')
+        self.user.refresh_from_db()
+        # 22:00 on March 9th in New York, already March 10th in UTC
+        self.session = CardioSession.objects.create(
+            user=self.user, activity='run', distance_m=5000,
+            started_at=datetime(2025, 3, 10, 2, 0, tzinfo=dt_timezone.utc))
+
+    def test_list_filters_on_local_date(self):
+        response = self.client.get('/api/cardio/', {'from': '2025-03-09', 'to': '2025-03-09'})
+        self.assertEqual([row['id'] for row in response.data], [self.session.id])
+        response = self.client.get('/api/cardio/', {'from': '2025-03-10'})
+        self.assertEqual(response.data, [])
+
+    def test_bad_date_is_rejected(self):
+        self.assertEqual(self.client.get('/api/cardio/', {'from': '03/09/2025'}).status_code, 400)
+
+    def test_rollups_use_local_date(self):
+        rollup = DailyUserRollup.objects.get(user=self.user, cardio_sessions=1)
+        self.assertEqual(rollup.date, date(2025, 3, 9))
+
+        rebuild_rollups(date(2025, 3, 1), date(2025, 3, 31), user_ids=[self.user.id])
+        rollup = DailyUserRollup.objects.get(user=self.user, cardio_sessions=1)
+        self.assertEqual((rollup.date, rollup.cardio_distance_m), (date(2025, 3, 9), 5000))
+
+    def test_save_looks_up_the_time_zone_once_per_row(self):
+        session = CardioSession.objects.get(pk=self.session.pk)
+        with mock.patch('app.rollups.timezone_for', wraps=timezone_for) as lookup:
+            session.distance_m = 6000
+            session.save()
+        # once for the old and new day and the streak, once inside the cardio facet
+        self.assertEqual(lookup.call_count, 2)
+
+    def test_time_zone_change_rebuckets_cardio(self):
+        profile = UserProfile.objects.get(user=self.user)
+        profile.timezone = 'UTC'
+        profile.save()
+        rollup = DailyUserRollup.objects.get(user=self.user, cardio_sessions=1)
+        self.assertEqual((rollup.date, rollup.cardio_distance_m), (date(2025, 3, 10), 5000))
+        self.assertFalse(DailyUserRollup.objects.filter(user=self.user, date=date(2025, 3, 9), cardio_sessions=1))
+        self.assertEqual(ActivityStreak.objects.get(user=self.user).last_active_date, date(2025, 3, 10))
+
+    def test_rebuild_command_covers_the_first_local_day(self):
+        DailyUserRollup.objects.all().delete()
+        call_command('rebuild_rollups', '--to', '2025-03-31', stdout=StringIO())
+        rollup = DailyUserRollup.objects.get(user=self.user, cardio_sessions=1)
+        self.assertEqual(rollup.date, date(2025, 3, 9))
+
+    def test_window_uses_user_started_index(self):
+        window = date_window('started_at', date(2025, 3, 1), date(2025, 3, 31), user_timezone(self.user))
+        queryset = CardioSession.objects.filter(window, user=self.user)
+        self.assertNotIn('django_datetime_cast_date', str(queryset.query))
+        self.assertIn('cardio_user_started_idx', queryset.explain())
+
+
+class WorkoutCalendarTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.workout = Workout.objects.create(user=self.user, name='Push', description='', duration=timedelta(hours=1),
+                                              level='beginner', calories_burned=300, date=date(2025, 1, 6))
+        UserWorkoutLog.objects.create(user=self.user, workout=self.workout, date=date(2025, 1, 6), completed=True)
+        self.workout.pk, self.workout.name = None, 'Pull'
+        self.workout.save()
+        UserWorkoutLog.objects.create(user=self.user, workout=self.workout, date=date(2025, 1, 6))
+        CardioSession.objects.create(
+            user=self.user, activity='run', started_at=datetime(2025, 3, 2, 8, 0, tzinfo=dt_timezone.utc))
+
+    def calendar(self, **params):
+        request = APIRequestFactory().get('/workouts/calendar/', params)
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = workout_calendar(request)
+        return response, len(ctx.captured_queries)
+
+    def test_month(self):
+        response, _ = self.calendar(month='2025-01')
+        self.assertEqual(response.data['month'], '2025-01')
+        self.assertEqual(len(response.data['calendar']), 31)
+        self.assertEqual(response.data['calendar']['2025-01-06'], {
+            'date': date(2025, 1, 6), 'has_workout': True, 'workout_completed': True,
+            'has_cardio': False, 'total_activities': 2,
+        })
+
+    def test_range_uses_the_same_queries_as_one_month(self):
+        _, one_month = self.calendar(month='2025-01')
+        response, year = self.calendar(**{'from': '2025-01', 'to': '2025-12'})
+        self.assertEqual(year, one_month)
+        self.assertEqual(len(response.data['calendar']), 365)
+        self.assertTrue(response.data['calendar']['2025-03-02']['has_cardio'])
+        self.assertEqual(response.data['calendar']['2025-01-06']['total_activities'], 2)
+
+    def test_invalid_ranges(self):
+        self.assertEqual(self.calendar(month='January')[0].status_code, 400)
+        self.assertEqual(self.calendar(**{'from': '2025-06', 'to': '2025-01'})[0].status_code, 400)
+        self.assertEqual(self.calendar(**{'from': '2020-01', 'to': '2025-01'})[0].status_code, 400)
+
+
+class PersonalRecordTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.squat = Exercise.objects.create(name='Squat', created_by=self.user)
+        self.bench = Exercise.objects.create(name='Bench Press', created_by=self.user)
+        workout = Workout.objects.create(user=self.user, name='Legs', description='', duration=timedelta(hours=1),
+                                         level='beginner', calories_burned=300, date=date(2025, 1, 6))
+        self.log = UserWorkoutLog.objects.create(user=self.user, workout=workout, date=date(2025, 1, 6))
+
+    def add_set(self, exercise, weight, reps, **extra):
+        response = self.client.post(f'/api/workout-logs/{self.log.id}/add_set/', {
+            'exercise': exercise.id, 'weight_kg': weight, 'reps': reps, **extra}, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+
+    def records(self):
+        request = APIRequestFactory().get('/workouts/personal-records/')
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = exercise_personal_records(request)
+        self.assertEqual(len(ctx.captured_queries), 1)
+        return {row['exercise_name']: row for row in response.data['personal_records']}
+
+    def test_add_set_updates_records_incrementally(self):
+        self.add_set(self.squat, 100, 5)
+        self.add_set(self.squat, 120, 1)
+        self.add_set(self.squat, 60, 20)
+        self.add_set(self.squat, 200, 1, completed=False)
+        self.add_set(self.bench, 80, 10)
+
+        squat = self.records()['Squat']
+        self.assertEqual((squat['max_weight_kg'], squat['max_weight_reps']), (120.0, 1))
+        self.assertEqual((squat['max_reps'], squat['max_reps_weight']), (20, 60.0))
+        self.assertEqual(squat['best_e1rm_kg'], 120.0)  # 100x5 is 112.5 (Brzycki), 60x20 is not estimated
+        self.assertEqual(squat['best_volume_kg'], 1200.0)
+        self.assertEqual(squat['max_weight_date'], '2025-01-06')
+        self.assertAlmostEqual(self.records()['Bench Press']['best_e1rm_kg'], 106.67)
+
+    def test_edits_and_deletes_recompute(self):
+        self.add_set(self.squat, 100, 5)
+        self.add_set(self.squat, 140, 1)
+        top = SetLog.objects.get(weight_kg=140)
+        top.weight_kg = 90
+        top.save()
+        self.assertEqual(self.records()['Squat']['max_weight_kg'], 100.0)
+
+        SetLog.objects.filter(exercise=self.squat).delete()
+        self.assertEqual(self.records(), {})
+
+    def test_session_delete_rebuilds_records_once(self):
+        self.add_set(self.squat, 100, 5)
+        earlier = UserWorkoutLog.objects.create(user=self.user, workout=self.log.workout, date=date(2025, 1, 1))
+        SetLog.objects.create(session=earlier, exercise=self.squat, weight_kg=90, reps=5)
+        for number in range(2, 12):
+            SetLog.objects.create(session=self.log, exercise=self.squat, weight_kg=120, reps=1, set_number=number)
+        self.assertEqual(self.records()['Squat']['max_weight_kg'], 120.0)
+
+        with mock.patch('app.signals.rebuild_personal_records', wraps=rebuild_personal_records) as rebuild:
+            self.log.delete()
+        rebuild.assert_called_once_with(self.user.id, {self.squat.id}, create=False)
+        self.assertEqual(self.records()['Squat']['max_weight_kg'], 90.0)
+
+        # sets deleted on their own still recompute
+        SetLog.objects.filter(session=earlier).delete()
+        self.assertEqual(self.records(), {})
+
+    def test_migration_backfills_existing_sets(self):
+        fill_personal_records = import_module('app.migrations.0018_backfill_personal_records').fill_personal_records
+        for weight, reps in ((100, 5), (110, 3), (70, 12)):
+            self.add_set(self.squat, weight, reps)
+        self.add_set(self.bench, 80, 10)
+        incremental = self.records()
+        PersonalRecord.objects.all().delete()
+        fill_personal_records(django_apps, None)
+        self.assertEqual(self.records(), incremental)
+
+    def test_rebuild_matches_incremental(self):
+        for weight, reps in ((100, 5), (110, 3), (70, 12)):
+            self.add_set(self.squat, weight, reps)
+        incremental = self.records()
+        PersonalRecord.objects.all().delete()
+        call_command('rebuild_personal_records', stdout=StringIO())
+        self.assertEqual(self.records(), incremental)
+
+
+class MuscleGroupVolumeTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        quads = Muscle.objects.create(name='Quadriceps', group='legs')
+        back = Muscle.objects.create(name='Lower back', group='back')
+        self.squat = Exercise.objects.create(name='Squat', created_by=self.user, primary_muscle=quads)
+        self.squat.secondary_muscles.add(back)
+        workout = Workout.objects.create(user=self.user, name='Legs', description='', duration=timedelta(hours=1),
+                                         level='beginner', calories_burned=300, date=date(2025, 1, 6))
+        for day in (date(2025, 1, 6), date(2025, 1, 13)):
+            log = UserWorkoutLog.objects.create(user=self.user, workout=workout, date=day)
+            SetLog.objects.create(session=log, exercise=self.squat, weight_kg=100, reps=5)
+            SetLog.objects.create(session=log, exercise=self.squat, weight_kg=100, reps=5, set_number=2)
+
+    def volume(self, **params):
+        request = APIRequestFactory().get('/workouts/muscle-volume/', {'from': '2025-01-01', 'to': '2025-01-31', **params})
+        force_authenticate(request, self.user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = muscle_group_volume(request)
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data, len(ctx.captured_queries)
+
+    def test_primary_totals_in_one_query(self):
+        data, queries = self.volume()
+        self.assertEqual(queries, 1)
+        self.assertEqual(data['volume_by_muscle_group'], {'legs': {'total_sets': 4, 'total_volume_kg': 2000}})
+
+    def test_secondary_credit_uses_cached_matrix(self):
+        data, _ = self.volume(secondary='true')
+        self.assertEqual(data['volume_by_muscle_group']['back'], {'total_sets': 2.0, 'total_volume_kg': 1000.0})
+        _, queries = self.volume(secondary='true')
+        self.assertEqual(queries, 1)
+
+        self.squat.secondary_muscles.clear()
+        data, _ = self.volume(secondary='true')
+        self.assertNotIn('back', data['volume_by_muscle_group'])
+
+    def test_weekly_buckets(self):
+        data, queries = self.volume(granularity='week')
+        self.assertEqual(queries, 1)
+        self.assertEqual([week['week_start'] for week in data['weeks']][:3],
+                         [date(2024, 12, 30), date(2025, 1, 6), date(2025, 1, 13)])
+        self.assertEqual(data['weeks'][1]['volume_by_muscle_group']['legs']['total_volume_kg'], 1000)
+        self.assertEqual(data['weeks'][0]['volume_by_muscle_group'], {})
+
+
+class WorkoutSessionTotalsTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.squat = Exercise.objects.create(name='Squat', created_by=self.user)
+        self.plank = Exercise.objects.create(name='Plank', created_by=self.user)
+        workout = Workout.objects.create(user=self.user, name='Legs', description='', duration=timedelta(hours=1),
+                                         level='beginner', calories_burned=300, date=date.today())
+        self.log = UserWorkoutLog.objects.create(user=self.user, workout=workout, date=date.today())
+
+    def totals(self):
+        self.log.refresh_from_db()
+        return (self.log.total_sets, self.log.total_reps, float(self.log.total_volume_kg),
+                self.log.total_duration_seconds, self.log.exercises_count)
+
+    def test_set_writes_keep_totals_current(self):
+        for payload in ({'exercise': self.squat.id, 'weight_kg': 100, 'reps': 5},
+                        {'exercise': self.squat.id, 'weight_kg': 110, 'reps': 3, 'set_number': 2},
+                        {'exercise': self.plank.id, 'time_seconds': 60},
+                        {'exercise': self.squat.id, 'weight_kg': 200, 'reps': 1, 'completed': False}):
+            response = self.client.post(f'/api/workout-logs/{self.log.id}/add_set/', payload, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual(self.totals(), (3, 8, 830.0, 60, 2))
+
+        SetLog.objects.filter(exercise=self.plank).delete()
+        self.assertEqual(self.totals(), (2, 8, 830.0, 0, 1))
+
+    def test_start_and_complete_leave_totals_alone(self):
+        SetLog.objects.create(session=self.log, exercise=self.squat, weight_kg=100, reps=5)
+        for step in ('start', 'complete'):
+            with CaptureQueriesContext(connection) as ctx:
+                response = self.client.post(f'/api/workout-logs/{self.log.id}/{step}/')
+            self.assertEqual(response.status_code, 200, response.content)
+            updates = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('UPDATE "app_userworkoutlog"')]
+            self.assertTrue(updates)
+            self.assertFalse(any('total_sets' in sql for sql in updates))
+        self.assertEqual(self.totals(), (1, 5, 500.0, 0, 1))
+        self.assertTrue(self.log.completed)
+
+    def test_summary_history_skips_nested_sets(self):
+        SetLog.objects.create(session=self.log, exercise=self.squat, weight_kg=100, reps=5)
+        rows = self.client.get('/api/workout-logs/history/', {'view': 'summary'}).json()
+        rows = rows.get('results', rows) if isinstance(rows, dict) else rows
+        self.assertNotIn('sets', rows[0])
+        self.assertEqual((rows[0]['workout_name'], rows[0]['total_sets'], rows[0]['total_volume_kg']),
+                         ('Legs', 1, '500.00'))
+        self.assertEqual(self.count_queries('/api/workout-logs/history/', view='summary'),
+                         self.count_queries('/api/workout-logs/', view='summary'))
+
+
+class BatchSetLoggingTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.squat = Exercise.objects.create(name='Squat', created_by=self.user)
+        workout = Workout.objects.create(user=self.user, name='Legs', description='', duration=timedelta(hours=1),
+                                         level='beginner', calories_burned=300, date=date.today())
+        self.log = UserWorkoutLog.objects.create(user=self.user, workout=workout, date=date.today())
+        self.url = f'/api/workout-logs/{self.log.id}/add_sets/'
+
+    def post(self, sets):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(self.url, {'sets': sets}, format='json')
+        return response, len(ctx.captured_queries)
+
+    def test_queries_do_not_grow_with_batch_size(self):
+        _, small = self.post([{'exercise': self.squat.id, 'weight_kg': 100, 'reps': 5}] * 2)
+        response, large = self.post([{'exercise': self.squat.id, 'weight_kg': 100, 'reps': 5, 'set_number': n}
+                                     for n in range(25)])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['created'], 25)
+        self.assertEqual(large, small)
+
+    def test_per_item_results_and_maintenance(self):
+        response, _ = self.post([
+            {'exercise': self.squat.id, 'weight_kg': 120, 'reps': 3},
+            {'exercise': 999999, 'reps': 5},
+            {'exercise': self.squat.id, 'reps': 'many'},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'error'])
+        self.assertIn('exercise', response.data['results'][1]['errors'])
+        self.assertIn('reps', response.data['results'][2]['errors'])
+
+        self.log.refresh_from_db()
+        self.assertEqual((self.log.total_sets, self.log.total_reps), (1, 3))
+        self.assertEqual(PersonalRecord.objects.get(user=self.user, exercise=self.squat).max_weight_kg, 120)
+
+    def test_ids_without_bulk_returning(self):
+        # MySQL returns no rows from a bulk insert; results must still carry the new ids
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response, _ = self.post([{'exercise': self.squat.id, 'weight_kg': 100, 'reps': 5, 'set_number': n}
+                                     for n in range(3)])
+        ids = [result['id'] for result in response.data['results']]
+        self.assertEqual(sorted(ids), sorted(SetLog.objects.filter(session=self.log).values_list('id', flat=True)))
+        self.log.refresh_from_db()
+        self.assertEqual((self.log.total_sets, self.log.total_reps), (3, 15))
+        self.assertEqual(PersonalRecord.objects.get(user=self.user, exercise=self.squat).max_weight_kg, 100)
+
+    def test_nothing_valid_is_rejected(self):
+        response, _ = self.post([{'exercise': 999999}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.post(self.url, {'sets': []}, format='json').status_code, 400)
+
+
+class WorkoutCloningTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user.is_staff = True
+        self.user.save()
+        squat = Exercise.objects.create(name='Squat', created_by=self.user)
+        row = Exercise.objects.create(name='Row', created_by=self.user)
+        self.template = Workout.objects.create(user=self.user, name='Strength A', description='Heavy day',
+                                               duration=timedelta(hours=1), level='intermediate',
+                                               calories_burned=400, date=date(2025, 1, 6))
+        WorkoutExercise.objects.create(workout=self.template, exercise=squat, order=1, sets=5, reps=5,
+                                       rpe_min=7, rpe_max=8.5, tempo='3-1-1-0', rest_seconds=180)
+        WorkoutExercise.objects.create(workout=self.template, exercise=row, order=2, time_seconds=60, distance_m=500)
+        self.clients = [User.objects.create_user(username=f'client{n}', password='pass12345') for n in range(4)]
+
+    def prescription(self, workout):
+        return list(workout.items.order_by('order').values(
+            'exercise_id', 'order', 'sets', 'reps', 'rpe_min', 'rpe_max', 'tempo', 'rest_seconds',
+            'time_seconds', 'distance_m'))
+
+    def test_duplicate_keeps_every_prescription_field(self):
+        request = APIRequestFactory().post('/workouts/duplicate/', {'date': '2025-01-08'}, format='json')
+        force_authenticate(request, self.user)
+        response = duplicate_workout(request, self.template.id)
+        self.assertEqual(response.status_code, 201, response.data)
+        copy = Workout.objects.get(id=response.data['id'])
+        self.assertEqual((copy.name, copy.date), ('Strength A (Copy)', date(2025, 1, 8)))
+        self.assertEqual(self.prescription(copy), self.prescription(self.template))
+
+    def test_non_string_dates_are_rejected(self):
+        request = APIRequestFactory().post('/workouts/duplicate/', {'date': 20250108}, format='json')
+        force_authenticate(request, self.user)
+        self.assertEqual(duplicate_workout(request, self.template.id).status_code, 400)
+        for dates in ([20250203], [['2025-02-03']], [None]):
+            response = self.client.post('/api/coach/assign-workout/', {
+                'workout_id': self.template.id, 'client_ids': [self.clients[0].id], 'dates': dates,
+            }, format='json')
+            self.assertEqual(response.status_code, 400, dates)
+        self.assertFalse(Workout.objects.exclude(pk=self.template.pk).exists())
+
+    def rollout(self, clients, dates):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/coach/assign-workout/', {
+                'workout_id': self.template.id, 'client_ids': [c.id for c in clients], 'dates': dates,
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        return response.data, len(ctx.captured_queries)
+
+    def test_program_rollout_in_fixed_queries(self):
+        _, small = self.rollout(self.clients[:1], ['2025-02-03'])
+        data, large = self.rollout(self.clients, ['2025-03-03', '2025-03-05', '2025-03-07'])
+        self.assertEqual(data['assigned'], 12)
+        self.assertEqual(large, small)
+        copy = Workout.objects.get(user=self.clients[3], date=date(2025, 3, 7))
+        self.assertEqual(self.prescription(copy), self.prescription(self.template))
+
+    def test_existing_sessions_are_skipped(self):
+        self.rollout(self.clients[:1], ['2025-02-03'])
+        data, _ = self.rollout(self.clients[:2], ['2025-02-03'])
+        self.assertEqual(data['assigned'], 1)
+        self.assertEqual(data['skipped'], [{'client_id': self.clients[0].id, 'date': date(2025, 2, 3)}])
+
+
+class RecipeTotalsTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.milk = Food.objects.create(food_id='milk', name='Milk', calories=60, protein=3, carbs=5, fat=3)
+        self.recipe = Recipe.objects.create(name='Porridge', created_by=self.user, servings=2)
+        RecipeIngredient.objects.create(recipe=self.recipe, food=self.food, grams=100)
+        self.milk_row = RecipeIngredient.objects.create(recipe=self.recipe, food=self.milk, grams=300)
+
+    def test_totals_follow_ingredients_and_foods(self):
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.total_grams, self.recipe.calories, self.recipe.protein), (400, 560, 22))
+        self.assertEqual(self.recipe.nutrition_per_serving()['calories'], 280)
+        self.assertEqual(self.recipe.nutrition_per_100g()['calories'], 140)
+
+        self.milk.calories = 40
+        self.milk.save()
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.calories, 500)
+
+        self.milk_row.delete()
+        self.recipe.refresh_from_db()
+        self.assertEqual((self.recipe.total_grams, self.recipe.calories), (100, 380))
+
+    def test_diary_entry_uses_one_serving(self):
+        entry = FoodDiaryEntry.objects.create(user=self.user, recipe=self.recipe, servings=1)
+        self.assertEqual(entry.calories, 280)
+
+    def test_summary_list_skips_ingredients(self):
+        for n in range(3):
+            Recipe.objects.create(name=f'Recipe {n}', created_by=self.user)
+        rows = self.client.get('/api/recipes/', {'view': 'summary'}).json()
+        rows = rows.get('results', rows) if isinstance(rows, dict) else rows
+        porridge = next(row for row in rows if row['name'] == 'Porridge')
+        self.assertNotIn('ingredients', porridge)
+        self.assertEqual((porridge['calories'], porridge['per_serving']['calories']), (560, 280))
+        self.assertEqual(self.count_queries('/api/recipes/', view='summary'), 1)
+
+
+class RecipeWritePipelineTests(QueryCountTestCase):
+    def setUp(self):
+        super().setUp()
+        self.milk = Food.objects.create(food_id='milk', name='Milk', calories=60, protein=3, carbs=5, fat=3)
+
+    def test_create_validates_foods_and_stores_totals(self):
+        response = self.client.post('/api/recipes/', {'name': 'Porridge', 'created_by': self.user.id, 'servings': 2,
+                                                      'ingredients': [{'food_id': self.food.id, 'grams': 100},
+                                                                      {'food_id': self.milk.id, 'grams': 300}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        self.assertEqual((response.data['calories'], response.data['per_serving']['calories']), (560, 280))
+        self.assertEqual(RecipeIngredient.objects.filter(recipe_id=response.data['id']).count(), 2)
+
+        response = self.client.post('/api/recipes/', {'name': 'Broken', 'created_by': self.user.id,
+                                                      'ingredients': [{'food_id': 999999, 'grams': 100}]},
+                                    format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Recipe.objects.filter(name='Broken').exists())
+
+    def import_json(self, recipes):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post('/api/recipes/import/', {'recipes': recipes}, format='json')
+        return response, len(ctx.captured_queries)
+
+    def test_json_import_reports_per_recipe(self):
+        response, _ = self.import_json([
+            {'name': 'Oat milk', 'ingredients': [{'food_id': self.food.id, 'grams': 50},
+                                                 {'food_id': self.milk.id, 'grams': 250}]},
+            {'name': 'Ghost', 'ingredients': [{'food_id': 999999, 'grams': 10}]},
+            {'name': '', 'ingredients': [{'food_id': self.food.id, 'grams': 10}]},
+            {'name': 'Negative', 'ingredients': [{'food_id': self.food.id, 'grams': -5}]},
+        ])
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([r['status'] for r in response.data['results']], ['created', 'error', 'error', 'error'])
+        recipe = Recipe.objects.get(id=response.data['results'][0]['id'])
+        self.assertEqual((recipe.total_grams, recipe.calories), (300, 340))
+
+    def test_import_queries_do_not_grow_with_size(self):
+        def book(n):
+            return [{'name': f'Recipe {i}', 'ingredients': [{'food_id': self.food.id, 'grams': 10 + i},
+                                                             {'food_id': self.milk.id, 'grams': 100}]}
+                    for i in range(n)]
+        _, small = self.import_json(book(2))
+        _, large = self.import_json(book(50))
+        self.assertEqual(large, small)
+
+    def test_csv_import_points_at_lines(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        text = (
+            'recipe,servings,is_public,food_id,grams\n'
+            f'Shake,2,yes,{self.milk.id},400\n'
+            f'Shake,2,yes,{self.food.id},40\n'
+            f'Bad,1,no,{self.food.id},lots\n'
+        )
+        upload = SimpleUploadedFile('book.csv', text.encode(), content_type='text/csv')
+        response = self.client.post('/api/recipes/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 201, response.content)
+        shake, bad = response.data['results']
+        self.assertEqual(shake['status'], 'created')
+        self.assertEqual(bad['errors'][0]['line'], 4)
+        recipe = Recipe.objects.get(id=shake['id'])
+        self.assertEqual((recipe.servings, recipe.is_public, recipe.ingredients.count()), (2, True, 2))
+
+    def test_copy_recipe_keeps_totals(self):
+        original = Recipe.objects.create(name='Porridge', created_by=self.user, is_public=True)
+        RecipeIngredient.objects.create(recipe=original, food=self.food, grams=100)
+        request = APIRequestFactory().post('/recipes/copy/')
+        force_authenticate(request, self.user)
+        response = copy_recipe(request, original.id)
+        self.assertEqual(response.status_code, 201)
+        copy = Recipe.objects.get(id=response.data['id'])
+        self.assertEqual((copy.name, copy.is_public, copy.calories), ('Porridge (Copy)', False, 380))
+        self.assertEqual(list(copy.ingredients.values_list('food_id', 'grams')), [(self.food.id, 100)])
+
+
+class FoodImportTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def write(self, name, text):
+        path = os.path.join(self.directory.name, name)
+        with open(path, 'w') as handle:
+            handle.write(text)
+        return path
+
+    def run_import(self, path, *args):
+        out, err = StringIO(), StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_foods', path, *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def search(self, q):
+        return [food['name'] for food in self.client.get('/api/foods/', {'q': q}).json()]
+
+    def test_csv_upserts_foods_brands_barcodes_and_portions(self):
+        recipe = Recipe.objects.create(name='Porridge', created_by=self.user)
+        RecipeIngredient.objects.create(recipe=recipe, food=self.food, grams=100)
+        self.client.post('/api/foods/scan_barcode/', {'barcode': '0001'}, format='json')
+        header = 'food_id,name,brand,calories,protein,carbs,fat,fiber,barcodes,portions\n'
+        path = self.write('foods.csv', header + (
+            'oats,Rolled Oats,Quaker,370,13,60,7,10,0001|0002,1 cup=80\n'
+            'rice,White Rice,,130,3,28,0,,0003,\n'
+            'bad,Broken,,lots,1,1,1,,,\n'
+        ))
+        out, err = self.run_import(path)
+        self.assertIn('Imported 2 foods from 3 records', out)
+        self.assertIn('record 3: calories must be a number', err)
+        self.assertIn('rows/sec', out)
+
+        oats = Food.objects.get(food_id='oats')
+        self.assertEqual((oats.id, oats.name, oats.brand.name, oats.calories), (self.food.id, 'Rolled Oats', 'Quaker', 370))
+        self.assertEqual(sorted(oats.barcodes.values_list('code', flat=True)), ['0001', '0002'])
+        self.assertEqual(self.search('quaker'), ['Rolled Oats'])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.calories, 370)
+        data = self.client.post('/api/foods/scan_barcode/', {'barcode': '0001'}, format='json').json()
+        self.assertEqual(data['food']['name'], 'Rolled Oats')
+
+        # re-running updates in place: portions are matched by name and barcodes can move
+        self.run_import(self.write('again.csv', header + (
+            'oats,Rolled Oats,Quaker,360,13,60,7,10,0001,1 cup=90\n'
+            'rice,White Rice,,130,3,28,0,,0002|0003,\n'
+        )))
+        self.assertEqual(Food.objects.count(), 2)
+        self.assertEqual(list(oats.portions.values_list('name', 'grams')), [('1 cup', 90)])
+        self.assertEqual(FoodBarcode.objects.get(code='0002').food.food_id, 'rice')
+
+    def test_chunk_queries_do_not_grow_with_size(self):
+        def dump(name, count):
+            rows = [
+                {'food_id': f'{name}{i}', 'name': f'Food {i}', 'brand': f'Brand {i % 3}', 'calories': 100,
+                 'protein': 1, 'carbs': 2, 'fat': 3, 'barcodes': [f'{name}{i}'], 'portions': [{'name': 'slice', 'grams': 30}]}
+                for i in range(count)
+            ]
+            return self.write(f'{name}.json', json.dumps(rows))
+
+        small, large = dump('small', 3), dump('large', 30)
+        counts = []
+        for path in (small, large):
+            with CaptureQueriesContext(connection) as ctx:
+                self.run_import(path, '--chunk-size', '50')
+            counts.append(len(ctx.captured_queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_resumes_from_checkpoint(self):
+        lines = [json.dumps({'food_id': f'f{i}', 'name': f'Food {i}', 'calories': 1, 'protein': 1, 'carbs': 1, 'fat': 1})
+                 for i in range(5)]
+        path = self.write('dump.jsonl', '\n'.join(lines))
+        with open(f'{path}.checkpoint', 'w') as handle:
+            json.dump({'source': os.path.abspath(path), 'records': 3}, handle)
+
+        out, _ = self.run_import(path, '--chunk-size', '1')
+        self.assertIn('Resuming after record 3', out)
+        self.assertEqual(sorted(Food.objects.filter(food_id__startswith='f').values_list('food_id', flat=True)),
+                         ['f3', 'f4'])
+        self.assertFalse(os.path.exists(f'{path}.checkpoint'))
+
+
+class RecentFoodsTests(QueryCountTestCase):
+    url = '/api/foods/recent/'
+
+    def setUp(self):
+        super().setUp()
+        self.rice = Food.objects.create(food_id='rice', name='Rice', calories=130, protein=3, carbs=28, fat=0)
+
+    def recent(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200, response.content)
+        return [(item['type'], item['item']['name']) for item in response.data]
+
+    def test_logging_maintains_recents(self):
+        for meal_time in ('breakfast', 'breakfast', 'dinner'):
+            response = self.client.post('/api/food-diary/', {'food': self.food.id, 'meal_time': meal_time, 'date': str(date.today()),
+                                                             'servings': 1.5}, format='json')
+            self.assertEqual(response.status_code, 201, response.content)
+        self.client.post('/api/food-diary/', {'meal': self.meal.id, 'meal_time': 'lunch', 'date': str(date.today())}, format='json')
+
+        self.assertEqual(self.recent(), [('food', 'Oats'), ('meal', 'Chicken Bowl')])
+        self.assertEqual(self.recent(meal_time='lunch'), [('meal', 'Chicken Bowl')])
+        item = self.client.get(self.url, {'meal_time': 'breakfast'}).data[0]
+        self.assertEqual((item['times_logged'], item['last_servings']), (2, 1.5))
+        self.assertEqual(self.client.get(self.url, {'meal_time': 'brunch'}).status_code, 400)
+
+    def test_old_habits_decay(self):
+        entries = FoodDiaryEntry.objects.bulk_create(
+            [FoodDiaryEntry(user=self.user, food=self.food, meal_time='breakfast') for _ in range(3)]
+        )
+        remember_entries(entries, when=timezone.now() - timedelta(days=60))
+        remember_entries([FoodDiaryEntry(user=self.user, food=self.rice, meal_time='breakfast')])
+        self.assertEqual(self.recent(meal_time='breakfast'), [('food', 'Rice'), ('food', 'Oats')])
+
+        remember_entries(entries)
+        self.assertEqual(self.recent(meal_time='breakfast'), [('food', 'Oats'), ('food', 'Rice')])
+
+    def test_one_query(self):
+        foods = [Food.objects.create(food_id=f'f{i}', name=f'Food {i}', calories=1, protein=1, carbs=1, fat=1)
+                 for i in range(10)]
+        recipe = Recipe.objects.create(name='Porridge', created_by=self.user)
+        remember_entries([FoodDiaryEntry(user=self.user, food=food, meal_time='snack') for food in foods]
+                         + [FoodDiaryEntry(user=self.user, recipe=recipe, meal_time='snack'),
+                            FoodDiaryEntry(user=self.user, meal=self.meal, meal_time='snack')])
+        self.assertEqual(self.count_queries(self.url, meal_time='snack'), 1)
+        self.assertEqual(len(self.recent(limit=5)), 5)
+
+    def test_rebuild_command(self):
+        self.client.post('/api/food-diary/', {'food': self.food.id, 'meal_time': 'dinner', 'date': str(date.today())}, format='json')
+        self.client.post('/api/food-diary/', {'food': self.rice.id, 'meal_time': 'dinner', 'date': str(date.today())}, format='json')
+        RecentFood.objects.all().delete()
+        call_command('rebuild_recent_foods', stdout=StringIO())
+        self.assertEqual(sorted(name for _, name in self.recent(meal_time='dinner')), ['Oats', 'Rice'])
+
+
+class DiaryBulkTests(QueryCountTestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.today = date.today()
+        self.yesterday = self.today - timedelta(days=1)
+
+    def log(self, count, day, meal_time='breakfast'):
+        return [FoodDiaryEntry.objects.create(user=self.user, date=day, meal_time=meal_time, food=self.food, servings=2)
+                for _ in range(count)]
+
+    def post(self, url, body):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.post(f'/api/food-diary/{url}/', body, format='json')
+        return response, len(ctx.captured_queries)
+
+    def rollup(self, day):
+        return DailyUserRollup.objects.get(user=self.user, date=day)
+
+    def test_copy_day(self):
+        self.log(2, self.yesterday)
+        self.log(1, self.yesterday, meal_time='dinner')
+        body = {'from_date': str(self.yesterday), 'to_date': str(self.today)}
+        response, _ = self.post('copy_day', body)
+        self.assertEqual((response.status_code, response.data['created']), (201, 3))
+        self.assertEqual(self.rollup(self.today).calories, 3 * 760)
+        self.assertEqual(RecentFood.objects.get(user=self.user, meal_time='dinner').times_logged, 2)
+
+        _, small = self.post('copy_day', {**body, 'to_date': str(self.today + timedelta(days=1))})
+        self.log(10, self.yesterday)
+        _, large = self.post('copy_day', {**body, 'to_date': str(self.today + timedelta(days=2))})
+        self.assertEqual(large, small)
+
+        response, _ = self.post('copy_day', {**body, 'meal_times': ['dinner'], 'to_date': str(self.today + timedelta(days=3))})
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(self.post('copy_day', {**body, 'to_date': str(self.yesterday)})[0].status_code, 400)
+
+    def test_copy_meal(self):
+        self.log(2, self.today)
+        response, _ = self.post('copy_meal', {'from_date': str(self.today), 'meal_time': 'breakfast',
+                                              'to_meal_time': 'snack'})
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(FoodDiaryEntry.objects.filter(date=self.today, meal_time='snack').count(), 2)
+        self.assertEqual(self.rollup(self.today).calories, 4 * 760)
+
+        response, _ = self.post('copy_meal', {'from_date': str(self.today), 'meal_time': 'breakfast'})
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.post('copy_meal', {'from_date': str(self.today), 'meal_time': 'dinner',
+                                              'to_meal_time': 'snack'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_bulk_create_and_delete(self):
+        old = self.log(2, self.today)
+        cup = FoodPortion.objects.create(food=self.food, name='1 cup', grams=50)
+        rice = Food.objects.create(food_id='rice', name='Rice', calories=130, protein=3, carbs=28, fat=0)
+        recipe = Recipe.objects.create(name='Porridge', created_by=self.user, servings=2)
+        RecipeIngredient.objects.create(recipe=recipe, food=self.food, grams=100)
+        day = str(self.today)
+        response, _ = self.post('bulk', {
+            'create': [
+                {'date': day, 'meal_time': 'lunch', 'food': self.food.id, 'portion': cup.id, 'servings': 2},
+                {'date': day, 'meal_time': 'lunch', 'recipe': recipe.id},
+                {'date': day, 'meal_time': 'lunch', 'food': 999999},
+                {'date': day, 'meal_time': 'lunch', 'food': self.food.id, 'meal': self.meal.id},
+                {'date': day, 'meal_time': 'lunch', 'food': rice.id, 'portion': cup.id},
+            ],
+            'delete': [old[0].id, 999999],
+        })
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual([r['status'] for r in response.data['results']],
+                         ['created', 'created', 'error', 'error', 'error'])
+        self.assertEqual(response.data['results'][4]['errors'], {'portion': ['Portion does not belong to this food']})
+        self.assertEqual((response.data['deleted'], response.data['not_found']), ([old[0].id], [999999]))
+
+        lunch = FoodDiaryEntry.objects.filter(date=self.today, meal_time='lunch')
+        self.assertEqual(sorted(lunch.values_list('calories', flat=True)), [190, 380])
+        self.assertEqual(self.rollup(self.today).calories, 760 + 380 + 190)
+        self.assertEqual(RecentFood.objects.get(user=self.user, item_key=f'recipe:{recipe.id}', meal_time='lunch').times_logged, 1)
+
+        response, _ = self.post('bulk', {'create': [{'date': day, 'meal_time': 'lunch'}]})
+        self.assertEqual(response.status_code, 400)
+        response, _ = self.post('bulk', {'delete': [old[1].id]})
+        self.assertEqual(response.status_code, 200)
+        for body in (['a'], [{'date': day}], 'create'):
+            response, _ = self.post('bulk', body)
+            self.assertEqual(response.status_code, 400, body)
 
-# Create your tests here.
+    def test_ids_without_bulk_returning(self):
+        # MySQL returns no rows from a bulk insert; an offline queue still needs every new id
+        day = str(self.today)
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            response, _ = self.post('bulk', {'create': [
+                {'date': day, 'meal_time': 'lunch', 'food': self.food.id},
+                {'date': day, 'meal_time': 'lunch', 'meal': self.meal.id, 'servings': 2},
+            ]})
+            self.post('copy_meal', {'from_date': day, 'meal_time': 'lunch', 'to_meal_time': 'dinner'})
+        ids = [result['id'] for result in response.data['results']]
+        self.assertEqual(sorted(ids), sorted(FoodDiaryEntry.objects.filter(meal_time='lunch').values_list('id', flat=True)))
+        self.assertEqual(self.rollup(self.today).calories, 2 * (380 + 1100))
+        self.assertEqual(RecentFood.objects.get(user=self.user, item_key=f'food:{self.food.id}', meal_time='').times_logged, 2)
+        self.assertEqual(sorted(FoodDiaryEntry.objects.filter(meal_time='dinner').values_list('calories', flat=True)),
+                         [380, 1100])
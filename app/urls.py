@@ -69,6 +69,7 @@ urlpatterns = [
    path('coach/clients/', views.list_clients, name='list-clients'),
    path('coach/clients/<int:client_id>/', views.client_detail, name='client-detail'),
    path('coach/clients/<int:client_id>/assign-workout/', views.assign_workout_to_client, name='assign-workout'),
+   path('coach/assign-workout/', views.assign_workout_program, name='assign-workout-program'),
  # Cart
     path('cart/', get_cart, name='get-cart'),
     path('cart/add/', add_to_cart, name='add-to-cart'),
@@ -1,24 +1,56 @@
 # views.py - COMPLETE VERSION
 from rest_framework import viewsets, status, permissions
 from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.http import StreamingHttpResponse
 from django.utils import timezone
+from django.db import connection, transaction
 from django.db.models import Sum, Q, Count, Max
+from django.db.models.functions import TruncDate
 from datetime import datetime, date, timedelta
 import random
+import csv
 import string, json
 import time
 from .serializers import *
 from .models import *
+from .analytics import daily_summary, diary_totals
+from .barcodes import MAX_BATCH_CODES, lookup_barcodes
+from .dates import date_window, user_timezone
+from .diary import MAX_DIARY_BATCH, copy_entries, entry_sources, resolve_entry, save_entries, source_errors
+from .heart_rate import (
+    HR_BUCKETS, MAX_POINTS, MAX_REPORTED_ERRORS, downsample, estimated_max_hr, ingest_samples, parse_samples,
+    range_stats, stream_buckets, summarize_session,
+)
+from .recents import MAX_RECENT_FOODS, RECENT_FOODS_LIMIT, recent_items
+from .rollups import load_week_windows, weights_as_of
+from .recipes import (
+    MAX_IMPORT_RECIPES, apply_totals, copy_recipe as copy_recipe_for, import_recipes as import_recipe_specs,
+    load_foods, parse_ingredients, recipes_from_csv, unknown_food_errors, write_recipes,
+)
+from .records import record_sets
+from .search import search_foods
+from .streaks import get_streak
+from .volume import muscle_group_volume as training_volume, refresh_session_totals
+from .workouts import clone_workout
 from django.shortcuts import get_object_or_404
 from datetime import date, datetime, timedelta
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
+
+MAX_TREND_WEEKS = 52
+MAX_CALENDAR_MONTHS = 24
+MAX_SETS_PER_BATCH = 200
+MAX_ASSIGNED_WORKOUTS = 2000
+FOOD_SEARCH_LIMIT = 20
+
 # ============================================
 # AUTH VIEWS
 # ============================================
@@ -289,64 +321,21 @@ def dashboard_today(request):
     """Get today's dashboard summary"""
     user = request.user
     today = date.today()
-    
-    # Get daily macro target
-    try:
-        daily_target = DailyMacroTarget.objects.get(user=user, date=today)
-    except DailyMacroTarget.DoesNotExist:
-        active_plan = MacroPlan.objects.filter(user=user, active=True).first()
-        if active_plan:
-            daily_target = DailyMacroTarget.objects.create(
-                user=user, date=today,
-                calorie_target=active_plan.calorie_target,
-                protein_g=active_plan.protein_g,
-                carbs_g=active_plan.carbs_g,
-                fats_g=active_plan.fats_g
-            )
-        else:
-            daily_target = None
-    
-    # Calculate consumed nutrition
-    food_entries = FoodDiaryEntry.objects.filter(user=user, date=today)
-    consumed_calories = consumed_protein = consumed_carbs = consumed_fats = 0
-    
-    for entry in food_entries:
-        if entry.food:
-            consumed_calories += entry.food.calories * entry.servings
-            consumed_protein += entry.food.protein * entry.servings
-            consumed_carbs += entry.food.carbs * entry.servings
-            consumed_fats += entry.food.fat * entry.servings
-        elif entry.meal:
-            consumed_calories += entry.meal.calories * entry.servings
-            consumed_protein += entry.meal.protein * entry.servings
-            consumed_carbs += entry.meal.carbs * entry.servings
-            consumed_fats += entry.meal.fats * entry.servings
-    
-    # Burned calories
-    workout_logs = UserWorkoutLog.objects.filter(user=user, date=today, completed=True)
-    burned_calories = sum([log.calories_burned or 0 for log in workout_logs])
-    
-    activity_summary = DailyActivitySummary.objects.filter(user=user, date=today).first()
-    if activity_summary:
-        burned_calories += activity_summary.calories_burned
-    
-    # Water
-    total_water = WaterLog.objects.filter(user=user, date=today).aggregate(
-        Sum('amount_ml'))['amount_ml__sum'] or 0
-    
-    # Steps
-    steps = activity_summary.steps if activity_summary else 0
-    
-    # Workouts
-    scheduled_workouts = Workout.objects.filter(user=user, date=today)
-    completed_workouts = workout_logs.count()
-    next_workout = scheduled_workouts.filter(completed=False).first()
-    
-    # Sleep
-    last_checkin = Checkin.objects.filter(user=user).order_by('-date').first()
-    
-    profile = user.profile
-    
+
+    summary = daily_summary(user, today)
+    daily_target = summary['target']
+    profile = summary['profile']
+
+    consumed_calories = summary['consumed']['calories']
+    consumed_protein = summary['consumed']['protein']
+    consumed_carbs = summary['consumed']['carbs']
+    consumed_fats = summary['consumed']['fats']
+    burned_calories = summary['burned_calories']
+    total_water = summary['water_ml']
+    steps = summary['steps']
+    next_workout = summary['next_workout']
+    last_sleep_hours = summary['last_sleep_hours']
+
     return Response({
         'date': today,
         'user': {
@@ -377,12 +366,12 @@ def dashboard_today(request):
             'percentage': round((steps / profile.daily_step_goal) * 100, 1)
         },
         'workouts': {
-            'completed': completed_workouts,
-            'scheduled': scheduled_workouts.count(),
-            'next_workout': {'id': next_workout.id, 'name': next_workout.name, 'time': '18:00'} if next_workout else None
+            'completed': summary['workouts_completed'],
+            'scheduled': summary['workouts_scheduled'],
+            'next_workout': {**next_workout, 'time': '18:00'} if next_workout else None
         },
         'sleep': {
-            'last_night_hours': float(last_checkin.sleep_hours) if last_checkin and last_checkin.sleep_hours else None,
+            'last_night_hours': float(last_sleep_hours) if last_sleep_hours else None,
             'goal_hours': float(profile.sleep_goal_hours) if profile.sleep_goal_hours else 8
         }
     })
@@ -392,7 +381,10 @@ def dashboard_today(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def weekly_progress(request):
-    """Get weekly progress summary (optionally by ?week_start=YYYY-MM-DD)"""
+    """
+    Get weekly progress summary (optionally by ?week_start=YYYY-MM-DD)
+    ?weeks=N returns the N weeks ending with that week, oldest first
+    """
     user = request.user
 
     # Optional query param: week_start
@@ -406,37 +398,27 @@ def weekly_progress(request):
         today = date.today()
         week_start = today - timedelta(days=today.weekday())
 
-    week_end = week_start + timedelta(days=6)
+    weeks = _parse_weeks(request)
+    if weeks is None:
+        return Response({'error': f'weeks must be an integer between 1 and {MAX_TREND_WEEKS}.'}, status=400)
 
-    daily_data = []
-    for i in range(7):
-        day = week_start + timedelta(days=i)
-
-        # Food entries
-        food_entries = FoodDiaryEntry.objects.filter(user=user, date=day)
-        calories = sum([
-            (entry.food.calories if entry.food else entry.meal.calories) * entry.servings
-            for entry in food_entries
-        ])
-
-        # Steps
-        activity = DailyActivitySummary.objects.filter(user=user, date=day).first()
-        steps = activity.steps if activity else 0
-
-        # Weight
-        progress = Progress.objects.filter(user=user, date=day).first()
-        weight = float(progress.weight) if progress else None
-
-        # Workouts
-        workout_completed = UserWorkoutLog.objects.filter(user=user, date=day, completed=True).exists()
-
-        daily_data.append({
-            'date': day,
-            'weight': weight,
-            'calories': round(calories),
-            'steps': steps,
-            'workout_completed': workout_completed
-        })
+    workouts_target = user.profile.workouts_per_week
+    windows = load_week_windows(user, week_start - timedelta(weeks=weeks - 1), weeks)
+    summaries = [_weekly_progress_summary(window, workouts_target) for window in windows]
+
+    if weeks == 1:
+        return Response(summaries[0])
+    return Response({'weeks': summaries})
+
+
+def _weekly_progress_summary(window, workouts_target):
+    daily_data = [{
+        'date': day['date'],
+        'weight': float(day['weight']) if day['weight'] is not None else None,
+        'calories': round(day['calories']),
+        'steps': day['steps'],
+        'workout_completed': day['workouts_completed'] > 0
+    } for day in window['days']]
 
     total_calories = sum([d['calories'] for d in daily_data])
     total_steps = sum([d['steps'] for d in daily_data])
@@ -445,16 +427,43 @@ def weekly_progress(request):
     weights = [d['weight'] for d in daily_data if d['weight']]
     weight_change = weights[-1] - weights[0] if len(weights) >= 2 else 0
 
-    return Response({
-        'week_start': week_start,
-        'week_end': week_end,
+    return {
+        'week_start': window['week_start'],
+        'week_end': window['week_end'],
         'weight_change': round(weight_change, 1),
         'workouts_completed': workouts_completed,
-        'workouts_target': user.profile.workouts_per_week,
+        'workouts_target': workouts_target,
         'avg_calories': round(total_calories / 7) if total_calories else 0,
         'avg_steps': round(total_steps / 7) if total_steps else 0,
         'daily_data': daily_data
-    })
+    }
+
+
+def _parse_weeks(request):
+    """Number of consecutive weeks requested via ?weeks=N (ending with the selected week)"""
+    try:
+        weeks = int(request.query_params.get('weeks', 1))
+    except ValueError:
+        return None
+    if not 1 <= weeks <= MAX_TREND_WEEKS:
+        return None
+    return weeks
+
+
+# ============================================
+# EAGER LOADING
+# ============================================
+
+class EagerLoadingViewSetMixin:
+    """Apply the serializer's setup_eager_loading to every list/detail queryset"""
+
+    def filter_queryset(self, queryset):
+        return self.with_eager_loading(super().filter_queryset(queryset))
+
+    def with_eager_loading(self, queryset):
+        """For custom actions that serialize their own querysets"""
+        setup = getattr(self.get_serializer_class(), 'setup_eager_loading', None)
+        return setup(queryset, self.request) if setup else queryset
 
 
 # ============================================
@@ -466,13 +475,37 @@ class FoodViewSet(viewsets.ReadOnlyModelViewSet):
     
     def get_queryset(self):
         queryset = Food.objects.all()
-        search = self.request.query_params.get('q', None)
-        if search:
-            queryset = queryset.filter(Q(name__icontains=search) | Q(brand__name__icontains=search))
         if self.action == 'list':  # only limit when listing
             queryset = queryset[:20]
         return queryset
 
+    def list(self, request, *args, **kwargs):
+        """Foods, ranked by relevance when ?q= is given"""
+        search = request.query_params.get('q', None)
+        if not search:
+            return super().list(request, *args, **kwargs)
+        foods = search_foods(search, user=request.user, limit=FOOD_SEARCH_LIMIT)
+        return Response(self.get_serializer(foods, many=True).data)
+
+    @action(detail=False, methods=['get'])
+    def recent(self, request):
+        """
+        The foods, recipes and meals the user logs most, recent logs weighing more
+        Query: ?meal_time=breakfast|lunch|dinner|snack (default: every meal time), ?limit=
+        """
+        meal_time = request.query_params.get('meal_time', RecentFood.ANY_MEAL_TIME)
+        if meal_time != RecentFood.ANY_MEAL_TIME and meal_time not in MealTime.values:
+            return Response({'error': f"meal_time must be one of {', '.join(MealTime.values)}"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = int(request.query_params.get('limit', RECENT_FOODS_LIMIT))
+        except ValueError:
+            return Response({'error': 'limit must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(max(limit, 1), MAX_RECENT_FOODS)
+
+        items = recent_items(request.user, meal_time, limit)
+        return Response(RecentFoodSerializer(items, many=True).data)
+
     @action(detail=False, methods=['post'], permission_classes=[IsAuthenticated])
     def create_custom(self, request):
         """Create a custom food item"""
@@ -489,15 +522,35 @@ class FoodViewSet(viewsets.ReadOnlyModelViewSet):
         if not barcode:
             return Response({'error': 'Barcode required'}, status=status.HTTP_400_BAD_REQUEST)
         
-        try:
-            food_barcode = FoodBarcode.objects.get(code=barcode)
-            serializer = self.get_serializer(food_barcode.food)
-            return Response({'found': True, 'food': serializer.data})
-        except FoodBarcode.DoesNotExist:
-            return Response({'found': False, 'message': 'Food not found'})
+        result = lookup_barcodes([barcode])[barcode]
+        if result['found']:
+            return Response(result)
+        return Response({'found': False, 'message': 'Food not found'})
 
+    @action(detail=False, methods=['post'])
+    def scan_barcodes(self, request):
+        """
+        Resolve a queue of scanned barcodes at once
+        Body: {barcodes: ["...", ...]}
+        """
+        barcodes = request.data.get('barcodes') if isinstance(request.data, dict) else None
+        if not isinstance(barcodes, list) or not barcodes or not all(isinstance(code, str) for code in barcodes):
+            return Response({'error': 'barcodes must be a non-empty list of strings'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(barcodes) > MAX_BATCH_CODES:
+            return Response({'error': f'At most {MAX_BATCH_CODES} barcodes per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        found = lookup_barcodes(barcodes)
+        results = [{'barcode': code, **found[code]} for code in barcodes]
+        return Response({
+            'results': results,
+            'found': sum(1 for result in results if result['found']),
+            'missing': sum(1 for result in results if not result['found']),
+        })
 
-class FoodDiaryViewSet(viewsets.ModelViewSet):
+
+class FoodDiaryViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = FoodDiaryEntrySerializer
     permission_classes = [IsAuthenticated]
     
@@ -515,32 +568,124 @@ class FoodDiaryViewSet(viewsets.ModelViewSet):
         """Get meal diary for a specific date"""
         date_param = request.query_params.get('date', date.today())
         if isinstance(date_param, str):
-            date_param = datetime.strptime(date_param, '%Y-%m-%d').date()
+            try:
+                date_param = datetime.strptime(date_param, '%Y-%m-%d').date()
+            except ValueError:
+                return Response({'error': 'Invalid date. Use YYYY-MM-DD.'}, status=status.HTTP_400_BAD_REQUEST)
         
         entries = FoodDiaryEntry.objects.filter(user=request.user, date=date_param)
         
         meals = {'breakfast': [], 'lunch': [], 'dinner': [], 'snack': []}
-        total_calories = total_protein = total_carbs = total_fats = 0
+        for data in self.get_serializer(self.with_eager_loading(entries), many=True).data:
+            meals.setdefault(data['meal_time'], []).append(data)
         
-        for entry in entries:
-            serializer = self.get_serializer(entry)
-            data = serializer.data
-            meals[entry.meal_time].append(data)
-            
-            total_calories += data['total_calories']
-            total_protein += data['total_protein']
-            total_carbs += data['total_carbs']
-            total_fats += data['total_fats']
+        totals = diary_totals(entries)
         
         return Response({
             'date': date_param,
-            'total_calories': round(total_calories),
-            'total_protein': round(total_protein, 1),
-            'total_carbs': round(total_carbs, 1),
-            'total_fats': round(total_fats, 1),
+            'total_calories': round(totals['calories']),
+            'total_protein': round(totals['protein'], 1),
+            'total_carbs': round(totals['carbs'], 1),
+            'total_fats': round(totals['fats'], 1),
             'meals': meals
         })
 
+    @action(detail=False, methods=['post'])
+    def copy_day(self, request):
+        """
+        Copy every entry of one day to another (e.g. repeat yesterday)
+        Body: {from_date, to_date, meal_times: [optional subset]}
+        """
+        serializer = DiaryDayCopySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        sources = FoodDiaryEntry.objects.filter(user=request.user, date=data['from_date'])
+        if data.get('meal_times'):
+            sources = sources.filter(meal_time__in=data['meal_times'])
+        created = copy_entries(request.user.id, sources, data['to_date'])
+        if not created:
+            return Response({'error': 'No entries to copy'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'created': len(created), 'date': data['to_date']}, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def copy_meal(self, request):
+        """
+        Copy one meal slot to another date and/or meal slot
+        Body: {from_date, meal_time, to_date (default: from_date), to_meal_time (default: meal_time)}
+        """
+        serializer = DiaryMealCopySerializer(data=request.data)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+        data = serializer.validated_data
+
+        sources = FoodDiaryEntry.objects.filter(user=request.user, date=data['from_date'], meal_time=data['meal_time'])
+        created = copy_entries(request.user.id, sources, data['to_date'], meal_time=data['to_meal_time'])
+        if not created:
+            return Response({'error': 'No entries to copy'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({
+            'created': len(created), 'date': data['to_date'], 'meal_time': data['to_meal_time']
+        }, status=status.HTTP_201_CREATED)
+
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """
+        Create and/or delete many diary entries in one call (e.g. an offline queue)
+        Body: {create: [{date, meal_time, food | recipe | meal, portion, servings, ...}], delete: [entry ids]}
+        Valid entries are stored together; each item reports its result by index.
+        """
+        if not isinstance(request.data, dict):
+            return Response({'error': 'create and/or delete must be non-empty lists'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        items = request.data.get('create') or []
+        delete_ids = request.data.get('delete') or []
+        if not isinstance(items, list) or not isinstance(delete_ids, list) or not (items or delete_ids):
+            return Response({'error': 'create and/or delete must be non-empty lists'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) + len(delete_ids) > MAX_DIARY_BATCH:
+            return Response({'error': f'At most {MAX_DIARY_BATCH} entries per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if not all(isinstance(entry_id, int) and not isinstance(entry_id, bool) for entry_id in delete_ids):
+            return Response({'error': 'delete must be a list of entry ids'}, status=status.HTTP_400_BAD_REQUEST)
+
+        checked = [FoodDiaryBatchItemSerializer(data=item) for item in items]
+        entries = [
+            FoodDiaryEntry(user=request.user, **serializer.validated_data) if serializer.is_valid() else None
+            for serializer in checked
+        ]
+        sources = entry_sources([entry for entry in entries if entry])
+
+        results, new_entries = [], []
+        for index, (serializer, entry) in enumerate(zip(checked, entries)):
+            errors = serializer.errors if entry is None else source_errors(entry, sources)
+            if errors:
+                results.append({'index': index, 'status': 'error', 'errors': errors})
+                continue
+            resolve_entry(entry, sources)
+            new_entries.append(entry)
+            results.append({'index': index, 'status': 'created', 'entry': entry})
+
+        with transaction.atomic():
+            save_entries(request.user.id, new_entries)
+            doomed = FoodDiaryEntry.objects.filter(user=request.user, id__in=delete_ids)
+            deleted = set(doomed.values_list('id', flat=True))
+            # a queryset delete still sends post_delete per row, which keeps the rollups
+            doomed.delete()
+
+        for result in results:
+            if 'entry' in result:
+                result['id'] = result.pop('entry').pk
+
+        return Response({
+            'created': len(new_entries),
+            'rejected': len(items) - len(new_entries),
+            'deleted': sorted(deleted),
+            'not_found': [entry_id for entry_id in delete_ids if entry_id not in deleted],
+            'results': results,
+        }, status=status.HTTP_201_CREATED if new_entries else (
+            status.HTTP_200_OK if deleted else status.HTTP_400_BAD_REQUEST))
+
  
 class MealViewSet(viewsets.ReadOnlyModelViewSet):
     """API for listing meals and fetching weekly menus"""
@@ -590,7 +735,7 @@ class MealViewSet(viewsets.ReadOnlyModelViewSet):
 # ============================================
 # WORKOUT VIEWSETS
 # ============================================
-class WorkoutViewSet(viewsets.ModelViewSet):
+class WorkoutViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     """
     Workout templates and plans
     Corresponds to: Personalized Plan screen showing weekly workout schedule
@@ -613,7 +758,7 @@ class WorkoutViewSet(viewsets.ModelViewSet):
             date__range=[week_start, week_end]
         ).order_by('date')
         
-        serializer = self.get_serializer(workouts, many=True)
+        serializer = self.get_serializer(self.with_eager_loading(workouts), many=True)
         return Response(serializer.data)
     
     @action(detail=False, methods=['get'])
@@ -639,7 +784,7 @@ class WorkoutViewSet(viewsets.ModelViewSet):
         else:
             workouts = self.get_queryset()
         
-        serializer = self.get_serializer(workouts, many=True)
+        serializer = self.get_serializer(self.with_eager_loading(workouts), many=True)
         return Response(serializer.data)
     def get_queryset(self):
         return Workout.objects.filter(user=self.request.user)
@@ -700,7 +845,7 @@ class MuscleViewSet(viewsets.ReadOnlyModelViewSet):
         return Response(groups)
 
 
-class UserWorkoutLogViewSet(viewsets.ModelViewSet):
+class UserWorkoutLogViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     """
     User's workout logs and tracking
     Corresponds to: Workout tracking with sets, reps, weights
@@ -710,6 +855,8 @@ class UserWorkoutLogViewSet(viewsets.ModelViewSet):
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
             return WorkoutLogCreateSerializer
+        if self.action in ['list', 'history'] and self.request.query_params.get('view') == 'summary':
+            return UserWorkoutLogSummarySerializer
         return UserWorkoutLogSerializer
     
     def get_queryset(self):
@@ -723,7 +870,8 @@ class UserWorkoutLogViewSet(viewsets.ModelViewSet):
         """Start a workout session"""
         workout_log = self.get_object()
         workout_log.start_time = timezone.now().time()
-        workout_log.save()
+        # the set endpoints keep the session totals current; a full save would write back stale ones
+        workout_log.save(update_fields=['start_time'])
         
         serializer = self.get_serializer(workout_log)
         return Response(serializer.data)
@@ -734,7 +882,7 @@ class UserWorkoutLogViewSet(viewsets.ModelViewSet):
         workout_log = self.get_object()
         workout_log.end_time = timezone.now().time()
         workout_log.completed = True
-        workout_log.save()
+        workout_log.save(update_fields=['end_time', 'completed'])
         
         serializer = self.get_serializer(workout_log)
         return Response(serializer.data)
@@ -756,9 +904,65 @@ class UserWorkoutLogViewSet(viewsets.ModelViewSet):
         
         return Response(serializer.data, status=status.HTTP_201_CREATED)
     
+    @action(detail=True, methods=['post'])
+    def add_sets(self, request, pk=None):
+        """
+        Add many set logs to this workout session in one call (e.g. an offline queue)
+        Body: {sets: [{exercise, order, set_number, reps, weight_kg, rpe, etc.}]}
+        Valid sets are stored together; each item reports its result by index.
+        """
+        workout_log = self.get_object()
+        items = request.data.get('sets') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'sets must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > MAX_SETS_PER_BATCH:
+            return Response({'error': f'At most {MAX_SETS_PER_BATCH} sets per request'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        checked = [SetLogBatchItemSerializer(data=item) for item in items]
+        valid = [serializer.is_valid() for serializer in checked]
+        known_exercises = set(Exercise.objects.filter(
+            id__in={s.validated_data['exercise_id'] for s, ok in zip(checked, valid) if ok}
+        ).values_list('id', flat=True))
+        
+        results, new_sets = [], []
+        for index, (serializer, ok) in enumerate(zip(checked, valid)):
+            if not ok:
+                results.append({'index': index, 'status': 'error', 'errors': serializer.errors})
+                continue
+            if serializer.validated_data['exercise_id'] not in known_exercises:
+                results.append({'index': index, 'status': 'error', 'errors': {'exercise': ['Exercise not found']}})
+                continue
+            set_log = SetLog(session=workout_log, **serializer.validated_data)
+            new_sets.append(set_log)
+            results.append({'index': index, 'status': 'created', 'set': set_log})
+        
+        if new_sets and not connection.features.can_return_rows_from_bulk_insert:
+            # backends without RETURNING (MySQL) leave bulk-created pks unset and sets have no
+            # natural key to read them back by, so save row by row and let the signals maintain
+            with transaction.atomic():
+                for set_log in new_sets:
+                    set_log.save(force_insert=True)
+        elif new_sets:
+            with transaction.atomic():
+                SetLog.objects.bulk_create(new_sets)
+                # bulk_create skips the SetLog signals, so maintain records and totals here
+                record_sets(workout_log.user_id, workout_log.date, new_sets)
+                refresh_session_totals(workout_log.id)
+        
+        for result in results:
+            if 'set' in result:
+                result['id'] = result.pop('set').pk
+        
+        return Response({
+            'created': len(new_sets),
+            'rejected': len(items) - len(new_sets),
+            'results': results
+        }, status=status.HTTP_201_CREATED if new_sets else status.HTTP_400_BAD_REQUEST)
+    
     @action(detail=False, methods=['get'])
     def history(self, request):
-        """Get workout history with pagination"""
+        """Get workout history with pagination (?view=summary drops the nested sets)"""
         start_date = request.query_params.get('start_date')
         end_date = request.query_params.get('end_date')
         
@@ -769,7 +973,7 @@ class UserWorkoutLogViewSet(viewsets.ModelViewSet):
         if end_date:
             queryset = queryset.filter(date__lte=end_date)
         
-        queryset = queryset.order_by('-date')
+        queryset = self.with_eager_loading(queryset.order_by('-date'))
         
         page = self.paginate_queryset(queryset)
         if page is not None:
@@ -1065,10 +1269,15 @@ class CardioSessionViewSet(viewsets.ModelViewSet):
         
         if activity:
             queryset = queryset.filter(activity=activity)
-        if from_date:
-            queryset = queryset.filter(started_at__date__gte=from_date)
-        if to_date:
-            queryset = queryset.filter(started_at__date__lte=to_date)
+        if from_date or to_date:
+            try:
+                from_date = date.fromisoformat(from_date) if from_date else None
+                to_date = date.fromisoformat(to_date) if to_date else None
+            except ValueError:
+                raise ValidationError({'error': 'Invalid date format. Use YYYY-MM-DD'})
+            queryset = queryset.filter(
+                date_window('started_at', from_date, to_date, user_timezone(self.request.user))
+            )
         
         return queryset.order_by('-started_at')
     
@@ -1098,11 +1307,18 @@ class CardioSessionViewSet(viewsets.ModelViewSet):
                     status=400
                 )
 
+        if not session.ended_at:
+            session.ended_at = timezone.now()
+
         # --- Update other optional fields ---
         session.distance_m = request.data.get('distance_m', session.distance_m)
         session.calories = request.data.get('calories', session.calories)
         session.avg_hr = request.data.get('avg_hr', session.avg_hr)
         session.notes = request.data.get('notes', session.notes)
+
+        # --- Heart-rate summary from recorded samples (overrides client avg_hr) ---
+        for field, value in summarize_session(session, estimated_max_hr(request.user)).items():
+            setattr(session, field, value)
         session.save()
 
         # --- Duration and average pace calculation ---
@@ -1117,7 +1333,11 @@ class CardioSessionViewSet(viewsets.ModelViewSet):
         return Response({
             "completed": True,
             "duration": str(duration) if duration else None,
-            "avg_pace_per_km": avg_pace
+            "avg_pace_per_km": avg_pace,
+            "avg_hr": session.avg_hr,
+            "max_hr": session.max_hr,
+            "min_hr": session.min_hr,
+            "hr_zones": session.hr_zones,
         })
 
 
@@ -1144,31 +1364,55 @@ class HeartRateViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['post'])
     def bulk(self, request):
-        """Bulk sync heart rate samples"""
-        samples = request.data.get('samples', [])
-        
-        created_count = 0
-        for sample in samples:
-            HeartRateSample.objects.create(
-                user=request.user,
-                ts=sample['ts'],
-                bpm=sample['bpm']
-            )
-            created_count += 1
-        
-        return Response({'synced': created_count})
+        """
+        Bulk sync heart rate samples
+        Body: {samples: [{ts, bpm}]} or {ts: [...], bpm: [...]} or {start, deltas: [...], bpm: [...]}
+        """
+        try:
+            samples, errors = parse_samples(request.data)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        accepted, duplicates = ingest_samples(request.user, samples)
+
+        return Response({
+            'synced': accepted,
+            'accepted': accepted,
+            'duplicates': duplicates,
+            'rejected': len(errors),
+            'errors': errors[:MAX_REPORTED_ERRORS],
+        })
     
     def list(self, request, *args, **kwargs):
+        """
+        Samples in a range with avg/max/min
+        Query: ?from=&to= plus optional ?bucket=1m|5m|1h|1d (streamed) or ?points=N (LTTB)
+        """
         queryset = self.get_queryset()
+        bucket = request.query_params.get('bucket')
+        points = request.query_params.get('points')
+
+        if bucket:
+            if bucket not in HR_BUCKETS:
+                return Response({'error': f"bucket must be one of {', '.join(HR_BUCKETS)}"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            return StreamingHttpResponse(stream_buckets(queryset, bucket, tz=user_timezone(request.user)),
+                                         content_type='application/json')
+
+        stats = range_stats(queryset)
+
+        if points:
+            try:
+                points = int(points)
+            except ValueError:
+                points = 0
+            if not 3 <= points <= MAX_POINTS:
+                return Response({'error': f'points must be an integer between 3 and {MAX_POINTS}'},
+                                status=status.HTTP_400_BAD_REQUEST)
+            samples = downsample(queryset, points)
+            return Response({'samples': self.get_serializer(samples, many=True).data, 'points': len(samples), **stats})
+
         serializer = self.get_serializer(queryset, many=True)
-        
-        bpms = [sample.bpm for sample in queryset]
-        stats = {
-            'avg_bpm': round(sum(bpms) / len(bpms)) if bpms else 0,
-            'max_bpm': max(bpms) if bpms else 0,
-            'min_bpm': min(bpms) if bpms else 0
-        }
-        
         return Response({'samples': serializer.data, **stats})
 
 
@@ -1176,10 +1420,16 @@ class HeartRateViewSet(viewsets.ModelViewSet):
 # RECIPE VIEWSET
 # ============================================
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = RecipeSerializer
     permission_classes = [IsAuthenticated]
     
+    def get_serializer_class(self):
+        # ?view=summary: stored totals and macros only, for list and search screens
+        if self.action == 'list' and self.request.query_params.get('view') == 'summary':
+            return RecipeSummarySerializer
+        return RecipeSerializer
+    
     def get_queryset(self):
         queryset = Recipe.objects.all()
         is_public = self.request.query_params.get('is_public', None)
@@ -1196,16 +1446,53 @@ class RecipeViewSet(viewsets.ModelViewSet):
         return queryset
     
     def perform_create(self, serializer):
-        recipe = serializer.save(created_by=self.request.user)
-        
-        # Create ingredients
         ingredients_data = self.request.data.get('ingredients', [])
-        for ingredient in ingredients_data:
-            RecipeIngredient.objects.create(
-                recipe=recipe,
-                food_id=ingredient['food_id'],
-                grams=ingredient['grams']
-            )
+        if isinstance(ingredients_data, str):
+            # multipart uploads (recipe image) send the ingredient list as JSON text
+            try:
+                ingredients_data = json.loads(ingredients_data or '[]')
+            except ValueError:
+                raise ValidationError({'ingredients': 'Invalid JSON'})
+        
+        rows, errors = parse_ingredients(ingredients_data) if ingredients_data else ([], [])
+        foods = load_foods(food_id for food_id, _ in rows)
+        errors = errors or unknown_food_errors(rows, foods)
+        if errors:
+            raise ValidationError({'ingredients': errors})
+        
+        recipe = Recipe(**{**serializer.validated_data, 'created_by': self.request.user})
+        apply_totals(recipe, rows, foods)
+        serializer.instance = write_recipes([(recipe, rows)])[0]
+    
+    @action(detail=False, methods=['post'], url_path='import')
+    def import_recipes(self, request):
+        """
+        Create many recipes at once (e.g. a coach's recipe book)
+        Body: {recipes: [{name, servings, is_public, ingredients: [{food_id, grams}]}]}
+        or a CSV upload in 'file' with columns recipe, servings, is_public, food_id, grams
+        """
+        upload = request.FILES.get('file')
+        if upload:
+            try:
+                specs = recipes_from_csv(upload.read().decode('utf-8-sig'))
+            except (UnicodeDecodeError, ValueError, csv.Error) as e:
+                return Response({'error': f'Could not read CSV: {e}'}, status=status.HTTP_400_BAD_REQUEST)
+        else:
+            specs = request.data.get('recipes') if isinstance(request.data, dict) else request.data
+        if not isinstance(specs, list) or not specs:
+            return Response({'error': 'Provide a non-empty recipes list or a CSV file'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(specs) > MAX_IMPORT_RECIPES:
+            return Response({'error': f'At most {MAX_IMPORT_RECIPES} recipes per import'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        results = import_recipe_specs(request.user, specs)
+        created = sum(1 for result in results if result['status'] == 'created')
+        return Response({
+            'created': created,
+            'rejected': len(results) - created,
+            'results': results
+        }, status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
 
 
 # ============================================
@@ -1508,7 +1795,7 @@ class LessonViewSet(viewsets.ReadOnlyModelViewSet):
 # CHAT VIEWSETS
 # ============================================
 
-class ChatThreadViewSet(viewsets.ModelViewSet):
+class ChatThreadViewSet(EagerLoadingViewSetMixin, viewsets.ModelViewSet):
     serializer_class = ChatThreadSerializer
     permission_classes = [IsAuthenticated]
     
@@ -1662,7 +1949,7 @@ class WishlistViewSet(viewsets.ModelViewSet):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def weekly_analytics(request):
-    """Get weekly analytics"""
+    """Get weekly analytics (?weeks=N for the N weeks ending with week_start)"""
     week_start_param = request.query_params.get('week_start')
     if week_start_param:
         week_start = datetime.strptime(week_start_param, '%Y-%m-%d').date()
@@ -1670,64 +1957,62 @@ def weekly_analytics(request):
         today = date.today()
         week_start = today - timedelta(days=today.weekday())
     
-    week_end = week_start + timedelta(days=6)
     user = request.user
-    
+    weeks = _parse_weeks(request)
+    if weeks is None:
+        return Response({'error': f'weeks must be an integer between 1 and {MAX_TREND_WEEKS}.'}, status=400)
+
+    workouts_target = user.profile.workouts_per_week
+    windows = load_week_windows(user, week_start - timedelta(weeks=weeks - 1), weeks)
+    weights = weights_as_of(user, [day for w in windows for day in (w['week_start'], w['week_end'])])
+    summaries = [_weekly_analytics_summary(window, weights, workouts_target) for window in windows]
+
+    if weeks == 1:
+        return Response(summaries[0])
+    return Response({'weeks': summaries})
+
+
+def _weekly_analytics_summary(window, weights, workouts_target):
     daily_breakdown = []
     total_calories = total_protein = total_steps = workouts_completed = 0
     
-    for i in range(7):
-        day = week_start + timedelta(days=i)
-        
-        food_entries = FoodDiaryEntry.objects.filter(user=user, date=day)
-        day_calories = sum([
-            (entry.food.calories if entry.food else entry.meal.calories) * entry.servings
-            for entry in food_entries
-        ])
-        total_calories += day_calories
+    for day in window['days']:
+        total_calories += day['calories']
+        total_protein += day['protein']
+        total_steps += day['steps']
         
-        day_protein = sum([
-            (entry.food.protein if entry.food else entry.meal.protein) * entry.servings
-            for entry in food_entries
-        ])
-        total_protein += day_protein
-        
-        activity = DailyActivitySummary.objects.filter(user=user, date=day).first()
-        day_steps = activity.steps if activity else 0
-        total_steps += day_steps
-        
-        workout = UserWorkoutLog.objects.filter(user=user, date=day, completed=True).exists()
+        workout = day['workouts_completed'] > 0
         if workout:
             workouts_completed += 1
         
         daily_breakdown.append({
-            'date': day,
-            'calories': round(day_calories),
-            'protein': round(day_protein),
-            'steps': day_steps,
+            'date': day['date'],
+            'calories': round(day['calories']),
+            'protein': round(day['protein']),
+            'steps': day['steps'],
             'workout_completed': workout
         })
     
-    progress_start = Progress.objects.filter(user=user, date__lte=week_start).order_by('-date').first()
-    progress_end = Progress.objects.filter(user=user, date__lte=week_end).order_by('-date').first()
+    weight_start = weights.get(window['week_start'])
+    weight_end = weights.get(window['week_end'])
     
     weight_change = 0
-    if progress_start and progress_end:
-        weight_change = float(progress_end.weight) - float(progress_start.weight)
+    if weight_start is not None and weight_end is not None:
+        weight_change = float(weight_end) - float(weight_start)
     
-    return Response({
-        'week_start': week_start,
-        'week_end': week_end,
+    return {
+        'week_start': window['week_start'],
+        'week_end': window['week_end'],
         'summary': {
             'weight_change': round(weight_change, 1),
             'avg_calories': round(total_calories / 7),
             'avg_protein': round(total_protein / 7),
             'avg_steps': round(total_steps / 7),
             'workouts_completed': workouts_completed,
-            'workouts_target': user.profile.workouts_per_week
+            'workouts_target': workouts_target
         },
         'daily_breakdown': daily_breakdown
-    })
+    }
 
 
 @api_view(['GET'])
@@ -1760,25 +2045,20 @@ def monthly_analytics(request):
     if progress_start and progress_end and progress_start.body_fat_percentage and progress_end.body_fat_percentage:
         bf_change = float(progress_end.body_fat_percentage) - float(progress_start.body_fat_percentage)
     
-    total_workouts = UserWorkoutLog.objects.filter(
-        user=user, date__gte=month_start, date__lte=month_end, completed=True
-    ).count()
-    
-    cardio_sessions = CardioSession.objects.filter(
-        user=user, started_at__date__gte=month_start, started_at__date__lte=month_end
-    )
-    total_cardio = cardio_sessions.count()
-    total_distance = cardio_sessions.aggregate(Sum('distance_m'))['distance_m__sum'] or 0
-    
-    food_entries = FoodDiaryEntry.objects.filter(
+    totals = DailyUserRollup.objects.filter(
         user=user, date__gte=month_start, date__lte=month_end
+    ).aggregate(
+        workouts=Sum('workouts_completed'),
+        cardio=Sum('cardio_sessions'),
+        distance=Sum('cardio_distance_m'),
+        calories=Sum('calories')
     )
+    total_workouts = totals['workouts'] or 0
+    total_cardio = totals['cardio'] or 0
+    total_distance = totals['distance'] or 0
     
     days = (month_end - month_start).days + 1
-    total_calories = sum([
-        (entry.food.calories if entry.food else entry.meal.calories) * entry.servings
-        for entry in food_entries
-    ])
+    total_calories = totals['calories'] or 0
     avg_calories = round(total_calories / days) if days > 0 else 0
     
     return Response({
@@ -1806,26 +2086,13 @@ def user_stats(request):
     """Get overall user statistics"""
     user = request.user
     
-    total_workouts = UserWorkoutLog.objects.filter(user=user, completed=True).count()
+    totals = DailyUserRollup.objects.filter(user=user).aggregate(
+        workouts=Sum('workouts_completed'), distance=Sum('cardio_distance_m'))
+    total_workouts = totals['workouts'] or 0
     total_cardio = CardioSession.objects.filter(user=user, ended_at__isnull=False).count()
-    total_distance = CardioSession.objects.filter(user=user).aggregate(
-        Sum('distance_m'))['distance_m__sum'] or 0
+    total_distance = totals['distance'] or 0
     
-    # Current streak
-    today = date.today()
-    streak = 0
-    check_date = today
-    
-    while True:
-        has_activity = (
-            UserWorkoutLog.objects.filter(user=user, date=check_date, completed=True).exists() or
-            CardioSession.objects.filter(user=user, started_at__date=check_date).exists()
-        )
-        if has_activity:
-            streak += 1
-            check_date = check_date - timedelta(days=1)
-        else:
-            break
+    streak = get_streak(user)
     
     first_progress = Progress.objects.filter(user=user).order_by('date').first()
     latest_progress = Progress.objects.filter(user=user).order_by('-date').first()
@@ -1838,7 +2105,8 @@ def user_stats(request):
         'total_workouts': total_workouts,
         'total_cardio_sessions': total_cardio,
         'total_distance_km': round(total_distance / 1000, 1),
-        'current_streak_days': streak,
+        'current_streak_days': streak.current_as_of(timezone.localdate(timezone=user_timezone(user))),
+        'longest_streak_days': streak.longest_streak,
         'weight_change_kg': round(weight_change, 1),
         'member_since': user.date_joined.strftime('%Y-%m-%d')
     })
@@ -1933,33 +2201,65 @@ def assign_workout_to_client(request, client_id):
         
         workout = Workout.objects.get(id=workout_id)
         
-        new_workout = Workout.objects.create(
-            user=user,
-            name=workout.name,
-            description=f"{workout.description}\n\nCoach Notes: {notes}",
-            duration=workout.duration,
-            level=workout.level,
-            calories_burned=workout.calories_burned,
-            date=workout_date,
-            completed=False
+        created, skipped = clone_workout(
+            workout, [(user.id, workout_date)], description=f"{workout.description}\n\nCoach Notes: {notes}"
         )
-        
-        for item in workout.items.all():
-            WorkoutExercise.objects.create(
-                workout=new_workout,
-                exercise=item.exercise,
-                order=item.order,
-                sets=item.sets,
-                reps=item.reps,
-                reps_min=item.reps_min,
-                reps_max=item.reps_max,
-                rest_seconds=item.rest_seconds,
-                notes=item.notes
-            )
+        if skipped:
+            return Response({'error': 'Client already has this workout on that date'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
         return Response({'assigned': True})
     except (User.DoesNotExist, Workout.DoesNotExist):
         return Response({'error': 'User or workout not found'}, status=status.HTTP_404_NOT_FOUND)
+    except DjangoValidationError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def assign_workout_program(request):
+    """
+    Roll a workout out to many clients on many dates in one call
+    Body: {workout_id, client_ids: [...], dates: [YYYY-MM-DD, ...], notes}
+    """
+    if not request.user.is_staff:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    
+    client_ids = request.data.get('client_ids')
+    dates = request.data.get('dates')
+    notes = request.data.get('notes', '')
+    if not isinstance(client_ids, list) or not isinstance(dates, list) or not client_ids or not dates:
+        return Response({'error': 'client_ids and dates must be non-empty lists'}, status=status.HTTP_400_BAD_REQUEST)
+    if not all(isinstance(day, str) for day in dates):
+        return Response({'error': 'dates must be YYYY-MM-DD strings'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        client_ids = [int(client_id) for client_id in client_ids]
+    except (TypeError, ValueError):
+        return Response({'error': 'client_ids must be user ids'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(client_ids) * len(dates) > MAX_ASSIGNED_WORKOUTS:
+        return Response({'error': f'At most {MAX_ASSIGNED_WORKOUTS} workouts per request'},
+                        status=status.HTTP_400_BAD_REQUEST)
+    
+    workout = Workout.objects.filter(id=request.data.get('workout_id')).first()
+    if workout is None:
+        return Response({'error': 'Workout not found'}, status=status.HTTP_404_NOT_FOUND)
+    found = set(User.objects.filter(id__in=client_ids).values_list('id', flat=True))
+    missing = [client_id for client_id in client_ids if client_id not in found]
+    if missing:
+        return Response({'error': 'Clients not found', 'client_ids': missing}, status=status.HTTP_404_NOT_FOUND)
+    
+    overrides = {'description': f"{workout.description}\n\nCoach Notes: {notes}"} if notes else {}
+    try:
+        created, skipped = clone_workout(
+            workout, [(client_id, day) for client_id in client_ids for day in dates], **overrides
+        )
+    except DjangoValidationError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response({
+        'assigned': len(created),
+        'skipped': [{'client_id': client_id, 'date': day} for client_id, day in skipped]
+    }, status=status.HTTP_201_CREATED)
 
 
 @api_view(['GET'])
@@ -1974,25 +2274,19 @@ def nutrition_summary(request):
     if isinstance(to_date, str):
         to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
     
-    entries = FoodDiaryEntry.objects.filter(
+    totals = DailyUserRollup.objects.filter(
         user=request.user,
         date__gte=from_date,
         date__lte=to_date
+    ).aggregate(
+        calories=Sum('calories'), protein=Sum('protein'),
+        carbs=Sum('carbs'), fats=Sum('fats')
     )
     
-    total_calories = total_protein = total_carbs = total_fats = 0
-    
-    for entry in entries:
-        if entry.food:
-            total_calories += entry.food.calories * entry.servings
-            total_protein += entry.food.protein * entry.servings
-            total_carbs += entry.food.carbs * entry.servings
-            total_fats += entry.food.fat * entry.servings
-        elif entry.meal:
-            total_calories += entry.meal.calories * entry.servings
-            total_protein += entry.meal.protein * entry.servings
-            total_carbs += entry.meal.carbs * entry.servings
-            total_fats += entry.meal.fats * entry.servings
+    total_calories = totals['calories'] or 0
+    total_protein = totals['protein'] or 0
+    total_carbs = totals['carbs'] or 0
+    total_fats = totals['fats'] or 0
     
     days = (to_date - from_date).days + 1
     
@@ -2043,86 +2337,74 @@ def quick_log_water(request):
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def exercise_personal_records(request):
-    """Get all personal records for user"""
-    user = request.user
-    
-    logged_exercises = SetLog.objects.filter(
-        session__user=user,
-        completed=True
-    ).values_list('exercise_id', flat=True).distinct()
-    
-    prs = []
-    
-    for exercise_id in logged_exercises:
-        exercise = Exercise.objects.get(id=exercise_id)
-        
-        max_weight_log = SetLog.objects.filter(
-            session__user=user,
-            exercise_id=exercise_id,
-            completed=True,
-            weight_kg__isnull=False
-        ).order_by('-weight_kg').first()
-        
-        max_reps_log = SetLog.objects.filter(
-            session__user=user,
-            exercise_id=exercise_id,
-            completed=True,
-            reps__isnull=False
-        ).order_by('-reps').first()
-        
-        pr_data = {
-            'exercise_id': exercise_id,
-            'exercise_name': exercise.name,
-            'max_weight_kg': float(max_weight_log.weight_kg) if max_weight_log else None,
-            'max_weight_date': str(max_weight_log.session.date) if max_weight_log else None,
-            'max_reps': max_reps_log.reps if max_reps_log else None,
-            'max_reps_weight': float(max_reps_log.weight_kg) if max_reps_log and max_reps_log.weight_kg else None
+    """Get all personal records for user (kept current from logged sets, read in one query)"""
+    records = (
+        PersonalRecord.objects.filter(user=request.user)
+        .select_related('exercise').order_by('exercise__name')
+    )
+
+    def number(value):
+        return float(value) if value is not None else None
+
+    prs = [
+        {
+            'exercise_id': record.exercise_id,
+            'exercise_name': record.exercise.name,
+            'max_weight_kg': number(record.max_weight_kg),
+            'max_weight_reps': record.max_weight_reps,
+            'max_weight_date': str(record.max_weight_date) if record.max_weight_date else None,
+            'max_reps': record.max_reps,
+            'max_reps_weight': number(record.max_reps_weight_kg),
+            'max_reps_date': str(record.max_reps_date) if record.max_reps_date else None,
+            'best_e1rm_kg': number(record.best_e1rm_kg),
+            'best_e1rm_date': str(record.best_e1rm_date) if record.best_e1rm_date else None,
+            'best_volume_kg': number(record.best_volume_kg),
+            'best_volume_date': str(record.best_volume_date) if record.best_volume_date else None,
         }
-        
-        prs.append(pr_data)
-    
+        for record in records
+    ]
+
     return Response({'personal_records': prs})
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def muscle_group_volume(request):
-    """Get training volume by muscle group for date range"""
+    """
+    Get training volume by muscle group for date range
+
+    ?granularity=week splits the range into Monday-based weeks; ?secondary=true also
+    credits secondary muscles with a fraction of each set.
+    """
     from_date = request.query_params.get('from', date.today() - timedelta(days=30))
     to_date = request.query_params.get('to', date.today())
+    granularity = request.query_params.get('granularity', 'total')
+    secondary = request.query_params.get('secondary', '').lower() in ('1', 'true', 'yes')
     
-    if isinstance(from_date, str):
-        from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
-    if isinstance(to_date, str):
-        to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
-    
-    sets = SetLog.objects.filter(
-        session__user=request.user,
-        session__date__gte=from_date,
-        session__date__lte=to_date,
-        completed=True
-    ).select_related('exercise__primary_muscle')
-    
-    volume_by_group = {}
-    
-    for set_log in sets:
-        if not set_log.exercise.primary_muscle:
-            continue
-            
-        group = set_log.exercise.primary_muscle.group
-        
-        if group not in volume_by_group:
-            volume_by_group[group] = {'total_sets': 0, 'total_volume_kg': 0}
-        
-        volume_by_group[group]['total_sets'] += 1
-        
-        if set_log.weight_kg and set_log.reps:
-            volume_by_group[group]['total_volume_kg'] += float(set_log.weight_kg) * set_log.reps
+    try:
+        if isinstance(from_date, str):
+            from_date = datetime.strptime(from_date, '%Y-%m-%d').date()
+        if isinstance(to_date, str):
+            to_date = datetime.strptime(to_date, '%Y-%m-%d').date()
+    except ValueError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+    if granularity not in ('total', 'week'):
+        return Response({'error': 'granularity must be total or week'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    volume = training_volume(request.user, from_date, to_date, granularity, secondary)
+    
+    if granularity == 'week':
+        weeks = []
+        week_start = from_date - timedelta(days=from_date.weekday())
+        while week_start <= to_date:
+            weeks.append({'week_start': week_start, 'volume_by_muscle_group': volume.get(week_start, {})})
+            week_start += timedelta(weeks=1)
+        return Response({'from_date': from_date, 'to_date': to_date, 'weeks': weeks})
     
     return Response({
         'from_date': from_date,
         'to_date': to_date,
-        'volume_by_muscle_group': volume_by_group
+        'volume_by_muscle_group': volume.get(None, {})
     })
 
 
@@ -2134,87 +2416,100 @@ def duplicate_workout(request, workout_id):
         original = Workout.objects.get(id=workout_id, user=request.user)
         new_date = request.data.get('date', date.today())
         
-        new_workout = Workout.objects.create(
-            user=request.user,
-            name=f"{original.name} (Copy)",
-            description=original.description,
-            duration=original.duration,
-            level=original.level,
-            calories_burned=original.calories_burned,
-            date=new_date,
-            completed=False
-        )
+        created, skipped = clone_workout(original, [(request.user.id, new_date)], name=f"{original.name} (Copy)")
+        if skipped:
+            return Response({'error': 'A copy of this workout already exists on that date'},
+                            status=status.HTTP_400_BAD_REQUEST)
         
-        for item in original.items.all():
-            WorkoutExercise.objects.create(
-                workout=new_workout,
-                exercise=item.exercise,
-                order=item.order,
-                sets=item.sets,
-                reps=item.reps,
-                reps_min=item.reps_min,
-                reps_max=item.reps_max,
-                rest_seconds=item.rest_seconds,
-                notes=item.notes
-            )
-        
-        serializer = WorkoutSerializer(new_workout)
+        serializer = WorkoutSerializer(created[0])
         return Response(serializer.data, status=status.HTTP_201_CREATED)
         
     except Workout.DoesNotExist:
         return Response({'error': 'Workout not found'}, status=status.HTTP_404_NOT_FOUND)
+    except DjangoValidationError:
+        return Response({'error': 'Invalid date format. Use YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+
+
+def _parse_month(value):
+    """'YYYY-MM' -> first day of that month (ValueError when malformed)"""
+    year, month = map(int, value.split('-'))
+    return date(year, month, 1)
+
+
+def _month_end(month_start):
+    next_month = date(month_start.year + month_start.month // 12, month_start.month % 12 + 1, 1)
+    return next_month - timedelta(days=1)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def workout_calendar(request):
-    """Get workout calendar for month"""
+    """
+    Get workout calendar for a month (?month=YYYY-MM) or a span of months (?from=YYYY-MM&to=YYYY-MM)
+
+    Workout logs and cardio sessions are each grouped by day in one query, whatever the span.
+    """
     month_param = request.query_params.get('month')
-    if month_param:
-        year, month = map(int, month_param.split('-'))
-        month_start = date(year, month, 1)
-    else:
-        today = date.today()
-        month_start = date(today.year, today.month, 1)
-    
-    if month_start.month == 12:
-        month_end = date(month_start.year + 1, 1, 1) - timedelta(days=1)
-    else:
-        month_end = date(month_start.year, month_start.month + 1, 1) - timedelta(days=1)
-    
-    workout_logs = UserWorkoutLog.objects.filter(
-        user=request.user,
-        date__gte=month_start,
-        date__lte=month_end
-    ).select_related('workout')
-    
-    cardio_sessions = CardioSession.objects.filter(
-        user=request.user,
-        started_at__date__gte=month_start,
-        started_at__date__lte=month_end
+    from_param = request.query_params.get('from')
+    to_param = request.query_params.get('to')
+    try:
+        if from_param or to_param:
+            range_start = _parse_month(from_param or to_param)
+            range_end = _month_end(_parse_month(to_param or from_param))
+        elif month_param:
+            range_start = _parse_month(month_param)
+            range_end = _month_end(range_start)
+        else:
+            today = date.today()
+            range_start = date(today.year, today.month, 1)
+            range_end = _month_end(range_start)
+    except ValueError:
+        return Response({'error': 'Invalid month format. Use YYYY-MM'}, status=status.HTTP_400_BAD_REQUEST)
+
+    months = (range_end.year - range_start.year) * 12 + range_end.month - range_start.month + 1
+    if not 1 <= months <= MAX_CALENDAR_MONTHS:
+        return Response(
+            {'error': f'from must not be after to, and at most {MAX_CALENDAR_MONTHS} months can be requested'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    workout_days = {
+        row['date']: row
+        for row in UserWorkoutLog.objects.filter(
+            user=request.user, date__gte=range_start, date__lte=range_end
+        ).values('date').annotate(n=Count('id'), done=Count('id', filter=Q(completed=True))).order_by()
+    }
+
+    tz = user_timezone(request.user)
+    cardio_days = dict(
+        CardioSession.objects.filter(
+            date_window('started_at', range_start, range_end, tz), user=request.user
+        ).annotate(day=TruncDate('started_at', tzinfo=tz)).values('day').annotate(n=Count('id'))
+        .order_by().values_list('day', 'n')
     )
-    
+
     calendar = {}
-    current_date = month_start
-    
-    while current_date <= month_end:
-        date_str = str(current_date)
-        
-        day_workouts = workout_logs.filter(date=current_date)
-        day_cardio = cardio_sessions.filter(started_at__date=current_date)
-        
-        calendar[date_str] = {
+    current_date = range_start
+    while current_date <= range_end:
+        workouts = workout_days.get(current_date, {'n': 0, 'done': 0})
+        cardio = cardio_days.get(current_date, 0)
+        calendar[str(current_date)] = {
             'date': current_date,
-            'has_workout': day_workouts.exists(),
-            'workout_completed': day_workouts.filter(completed=True).exists(),
-            'has_cardio': day_cardio.exists(),
-            'total_activities': day_workouts.count() + day_cardio.count()
+            'has_workout': workouts['n'] > 0,
+            'workout_completed': workouts['done'] > 0,
+            'has_cardio': cardio > 0,
+            'total_activities': workouts['n'] + cardio
         }
-        
         current_date += timedelta(days=1)
-    
+
+    if from_param or to_param:
+        return Response({
+            'from': f"{range_start.year}-{range_start.month:02d}",
+            'to': f"{range_end.year}-{range_end.month:02d}",
+            'calendar': calendar
+        })
     return Response({
-        'month': f"{month_start.year}-{month_start.month:02d}",
+        'month': f"{range_start.year}-{range_start.month:02d}",
         'calendar': calendar
     })
 
@@ -2358,19 +2653,7 @@ def copy_recipe(request, recipe_id):
     try:
         original = Recipe.objects.get(id=recipe_id, is_public=True)
         
-        new_recipe = Recipe.objects.create(
-            name=f"{original.name} (Copy)",
-            created_by=request.user,
-            is_public=False,
-            image=original.image
-        )
-        
-        for ingredient in original.ingredients.all():
-            RecipeIngredient.objects.create(
-                recipe=new_recipe,
-                food=ingredient.food,
-                grams=ingredient.grams
-            )
+        new_recipe = copy_recipe_for(original, request.user, name=f"{original.name} (Copy)", is_public=False)
         
         serializer = RecipeSerializer(new_recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
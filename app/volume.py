@@ -0,0 +1,123 @@
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.db.models import Count, DecimalField, F, FloatField, Sum
+from django.db.models.functions import TruncWeek
+
+from .models import Exercise, SetLog, UserWorkoutLog
+
+# share of a set credited to each muscle group an exercise only trains secondarily
+SECONDARY_MUSCLE_CREDIT = 0.5
+MATRIX_CACHE_KEY = 'training:muscle-matrix'
+# invalidation only clears the cache of the process that saw the write (LocMem is per-process),
+# so the matrix also expires and other processes pick up catalogue changes within this long
+MATRIX_TIMEOUT = 5 * 60
+
+
+# ---------------------------
+# Exercise -> muscle group weights
+# ---------------------------
+
+def build_muscle_matrix():
+    """
+    ``{exercise_id: {group: weight}}`` for every exercise with muscles attached.
+
+    The primary muscle's group gets full credit and each other group trained as a
+    secondary muscle gets ``SECONDARY_MUSCLE_CREDIT``. Two queries for the whole catalogue.
+    """
+    matrix = defaultdict(dict)
+    secondary = Exercise.secondary_muscles.through.objects.values_list('exercise_id', 'muscle__group')
+    for exercise_id, group in secondary:
+        matrix[exercise_id][group] = SECONDARY_MUSCLE_CREDIT
+    primary = Exercise.objects.filter(primary_muscle__isnull=False).values_list('id', 'primary_muscle__group')
+    for exercise_id, group in primary:
+        matrix[exercise_id][group] = 1.0
+    return dict(matrix)
+
+
+def muscle_matrix():
+    """The cached matrix, rebuilt after an exercise or muscle changes or ``MATRIX_TIMEOUT`` passes"""
+    matrix = cache.get(MATRIX_CACHE_KEY)
+    if matrix is None:
+        matrix = build_muscle_matrix()
+        cache.set(MATRIX_CACHE_KEY, matrix, MATRIX_TIMEOUT)
+    return matrix
+
+
+def invalidate_muscle_matrix():
+    cache.delete(MATRIX_CACHE_KEY)
+
+
+# ---------------------------
+# Volume per muscle group
+# ---------------------------
+
+def _empty():
+    return {'total_sets': 0, 'total_volume_kg': 0}
+
+
+def muscle_group_volume(user, start, end, granularity='total', secondary=False):
+    """
+    Completed sets and ``weight x reps`` per muscle group over ``[start, end]``.
+
+    Returns ``{period: {group: {'total_sets', 'total_volume_kg'}}}`` where ``period`` is
+    ``None`` for ``granularity='total'`` and the Monday of each week for ``'week'``.
+    Sums are taken in the database. Without secondary credit rows are grouped on the
+    primary muscle group directly; with it they are grouped per exercise and spread
+    over its groups through the cached muscle matrix.
+    """
+    sets = SetLog.objects.filter(
+        session__user=user, session__date__gte=start, session__date__lte=end, completed=True
+    )
+    keys = []
+    if granularity == 'week':
+        sets = sets.annotate(period=TruncWeek('session__date'))
+        keys.append('period')
+    if secondary:
+        keys.append('exercise_id')
+    else:
+        sets = sets.filter(exercise__primary_muscle__isnull=False).annotate(group=F('exercise__primary_muscle__group'))
+        keys.append('group')
+
+    rows = sets.values(*keys).annotate(
+        n=Count('id'),
+        volume=Sum(F('weight_kg') * F('reps'), output_field=FloatField()),
+    ).order_by()
+
+    matrix = muscle_matrix() if secondary else None
+    result = defaultdict(lambda: defaultdict(_empty))
+    for row in rows:
+        weights = matrix.get(row['exercise_id'], {}) if secondary else {row['group']: 1}
+        for group, weight in weights.items():
+            totals = result[row.get('period')][group]
+            totals['total_sets'] += row['n'] * weight
+            totals['total_volume_kg'] += (row['volume'] or 0) * weight
+    return {period: dict(groups) for period, groups in result.items()}
+
+
+# ---------------------------
+# Per-session totals
+# ---------------------------
+
+SESSION_TOTALS = {
+    'total_sets': Count('id'),
+    'total_reps': Sum('reps'),
+    'total_volume_kg': Sum(F('weight_kg') * F('reps'), output_field=DecimalField(max_digits=10, decimal_places=2)),
+    'total_duration_seconds': Sum('time_seconds'),
+    'exercises_count': Count('exercise_id', distinct=True),
+}
+
+
+def session_totals(session_ids):
+    """``{session_id: {field: value}}`` over completed sets, one grouped query"""
+    rows = (
+        SetLog.objects.filter(session_id__in=session_ids, completed=True)
+        .values('session_id').annotate(**SESSION_TOTALS).order_by()
+    )
+    return {row.pop('session_id'): {field: value or 0 for field, value in row.items()} for row in rows}
+
+
+def refresh_session_totals(session_id):
+    """Recompute the stored totals of one workout session (sessions without sets go back to zero)"""
+    totals = session_totals([session_id]).get(session_id, {field: 0 for field in SESSION_TOTALS})
+    UserWorkoutLog.objects.filter(pk=session_id).update(**totals)
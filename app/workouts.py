@@ -0,0 +1,72 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Workout, WorkoutExercise
+
+# Workout fields carried over to copies (user, date and completed are set per copy)
+WORKOUT_COPY_FIELDS = ('name', 'description', 'duration', 'level', 'calories_burned')
+# every prescription field of an item: sets, reps, rep range, time, distance, rest, RPE range, tempo, notes
+ITEM_COPY_FIELDS = tuple(
+    field.attname for field in WorkoutExercise._meta.concrete_fields
+    if field.attname not in ('id', 'workout_id')
+)
+
+
+# ---------------------------
+# Workout cloning
+# ---------------------------
+
+def _clean(field, value):
+    """Coerce request strings ("2025-01-06", "01:00:00") the way a form would; raises ValidationError"""
+    try:
+        return Workout._meta.get_field(field).to_python(value)
+    except TypeError:
+        # JSON numbers, lists and objects reach the string parsers as they are
+        raise ValidationError(f'Invalid value for {field}')
+
+
+def clone_workout(source, targets, **overrides):
+    """
+    Copy ``source`` with all its items for every ``(user_id, date)`` in ``targets``.
+
+    ``overrides`` replace copied Workout fields (e.g. ``name`` or ``description``).
+    The items are read once and written with a single ``bulk_create``, as are the
+    workouts, so a program rolled out to many clients and dates costs a fixed number
+    of queries. Workouts are unique per (user, name, date), so targets that already
+    hold a workout with the copy's name on that day are skipped.
+
+    Returns ``(created_workouts, skipped_targets)``.
+    """
+    values = {field: getattr(source, field) for field in WORKOUT_COPY_FIELDS}
+    values.update({field: _clean(field, value) for field, value in overrides.items()})
+    values['completed'] = False
+    name = values['name']
+
+    targets = list(dict.fromkeys((user_id, _clean('date', day)) for user_id, day in targets))
+    if not targets:
+        return [], []
+    user_ids = {user_id for user_id, _ in targets}
+    dates = {day for _, day in targets}
+    taken = set(
+        Workout.objects.filter(name=name, user_id__in=user_ids, date__in=dates).values_list('user_id', 'date')
+    )
+    items = list(source.items.order_by('order').values(*ITEM_COPY_FIELDS))
+
+    with transaction.atomic():
+        workouts = Workout.objects.bulk_create(
+            [Workout(user_id=user_id, date=day, **values) for user_id, day in targets if (user_id, day) not in taken]
+        )
+        if workouts and workouts[0].pk is None:
+            # backends without RETURNING (MySQL) leave pks unset; (user, name, date) is unique, so read them back
+            ids = {
+                (user_id, day): pk
+                for pk, user_id, day in Workout.objects.filter(name=name, user_id__in=user_ids, date__in=dates)
+                .values_list('id', 'user_id', 'date')
+            }
+            for workout in workouts:
+                workout.pk = ids[(workout.user_id, workout.date)]
+        WorkoutExercise.objects.bulk_create(
+            [WorkoutExercise(workout=workout, **item) for workout in workouts for item in items]
+        )
+
+    return workouts, [target for target in targets if target in taken]
@@ -15,6 +15,7 @@ from django.db.models.functions import TruncDay
 from django.shortcuts import render
 from django.utils import timezone
 from app.models import *
+from app.workouts import clone_workout
 import json, csv
 from django.db.models import Avg
 
@@ -931,22 +932,12 @@ def workout_toggle_complete(request, pk):
 
 def workout_duplicate(request, pk):
     src = get_object_or_404(Workout, pk=pk)
-    new_w = Workout.objects.create(
-        user=src.user,
-        name=f"{src.name} (copy)",
-        description=src.description,
-        duration=src.duration,
-        level=src.level,
-        calories_burned=src.calories_burned,
-        date=localdate(),
-        completed=False,
-    )
-    for it in src.items.all():
-        it.pk = None
-        it.workout = new_w
-        it.save()
+    created, _ = clone_workout(src, [(src.user_id, localdate())], name=f"{src.name} (copy)")
+    if not created:
+        messages.error(request, "A copy of this workout already exists today.")
+        return redirect(_back_to_templates(pk=pk))
     messages.success(request, "Workout duplicated.")
-    return redirect(_back_to_templates(pk=new_w.pk))
+    return redirect(_back_to_templates(pk=created[0].pk))
 # -------------------------
 # Progress
 # -------------------------